@@ -0,0 +1,94 @@
+"""
+Disjoncteur pour les appels à un fournisseur externe
+"""
+import threading
+import time
+from typing import Dict
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états.
+
+    - fermé : les appels passent ; `failure_threshold` échecs consécutifs
+      ouvrent le circuit ;
+    - ouvert : les appels sont refusés sans contacter le fournisseur
+      pendant `reset_timeout_seconds` ;
+    - semi-ouvert : un seul appel d'essai passe ; son succès referme le
+      circuit, son échec le rouvre.
+
+    Thread-safe.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        # Métriques
+        self.rejected_calls = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Indique si un appel peut être tenté (réserve l'essai en semi-ouvert)"""
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def retry_after_seconds(self) -> float:
+        """Temps restant avant un nouvel essai (0 si le circuit n'est pas ouvert)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout_seconds - time.monotonic())
+
+    def _refresh_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh_state()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls
+            }
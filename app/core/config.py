@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 
@@ -6,11 +7,105 @@ class Settings(BaseSettings):
     
     # Base de données
     DATABASE_URL: str = "sqlite:///./fintech.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    
+    # PostgreSQL (psycopg 3 : DATABASE_URL=postgresql+psycopg://...)
+    DB_STATEMENT_TIMEOUT_MS: int = 5000  # 0 pour désactiver
+    DB_PREPARE_THRESHOLD: int = 5  # Exécutions avant préparation côté serveur, -1 pour désactiver
+    
+    # Profil SQLite (appliqué à chaque nouvelle connexion)
+    SQLITE_TUNING_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 Mo
+    SQLITE_CACHE_SIZE: int = -65536  # Négatif : en Kio (64 Mo)
+    
+    # File d'écriture unique (SQLite) : les écritures de fond sont
+    # regroupées dans une même transaction au lieu de se disputer le verrou
+    DB_WRITE_QUEUE_ENABLED: bool = True
+    DB_WRITE_QUEUE_MAX_BATCH: int = 100
     
     # Sécurité
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     
+    # Hachage des PIN (bcrypt)
+    BCRYPT_ROUNDS: int = 12  # Un changement déclenche un rehash à la connexion
+    PIN_HASH_WORKERS: int = 2
+    PIN_HASH_QUEUE_SIZE: int = 32  # Demandes en attente au-delà des workers
+    PIN_HASH_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    PIN_VERIFY_CACHE_TTL_SECONDS: int = 120  # 0 pour désactiver
+    
+    # Exécution : les routers synchrones (SQLAlchemy, bcrypt) tournent dans
+    # un pool de threads borné, hors de la boucle asyncio
+    THREADPOOL_MAX_WORKERS: int = 40
+    
+    # Métriques Prometheus (GET /metrics, latence et requêtes SQL par route)
+    METRICS_ENABLED: bool = True
+    
+    # Profilage SQL par requête (opt-in) : requêtes lentes, répétitions, N+1
+    # et budget de requêtes (mode "warn" en production, "strict" en test)
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_PROFILER_MODE: str = "warn"
+    SQL_QUERY_BUDGET: int = 30  # Requêtes par requête HTTP
+    SQL_QUERY_BUDGETS: Dict[str, int] = {}  # Par gabarit de route, ex: {"/ussd": 12}
+    SQL_SLOW_QUERY_MS: float = 100.0
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD: int = 5  # Jeux de paramètres distincts pour une même instruction
+    
+    # Compteurs d'utilisation (USSD/APP) : incréments cumulés en mémoire
+    USAGE_COUNTER_FLUSH_INTERVAL_SECONDS: float = 5.0  # Retard maximal des compteurs en base
+    USAGE_COUNTER_MAX_PENDING_USERS: int = 5000  # Flush anticipé au-delà
+    
+    # Archivage de l'audit : les mois plus anciens que la rétention sont
+    # déplacés de audit_logs vers des fichiers NDJSON gzip (toujours lisibles)
+    AUDIT_HOT_RETENTION_MONTHS: int = 6
+    AUDIT_ARCHIVE_DIR: str = "./audit_archive"  # Stockage partagé entre nœuds (même chemin partout)
+    AUDIT_ARCHIVE_DELETE_CHUNK_SIZE: int = 5000  # Lignes supprimées par transaction
+    
+    # Cache de score : fraîcheur du score persisté et cache mémoire local
+    SCORE_CACHE_TTL_SECONDS: int = 86400
+    SCORE_MEMORY_CACHE_TTL_SECONDS: int = 30
+    SCORE_MEMORY_CACHE_MAX_ENTRIES: int = 100000
+    
+    # Cache mémoire des statuts de consentement complets (voir consent_cache)
+    CONSENT_CACHE_TTL_SECONDS: int = 300
+    CONSENT_CACHE_MAX_ENTRIES: int = 100000
+    
+    # Passage en retard des crédits échus
+    OVERDUE_SWEEPER_ENABLED: bool = True  # Thread dans le processus (un seul nœud à la fois grâce au bail)
+    OVERDUE_SWEEP_INTERVAL_SECONDS: int = 300
+    OVERDUE_SWEEP_CHUNK_SIZE: int = 1000  # Crédits par transaction
+    OVERDUE_SWEEP_PAUSE_SECONDS: float = 0.05  # Pause entre deux lots (laisse passer les autres écritures)
+    OVERDUE_SWEEP_LEASE_SECONDS: int = 600
+    
+    # Sessions USSD
+    USSD_SESSION_BACKEND: str = "memory"  # "memory" ou "redis"
+    USSD_SESSION_TTL_SECONDS: int = 180
+    USSD_SESSION_MAX_ENTRIES: int = 50000
+    USSD_SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Fournisseur Mobile Money
+    MOBILE_MONEY_BACKEND: str = "simulator"  # "simulator" ou "http"
+    MOBILE_MONEY_BASE_URL: str = "http://localhost:8081"
+    MOBILE_MONEY_API_KEY: str = ""
+    MOBILE_MONEY_CONNECT_TIMEOUT_SECONDS: float = 0.5
+    MOBILE_MONEY_READ_TIMEOUT_SECONDS: float = 1.0
+    MOBILE_MONEY_DEADLINE_SECONDS: float = 2.5  # Durée maximale d'un appel, nouvelles tentatives comprises
+    MOBILE_MONEY_MAX_RETRIES: int = 2
+    MOBILE_MONEY_RETRY_BACKOFF_SECONDS: float = 0.1
+    MOBILE_MONEY_MAX_CONNECTIONS: int = 50
+    MOBILE_MONEY_MAX_CONCURRENCY: int = 20  # Appels simultanés en mode lot
+    MOBILE_MONEY_CACHE_TTL_SECONDS: int = 3600  # Données fraîches
+    MOBILE_MONEY_CACHE_STALE_SECONDS: int = 86400  # Servies périmées pendant le rafraîchissement ou une panne
+    MOBILE_MONEY_CACHE_MAX_ENTRIES: int = 100000
+    MOBILE_MONEY_BREAKER_FAILURE_THRESHOLD: int = 5
+    MOBILE_MONEY_BREAKER_RESET_SECONDS: float = 30.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,291 @@
+"""
+Métriques du processus au format texte Prometheus (GET /metrics).
+
+Registre en mémoire, sans dépendance externe :
+- Counter et Histogram à étiquettes, incrémentés sur le chemin des requêtes
+  (un verrou par métrique, une recherche dans un dict et un bisect par
+  observation) ;
+- métriques calculées à la collecte (`registry.callback`) pour les états
+  déjà tenus par les composants du processus : file d'écriture, cache
+  de score, compteurs d'usage, balayage des échus, Mobile Money.
+
+MetricsMiddleware (ASGI pur, sans BaseHTTPMiddleware) mesure la latence par
+route (gabarit de chemin, jamais l'URL brute) ainsi que le nombre et la
+durée des requêtes SQL exécutées pour la requête HTTP : les écoutes de
+l'engine ajoutent au compteur de la requête courante, porté par une
+ContextVar (copiée vers le thread de l'endpoint synchrone). Les écritures
+de la file d'écriture (thread dédié) ne sont comptées que globalement.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+BCRYPT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Compteur monotone, par combinaison d'étiquettes"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """Histogramme à bornes fixes, par combinaison d'étiquettes"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Par étiquettes : [compte par borne (non cumulé, + dépassement), somme]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Valeur lue à la collecte : nombre, ou dict {tuple d'étiquettes: valeur}"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Any],
+        kind: str = "gauge",
+        labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in value.items()]
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par le processus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Any],
+        kind: str = "gauge",
+        labelnames: Sequence[str] = ()
+    ) -> CallbackMetric:
+        """Métrique calculée à chaque collecte (remplace une éventuelle précédente)"""
+        metric = CallbackMetric(name, documentation, callback, kind, labelnames)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ----- Requêtes SQL par requête HTTP -----
+
+# [nombre de requêtes, durée cumulée en secondes] de la requête HTTP courante
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def instrument_engine(engine: Engine):
+    """Compte et chronomètre les requêtes SQL de l'engine"""
+
+    perf_counter = time.perf_counter
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started_at = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        db_queries.inc()
+        current = _request_queries.get()
+        if current is not None:
+            current[0] += 1
+            started = getattr(context, "metrics_started_at", None)
+            if started is not None:
+                current[1] += perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Latence et requêtes SQL par route (middleware ASGI)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_queries.reset(token)
+            # Gabarit de la route (/loans/{loan_id}) : cardinalité bornée
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], path, str(status_code[0])
+            )
+            http_request_db_queries.observe(queries[0], path)
+            http_request_db_duration.observe(queries[1], path)
+
+
+# Registre partagé par le processus
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latence des requêtes HTTP par route",
+    LATENCY_BUCKETS, ("method", "route", "status")
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "Requêtes SQL exécutées par requête HTTP",
+    QUERY_COUNT_BUCKETS, ("route",)
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Temps SQL cumulé par requête HTTP",
+    LATENCY_BUCKETS, ("route",)
+)
+db_queries = registry.counter("db_queries_total", "Requêtes SQL exécutées (toutes origines)")
+ussd_requests = registry.counter(
+    "ussd_requests_total", "Sauts USSD par niveau et option du menu principal", ("level", "option")
+)
+bcrypt_duration = registry.histogram(
+    "bcrypt_duration_seconds", "Durée de calcul bcrypt (hors attente du pool)",
+    BCRYPT_BUCKETS, ("operation",)
+)
+loans_requested = registry.counter("loans_requested_total", "Demandes de crédit traitées", ("channel",))
+loan_decisions = registry.counter("loan_decisions_total", "Décisions de crédit", ("decision",))
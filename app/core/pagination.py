@@ -0,0 +1,75 @@
+"""
+Pagination par curseur (keyset).
+
+Les listes sont triées du plus récent au plus ancien sur (horodatage, id).
+Le curseur encode la clé de la dernière ligne renvoyée ; la page suivante
+reprend strictement après elle (`(ts, id) < (:ts, :id)`), servie par
+l'index (user_id, horodatage). Contrairement à OFFSET, le coût d'une page
+ne dépend pas de sa position dans l'historique.
+
+Les horodatages doivent être écrits par l'application (datetime.now()) et
+non par un défaut serveur : sous SQLite, les dates sont comparées comme du
+texte, et CURRENT_TIMESTAMP ('AAAA-MM-JJ HH:MM:SS', sans microsecondes) se
+classe avant la même seconde liée par le curseur ('…:SS.000000') : la
+ligne du curseur reviendrait en boucle. La migration 8 réécrit les lignes
+anciennes au format canonique ; les modèles fixent un défaut Python.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Curseur opaque (base64 URL) d'une clé (horodatage, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Clé (horodatage, id) d'un curseur ; ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+def paginate_desc(
+    query: Query,
+    timestamp_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+    Page d'une requête ORM, du plus récent au plus ancien.
+
+    Args:
+        query: Requête filtrée (sans tri ni limite)
+        timestamp_column: Colonne d'horodatage (ex: Loan.requested_at)
+        id_column: Clé primaire, départage les horodatages égaux
+        limit: Taille de la page
+        cursor: Curseur renvoyé par la page précédente
+
+    Returns:
+        (lignes, curseur de la page suivante ou None)
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id))
+
+    # Une ligne de plus pour savoir s'il reste une page
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
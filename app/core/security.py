@@ -1,16 +1,105 @@
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import bcrypt_duration
+
+
+class PinHashingBusyError(RuntimeError):
+    """Le pool de hachage est saturé (trop de vérifications en attente)"""
+
+
+# Pool dédié au hachage : le coût CPU de bcrypt est borné à PIN_HASH_WORKERS
+# threads (bcrypt libère le GIL), le sémaphore limite la file d'attente
+_hash_pool = ThreadPoolExecutor(
+    max_workers=settings.PIN_HASH_WORKERS,
+    thread_name_prefix="pin-hash"
+)
+_hash_slots = threading.BoundedSemaphore(settings.PIN_HASH_WORKERS + settings.PIN_HASH_QUEUE_SIZE)
+
+# Vérifications réussies récentes : (user_id, empreinte) -> True
+_verified_cache = TTLCache(max_entries=100000, ttl_seconds=settings.PIN_VERIFY_CACHE_TTL_SECONDS)
+
+
+def _run_in_hash_pool(func, *args):
+    """Exécute func dans le pool de hachage, avec contre-pression"""
+    if not _hash_slots.acquire(timeout=settings.PIN_HASH_QUEUE_TIMEOUT_SECONDS):
+        raise PinHashingBusyError("Service de vérification du PIN saturé, réessayez")
+    try:
+        return _hash_pool.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+def _timed(operation: str, func):
+    """func chronométrée dans le thread de hachage (temps de calcul seul)"""
+    def timed(*args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            bcrypt_duration.observe(time.perf_counter() - started, operation)
+    return timed
+
+
+_hashpw = _timed("hash", bcrypt.hashpw)
+_checkpw = _timed("verify", bcrypt.checkpw)
 
 
 def hash_password(password: str) -> str:
     """Hash un mot de passe avec bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+    hashed = _run_in_hash_pool(_hashpw, password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie un mot de passe contre son hash"""
-    return bcrypt.checkpw(
+    return _run_in_hash_pool(
+        _checkpw,
         plain_password.encode('utf-8'),
         hashed_password.encode('utf-8')
     )
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True si le hash n'utilise pas le coût configuré (BCRYPT_ROUNDS)"""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return False
+    return rounds != settings.BCRYPT_ROUNDS
+
+
+def _verification_key(user_id: int, plain_password: str, hashed_password: str) -> tuple:
+    """Clé de cache : le PIN en clair n'est jamais conservé"""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode('utf-8'),
+        f"{hashed_password}:{plain_password}".encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return (user_id, digest)
+
+
+def verify_password_cached(user_id: int, plain_password: str, hashed_password: str) -> bool:
+    """
+    Vérifie un mot de passe en réutilisant une vérification réussie récente.
+
+    Seuls les succès sont mis en cache ; un changement de PIN change le hash
+    et donc la clé.
+    """
+    if settings.PIN_VERIFY_CACHE_TTL_SECONDS <= 0:
+        return verify_password(plain_password, hashed_password)
+    
+    key = _verification_key(user_id, plain_password, hashed_password)
+    if _verified_cache.get(key):
+        return True
+    
+    is_valid = verify_password(plain_password, hashed_password)
+    if is_valid:
+        _verified_cache.set(key, True)
+    return is_valid
@@ -0,0 +1,220 @@
+"""
+Profilage SQL par requête HTTP (opt-in : SQL_PROFILER_ENABLED).
+
+Chaque requête HTTP reçoit un RequestProfile (porté par une ContextVar,
+copiée vers le thread de l'endpoint synchrone) que les écoutes de l'engine
+alimentent : nombre, durée et répétitions de chaque instruction. À la fin
+de la requête :
+- répétitions identiques (même SQL, mêmes paramètres : lecture redondante,
+  ex. get_user_by_msisdn rejoué par plusieurs handlers) et N+1 (même SQL
+  exécuté avec SQL_PROFILER_N_PLUS_ONE_THRESHOLD jeux de paramètres ou
+  plus : chargement paresseux en boucle) sont journalisés ;
+- au-delà du budget (SQL_QUERY_BUDGET, ou SQL_QUERY_BUDGETS par gabarit de
+  route), le mode "warn" journalise, le mode "strict" (tests) lève
+  QueryBudgetExceeded.
+
+Les requêtes plus lentes que SQL_SLOW_QUERY_MS sont journalisées avec
+l'empreinte de l'instruction et celle des paramètres liés (HMAC : deux
+exécutions identiques se reconnaissent sans exposer MSISDN ni montants).
+
+Hors HTTP (scripts, suite de services) :
+    with profile_queries("saut USSD", budget=10) as profile:
+        ...
+    check_profile(profile, mode="strict")
+"""
+import hashlib
+import hmac
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("warn", "strict")
+
+# Listes IN dépliées : "IN (?, ?, ?)" et "IN (%(p_1)s, %(p_2)s)" regroupées
+_EXPANDED_IN = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Trop de requêtes SQL pour une requête HTTP (mode strict)"""
+
+
+def normalize_statement(statement: str) -> str:
+    """SQL sur une ligne, listes IN dépliées réduites à un seul paramètre"""
+    return _EXPANDED_IN.sub("(?...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def statement_fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize_statement(statement).encode("utf-8")).hexdigest()[:12]
+
+
+def parameters_fingerprint(parameters: Any) -> str:
+    """Empreinte des paramètres liés (HMAC : les valeurs ne sont pas réversibles)"""
+    return hmac.new(
+        settings.SECRET_KEY.encode("utf-8"), repr(parameters).encode("utf-8"), hashlib.sha256
+    ).hexdigest()[:12]
+
+
+class RequestProfile:
+    """Requêtes SQL exécutées pendant une requête HTTP (ou un bloc profilé)"""
+
+    def __init__(self, label: str = "", budget: Optional[int] = None):
+        self.label = label
+        self.budget = budget
+        self.query_count = 0
+        self.total_seconds = 0.0
+        # SQL normalisé -> [exécutions, durée, {empreinte des paramètres: exécutions}]
+        self.statements: Dict[str, list] = {}
+
+    def record(self, statement: str, parameters: Any, elapsed: float):
+        self.query_count += 1
+        self.total_seconds += elapsed
+        key = normalize_statement(statement)
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = [0, 0.0, {}]
+        entry[0] += 1
+        entry[1] += elapsed
+        params = parameters_fingerprint(parameters)
+        entry[2][params] = entry[2].get(params, 0) + 1
+
+    def repeated(self) -> List[Dict[str, Any]]:
+        """Instructions rejouées avec exactement les mêmes paramètres"""
+        found = []
+        for statement, (count, _, params) in self.statements.items():
+            duplicates = count - len(params)
+            if duplicates:
+                found.append({"statement": statement, "executions": count, "duplicates": duplicates})
+        return sorted(found, key=lambda item: -item["duplicates"])
+
+    def n_plus_one(self, threshold: int) -> List[Dict[str, Any]]:
+        """Instructions exécutées avec au moins `threshold` jeux de paramètres"""
+        found = [
+            {"statement": statement, "executions": count, "distinct_parameters": len(params)}
+            for statement, (count, _, params) in self.statements.items()
+            if len(params) >= threshold
+        ]
+        return sorted(found, key=lambda item: -item["distinct_parameters"])
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.query_count > self.budget
+
+    def summary(self, n_plus_one_threshold: Optional[int] = None) -> Dict[str, Any]:
+        threshold = n_plus_one_threshold or settings.SQL_PROFILER_N_PLUS_ONE_THRESHOLD
+        return {
+            "label": self.label,
+            "queries": self.query_count,
+            "sql_ms": round(self.total_seconds * 1000, 2),
+            "budget": self.budget,
+            "repeated": self.repeated(),
+            "n_plus_one": self.n_plus_one(threshold),
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+def install_profiler(engine: Engine, slow_query_ms: Optional[float] = None):
+    """Écoutes de l'engine : profil courant et journal des requêtes lentes"""
+    slow_seconds = (settings.SQL_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms) / 1000
+    perf_counter = time.perf_counter
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.profiler_started_at = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "profiler_started_at", None)
+        elapsed = perf_counter() - started if started is not None else 0.0
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, parameters, elapsed)
+        if elapsed >= slow_seconds:
+            logger.warning(
+                "Requête SQL lente : %.1f ms [sql=%s params=%s] %s",
+                elapsed * 1000,
+                statement_fingerprint(statement),
+                parameters_fingerprint(parameters),
+                normalize_statement(statement)[:500]
+            )
+
+
+@contextmanager
+def profile_queries(label: str = "", budget: Optional[int] = None) -> Iterator[RequestProfile]:
+    """Profile les requêtes SQL du bloc (engine instrumenté par install_profiler)"""
+    profile = RequestProfile(label, budget)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def check_profile(profile: RequestProfile, mode: Optional[str] = None):
+    """Journalise répétitions et N+1 ; budget dépassé : avertissement ou exception"""
+    mode = mode or settings.SQL_PROFILER_MODE
+    summary = None
+    if profile.repeated() or profile.n_plus_one(settings.SQL_PROFILER_N_PLUS_ONE_THRESHOLD):
+        summary = profile.summary()
+        logger.warning("Requêtes SQL répétées [%s] : %s", profile.label, summary)
+    if not profile.over_budget():
+        return
+    message = (
+        f"Budget SQL dépassé [{profile.label}] : {profile.query_count} requêtes "
+        f"pour un budget de {profile.budget}"
+    )
+    if mode == "strict":
+        raise QueryBudgetExceeded(message)
+    logger.warning("%s : %s", message, summary or profile.summary())
+
+
+def route_budget(route_path: str) -> int:
+    return settings.SQL_QUERY_BUDGETS.get(route_path, settings.SQL_QUERY_BUDGET)
+
+
+class SQLProfilerMiddleware:
+    """Profil SQL par requête HTTP (middleware ASGI)"""
+
+    def __init__(self, app, mode: Optional[str] = None):
+        if (mode or settings.SQL_PROFILER_MODE) not in MODES:
+            raise ValueError(f"SQL_PROFILER_MODE inconnu: {mode or settings.SQL_PROFILER_MODE}")
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+
+        async def send_with_headers(message):
+            # Requêtes exécutées avant l'envoi des en-têtes (endpoints synchrones : toutes)
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-queries", str(profile.query_count).encode()))
+                headers.append((b"x-sql-time-ms", f"{profile.total_seconds * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_profile.reset(token)
+
+        route = scope.get("route")
+        path = getattr(route, "path", None) or scope["path"]
+        profile.label = f"{scope['method']} {path}"
+        profile.budget = route_budget(path)
+        check_profile(profile, self.mode)
@@ -1,14 +1,96 @@
-from sqlalchemy import create_engine
+# Database modules
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-# Création de l'engine SQLite
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
-)
+
+def sqlite_pragmas() -> dict:
+    """PRAGMA du profil SQLite configuré"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+    }
+
+
+def configure_sqlite(engine: Engine, pragmas: dict = None):
+    """Applique les PRAGMA à chaque nouvelle connexion SQLite du pool"""
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def is_sqlite_url(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def normalize_database_url(url: str) -> str:
+    """
+    Sélectionne le pilote selon DATABASE_URL.
+    
+    `postgres://` (format Heroku) et `postgresql://` utilisent psycopg 3,
+    qui gère les requêtes préparées côté serveur.
+    """
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+def _engine_options(url: str) -> dict:
+    """Options de create_engine propres au backend"""
+    if is_sqlite_url(url):
+        options = {"connect_args": {"check_same_thread": False}}  # Nécessaire pour SQLite
+        if ":memory:" not in url and url not in ("sqlite://", "sqlite:///"):
+            # Base fichier : pool de connexions réutilisées entre les requêtes
+            options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+        return options
+    
+    options = _pool_options()
+    options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+    
+    if url.startswith("postgresql"):
+        connect_args = {}
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        if url.startswith("postgresql+psycopg:"):
+            connect_args["prepare_threshold"] = (
+                settings.DB_PREPARE_THRESHOLD if settings.DB_PREPARE_THRESHOLD >= 0 else None
+            )
+        options["connect_args"] = connect_args
+    return options
+
+
+def create_app_engine(url: str) -> Engine:
+    """Crée l'engine de l'application pour l'URL donnée"""
+    url = normalize_database_url(url)
+    app_engine = create_engine(url, **_engine_options(url))
+    if is_sqlite_url(url) and settings.SQLITE_TUNING_ENABLED:
+        configure_sqlite(app_engine)
+    return app_engine
+
+
+# Création de l'engine
+engine = create_app_engine(settings.DATABASE_URL)
 
 # Session locale
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,314 @@
+"""
+Migrations de schéma versionnées.
+
+`Base.metadata.create_all` crée les tables manquantes mais ne modifie pas
+les tables existantes. Chaque migration est numérotée, appliquée une seule
+fois, et enregistrée dans la table `schema_migrations`. Les migrations
+doivent rester idempotentes : sur une base neuve, `create_all` a déjà créé
+les colonnes et index déclarés dans les modèles.
+
+Ajouter une migration :
+    @migration(3, "description")
+    def _add_something(engine):
+        ...
+
+Plusieurs workers peuvent démarrer en même temps : `run_migrations` prend
+un verrou exclusif (verrou consultatif PostgreSQL, fichier verrouillé à
+côté de la base SQLite) et relit les versions appliquées une fois le verrou
+obtenu, pour qu'une migration et ses rattrapages ne tournent qu'une fois.
+
+Utilisation manuelle:
+    python -m app.db.migrations            # applique les migrations en attente
+    python -m app.db.migrations status     # liste les migrations
+"""
+import json
+import logging
+import sys
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table,
+    bindparam, inspect, insert, select, text, update
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.db.models import AuditLog, AuditEventType
+
+logger = logging.getLogger(__name__)
+
+LOAN_EVENT_TYPES = [
+    AuditEventType.LOAN_REQUEST,
+    AuditEventType.LOAN_DECISION,
+    AuditEventType.PAYOUT_SIMULATED,
+    AuditEventType.REPAY,
+]
+
+# Clé du verrou consultatif PostgreSQL (pg_advisory_lock) des migrations
+MIGRATION_LOCK_KEY = 7_301_640_905
+
+# Table de suivi, hors de Base pour ne pas être confondue avec les modèles
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Engine], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Enregistre une migration (les versions doivent être croissantes)"""
+    def decorator(func: Callable[[Engine], None]):
+        if MIGRATIONS and MIGRATIONS[-1].version >= version:
+            raise ValueError(f"Version de migration non croissante: {version}")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return decorator
+
+
+def applied_versions(engine: Engine) -> Dict[int, str]:
+    """Versions déjà appliquées"""
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        rows = conn.execute(select(schema_migrations.c.version, schema_migrations.c.description))
+        return {row.version: row.description for row in rows}
+
+
+@contextmanager
+def migration_lock(engine: Engine) -> Iterator[None]:
+    """
+    Verrou exclusif entre processus le temps d'appliquer les migrations.
+
+    PostgreSQL : verrou consultatif de session, sur une connexion dédiée.
+    SQLite : flock sur `<base>.migrate-lock` (un BEGIN IMMEDIATE bloquerait
+    les écritures des migrations elles-mêmes, faites sur d'autres connexions).
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                conn.commit()
+        return
+
+    database = engine.url.database if engine.dialect.name == "sqlite" else None
+    if not database or database == ":memory:":
+        # Base en mémoire : propre au processus
+        yield
+        return
+
+    import fcntl
+
+    with open(f"{database}.migrate-lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Applique les migrations en attente, dans l'ordre.
+
+    Sans migration en attente, aucun verrou n'est pris (démarrage courant).
+
+    Returns:
+        Versions appliquées
+    """
+    # Table de suivi créée sous verrou sur une base neuve
+    done = applied_versions(engine) if inspect(engine).has_table(schema_migrations.name) else {}
+    if all(step.version in done for step in MIGRATIONS):
+        return []
+
+    applied = []
+    with migration_lock(engine):
+        # Relu sous verrou : un autre worker a pu migrer entre-temps
+        done = applied_versions(engine)
+        for step in MIGRATIONS:
+            if step.version in done:
+                continue
+            logger.info("Migration %s: %s", step.version, step.description)
+            step.apply(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(schema_migrations).values(
+                    version=step.version,
+                    description=step.description
+                ))
+            applied.append(step.version)
+    return applied
+
+
+def _create_indexes(engine: Engine, table, names: List[str]):
+    """Crée les index nommés déclarés sur le modèle s'ils n'existent pas"""
+    for index in table.indexes:
+        if index.name in names:
+            index.create(bind=engine, checkfirst=True)
+
+
+# ========== MIGRATIONS ==========
+
+@migration(1, "audit_logs.loan_id indexé + rattrapage depuis event_data")
+def _audit_logs_loan_id(engine: Engine):
+    columns = {c["name"] for c in inspect(engine).get_columns("audit_logs")}
+    if "loan_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE audit_logs ADD COLUMN loan_id INTEGER REFERENCES loans(id)"))
+    _create_indexes(engine, AuditLog.__table__, ["ix_audit_logs_loan_id_created_at"])
+    with Session(engine) as db:
+        backfill_audit_loan_ids(db)
+
+
+@migration(2, "index composites des requêtes fréquentes (loans, consents, audit_logs)")
+def _composite_indexes(engine: Engine):
+    from app.db.models import Consent, Loan
+
+    _create_indexes(engine, Loan.__table__, ["ix_loans_user_id_status", "ix_loans_user_id_requested_at"])
+    _create_indexes(engine, Consent.__table__, ["ix_consents_user_id_type_accepted"])
+    _create_indexes(engine, AuditLog.__table__, ["ix_audit_logs_user_id_created_at"])
+
+
+@migration(3, "scoring_data.is_stale (invalidation du cache de score)")
+def _scoring_data_is_stale(engine: Engine):
+    columns = {c["name"] for c in inspect(engine).get_columns("scoring_data")}
+    if "is_stale" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE scoring_data ADD COLUMN is_stale BOOLEAN NOT NULL DEFAULT FALSE"))
+
+
+@migration(4, "user_loan_stats : compteurs de crédits par utilisateur")
+def _user_loan_stats(engine: Engine):
+    from app.db.models import UserLoanStats
+    from app.services.loan_stats_service import LoanStatsService
+
+    UserLoanStats.__table__.create(bind=engine, checkfirst=True)
+    with Session(engine) as db:
+        LoanStatsService(db).rebuild_all()
+
+
+@migration(5, "index loans(status, due_date), événement loan_overdue et baux des tâches planifiées")
+def _overdue_sweeper(engine: Engine):
+    from app.db.models import Loan, SchedulerLease
+
+    _create_indexes(engine, Loan.__table__, ["ix_loans_status_due_date"])
+    SchedulerLease.__table__.create(bind=engine, checkfirst=True)
+    if engine.dialect.name == "postgresql":
+        # Type ENUM natif : la nouvelle valeur doit être ajoutée hors transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ALTER TYPE auditeventtype ADD VALUE IF NOT EXISTS 'LOAN_OVERDUE'"))
+
+
+@migration(6, "index audit_logs(created_at) pour l'export par période")
+def _audit_logs_created_at(engine: Engine):
+    _create_indexes(engine, AuditLog.__table__, ["ix_audit_logs_created_at"])
+
+
+@migration(7, "audit_archives : catalogue des mois d'audit archivés")
+def _audit_archives(engine: Engine):
+    from app.db.models import AuditArchive
+
+    AuditArchive.__table__.create(bind=engine, checkfirst=True)
+
+
+@migration(8, "horodatages SQLite sans microsecondes réécrits au format canonique (pagination)")
+def _canonical_timestamps(engine: Engine):
+    if engine.dialect.name != "sqlite":
+        return  # timestamptz : pas de représentation texte
+    with engine.begin() as conn:
+        for table, column in (("loans", "requested_at"), ("audit_logs", "created_at")):
+            # 'AAAA-MM-JJ HH:MM:SS' (CURRENT_TIMESTAMP) -> 'AAAA-MM-JJ HH:MM:SS.000000'
+            result = conn.execute(text(
+                f"UPDATE {table} SET {column} = {column} || '.000000' WHERE length({column}) = 19"
+            ))
+            if result.rowcount:
+                logger.info("%s.%s : %s horodatages réécrits", table, column, result.rowcount)
+
+
+@migration(9, "audit_archive_users / audit_archive_loans : présence par mois archivé")
+def _audit_archive_keys(engine: Engine):
+    from app.db.models import AuditArchiveLoan, AuditArchiveUser
+    from app.services.audit_archive import AuditArchiveService
+
+    AuditArchiveUser.__table__.create(bind=engine, checkfirst=True)
+    AuditArchiveLoan.__table__.create(bind=engine, checkfirst=True)
+    with Session(engine) as db:
+        archives = AuditArchiveService(db)
+        for partition in archives.partitions():
+            archives.index_partition(partition)
+
+
+# ========== RATTRAPAGES ==========
+
+def backfill_audit_loan_ids(db: Session, batch_size: int = 1000) -> int:
+    """
+    Renseigne audit_logs.loan_id à partir de event_data pour les anciens événements.
+
+    Parcours par lots sur la clé primaire (un commit par lot).
+
+    Returns:
+        Nombre de lignes mises à jour
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(AuditLog.id, AuditLog.event_data)
+            .where(
+                AuditLog.id > last_id,
+                AuditLog.loan_id.is_(None),
+                AuditLog.event_type.in_(LOAN_EVENT_TYPES)
+            )
+            .order_by(AuditLog.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        last_id = rows[-1].id
+        params = []
+        for row in rows:
+            try:
+                loan_id = json.loads(row.event_data or "{}").get("loan_id")
+            except ValueError:
+                continue
+            if isinstance(loan_id, int):
+                params.append({"row_id": row.id, "new_loan_id": loan_id})
+
+        if params:
+            db.connection().execute(
+                update(AuditLog.__table__)
+                .where(AuditLog.__table__.c.id == bindparam("row_id"))
+                .values(loan_id=bindparam("new_loan_id")),
+                params
+            )
+            updated += len(params)
+        db.commit()
+
+
+if __name__ == "__main__":
+    from app.db.db import engine, Base
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        done = applied_versions(engine)
+        for step in MIGRATIONS:
+            state = "appliquée" if step.version in done else "en attente"
+            print(f"{step.version:>4}  {state:<10}  {step.description}")
+    else:
+        Base.metadata.create_all(bind=engine)
+        versions = run_migrations(engine)
+        print(f"Migrations appliquées: {versions or 'aucune'}")
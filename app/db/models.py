@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, false
 from datetime import datetime
 import enum
 from app.db.db import Base
@@ -31,6 +31,7 @@ class AuditEventType(str, enum.Enum):
     LOAN_DECISION = "loan_decision"
     PAYOUT_SIMULATED = "payout_simulated"
     REPAY = "repay"
+    LOAN_OVERDUE = "loan_overdue"
 
 
 class User(Base):
@@ -48,6 +49,7 @@ class User(Base):
     
     # Relations
     wallet = relationship("Wallet", back_populates="user", uselist=False)
+    loan_stats = relationship("UserLoanStats", uselist=False)
     loans = relationship("Loan", back_populates="user", cascade="all, delete-orphan")
     consents = relationship("Consent", back_populates="user", cascade="all, delete-orphan")
     audit_logs = relationship("AuditLog", back_populates="user", cascade="all, delete-orphan")
@@ -70,6 +72,14 @@ class Wallet(Base):
 class Loan(Base):
     """Modèle de crédit"""
     __tablename__ = "loans"
+    __table_args__ = (
+        # Crédit actif d'un utilisateur (filtre user_id + status)
+        Index("ix_loans_user_id_status", "user_id", "status"),
+        # Historique d'un utilisateur trié par date de demande
+        Index("ix_loans_user_id_requested_at", "user_id", "requested_at"),
+        # Crédits arrivés à échéance (balayage des retards)
+        Index("ix_loans_status_due_date", "status", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -79,7 +89,8 @@ class Loan(Base):
     interest_rate = Column(Float, default=0.0, nullable=False)
     duration_days = Column(Integer, nullable=False)
     status = Column(SQLEnum(LoanStatus), default=LoanStatus.PENDING, nullable=False)
-    requested_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Clé de pagination : écrite par l'application (format canonique), voir app/core/pagination.py
+    requested_at = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now(), nullable=False)
     decided_at = Column(DateTime(timezone=True), nullable=True)
     due_date = Column(DateTime(timezone=True), nullable=True)
     repaid_at = Column(DateTime(timezone=True), nullable=True)
@@ -93,9 +104,64 @@ class Loan(Base):
     user = relationship("User", back_populates="loans")
 
 
+class UserLoanStats(Base):
+    """Compteurs de crédits par utilisateur (dénormalisés, maintenus par LoanStatsService)"""
+    __tablename__ = "user_loan_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_loans_count = Column(Integer, default=0, nullable=False)
+    repaid_loans_count = Column(Integer, default=0, nullable=False)
+    overdue_loans_count = Column(Integer, default=0, nullable=False)
+    active_loans_count = Column(Integer, default=0, nullable=False)  # ACTIVE ou PENDING
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class SchedulerLease(Base):
+    """Bail d'une tâche planifiée : un seul nœud l'exécute à la fois"""
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class AuditArchive(Base):
+    """Catalogue des mois d'audit archivés hors de audit_logs (NDJSON gzip)"""
+    __tablename__ = "audit_archives"
+    
+    month = Column(String, primary_key=True)  # "AAAA-MM"
+    path = Column(String, nullable=False)  # Relatif à AUDIT_ARCHIVE_DIR
+    row_count = Column(Integer, nullable=False)
+    min_id = Column(Integer, nullable=False)
+    max_id = Column(Integer, nullable=False)
+    first_event_at = Column(DateTime(timezone=True), nullable=False)
+    last_event_at = Column(DateTime(timezone=True), nullable=False)
+    sha256 = Column(String, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AuditArchiveUser(Base):
+    """Utilisateurs présents dans un mois archivé (lectures du trail sans ouvrir les fichiers)"""
+    __tablename__ = "audit_archive_users"
+    
+    user_id = Column(Integer, primary_key=True)
+    month = Column(String, ForeignKey("audit_archives.month"), primary_key=True)
+
+
+class AuditArchiveLoan(Base):
+    """Crédits présents dans un mois archivé"""
+    __tablename__ = "audit_archive_loans"
+    
+    loan_id = Column(Integer, primary_key=True)
+    month = Column(String, ForeignKey("audit_archives.month"), primary_key=True)
+
+
 class Consent(Base):
     """Modèle de consentement (T&C)"""
     __tablename__ = "consents"
+    __table_args__ = (
+        Index("ix_consents_user_id_type_accepted", "user_id", "consent_type", "accepted"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -113,14 +179,23 @@ class Consent(Base):
 class AuditLog(Base):
     """Modèle d'audit trail"""
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Trail d'un crédit : une seule lecture par plage, déjà triée
+        Index("ix_audit_logs_loan_id_created_at", "loan_id", "created_at"),
+        # Logs d'un utilisateur, du plus récent au plus ancien
+        Index("ix_audit_logs_user_id_created_at", "user_id", "created_at"),
+        # Export par période (conformité)
+        Index("ix_audit_logs_created_at", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Nullable pour les événements système
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=True)  # Événements liés à un crédit
     event_type = Column(SQLEnum(AuditEventType), nullable=False)
     event_data = Column(Text, nullable=True)  # JSON string pour les détails
     channel = Column(String, nullable=True)  # "USSD" ou "APP"
     ip_address = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now(), nullable=False)
     
     # Relations
     user = relationship("User", back_populates="audit_logs")
@@ -151,6 +226,7 @@ class ScoringData(Base):
     score = Column(Float, nullable=True)
     score_version = Column(String, default="1.0", nullable=False)
     calculated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    is_stale = Column(Boolean, default=False, server_default=false(), nullable=False)  # Invalidé par un événement crédit
     
     # Relations
     user = relationship("User")
@@ -0,0 +1,94 @@
+"""
+Unité de travail : une opération métier, une transaction.
+
+Une opération (demande de crédit, remboursement, inscription,
+consentement) ouvre une unité de travail sur la session de la requête.
+Les services appelés pendant l'opération y participent au lieu de
+commiter eux-mêmes :
+- leurs modifications restent dans la session et sont flushées au plus une
+  fois, au moment où un identifiant est nécessaire ou au commit ;
+- les événements d'audit sont accumulés puis insérés en masse dans la même
+  transaction, juste avant l'unique commit (pas de crédit sans trail) ;
+- les effets hors base (caches mémoire) sont différés après le commit.
+
+Une unité ouverte alors qu'une autre est active sur la même session se
+joint à elle : seule l'unité la plus externe commite. En cas d'exception,
+tout est annulé, événements d'audit compris.
+
+Utilisation:
+    with unit_of_work(db) as uow:
+        db.add(loan)
+        uow.flush()                      # loan.id
+        audit_service.log_event(...)     # ajouté à l'unité
+        uow.after_commit(lambda: ...)
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.db.models import AuditLog
+
+_SESSION_KEY = "unit_of_work"
+
+
+class UnitOfWork:
+    """Transaction d'une opération métier sur une session"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.audit_rows: List[Dict[str, Any]] = []
+        self._after_commit: List[Callable[[], None]] = []
+
+    def flush(self):
+        """Flush explicite (identifiants générés nécessaires avant le commit)"""
+        self.db.flush()
+
+    def add_audit(self, row: Dict[str, Any]):
+        """Ajoute un événement d'audit (colonnes de AuditLog), inséré au commit"""
+        self.audit_rows.append(row)
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Action à exécuter une fois la transaction commitée"""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        """Insère les événements d'audit en masse puis commite une seule fois"""
+        if self.audit_rows:
+            self.db.flush()
+            self.db.execute(insert(AuditLog), self.audit_rows)
+        self.db.commit()
+        self.audit_rows = []
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.audit_rows = []
+        self._after_commit = []
+        self.db.rollback()
+
+
+def current_unit_of_work(db: Session) -> Optional[UnitOfWork]:
+    """Unité de travail active sur la session, s'il y en a une"""
+    return db.info.get(_SESSION_KEY)
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[UnitOfWork]:
+    """Ouvre une unité de travail, ou rejoint celle déjà active sur la session"""
+    current = current_unit_of_work(db)
+    if current is not None:
+        yield current
+        return
+
+    uow = UnitOfWork(db)
+    db.info[_SESSION_KEY] = uow
+    try:
+        yield uow
+        # Retirée avant le commit : les rappels peuvent ouvrir leur propre unité
+        del db.info[_SESSION_KEY]
+        uow.commit()
+    except BaseException:
+        db.info.pop(_SESSION_KEY, None)
+        uow.rollback()
+        raise
@@ -0,0 +1,125 @@
+"""
+File d'écriture à rédacteur unique.
+
+SQLite n'accepte qu'un écrivain à la fois : des écritures concurrentes se
+disputent le verrou (`database is locked`) et paient chacune un fsync. Les
+écritures soumises ici sont exécutées par un seul thread, qui regroupe les
+travaux en attente dans une même transaction (un seul commit par lot).
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.db import SessionLocal, is_sqlite_url
+
+logger = logging.getLogger(__name__)
+
+WriteJob = Callable[[Session], Any]
+
+
+class WriteQueue:
+    """Exécute les travaux d'écriture en série, par lots transactionnels"""
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = 100, enabled: bool = True):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._jobs: "queue.Queue[Tuple[WriteJob, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Métriques
+        self.batches = 0
+        self.jobs_done = 0
+
+    def execute(self, job: WriteJob) -> Any:
+        """
+        Exécute `job(session)` et attend son commit.
+
+        Le travail ne doit pas appeler commit() : la file s'en charge.
+        Si la file est désactivée, le travail s'exécute dans le thread appelant.
+        """
+        if not self.enabled:
+            with self.session_factory() as db:
+                result = job(db)
+                db.commit()
+                return result
+        return self.submit(job).result()
+
+    def submit(self, job: WriteJob) -> Future:
+        """Met un travail en file et retourne son Future"""
+        self._ensure_started()
+        future: Future = Future()
+        self._jobs.put((job, future))
+        return future
+
+    def pending(self) -> int:
+        return self._jobs.qsize()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute_batch(batch)
+
+    def _execute_batch(self, batch: List[Tuple[WriteJob, Future]]):
+        """Un commit pour tout le lot ; en cas d'échec, rejoue chaque travail seul"""
+        db = self.session_factory()
+        try:
+            results = [job(db) for job, _ in batch]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                for item in batch:
+                    self._run_single(item)
+            return
+        else:
+            db.close()
+
+        self.batches += 1
+        self.jobs_done += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_single(self, item: Tuple[WriteJob, Future]):
+        job, future = item
+        db = self.session_factory()
+        try:
+            result = job(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            future.set_exception(e)
+        else:
+            self.batches += 1
+            self.jobs_done += 1
+            future.set_result(result)
+        finally:
+            db.close()
+
+
+# File partagée par le processus (utile uniquement avec SQLite)
+write_queue = WriteQueue(
+    session_factory=SessionLocal,
+    max_batch=settings.DB_WRITE_QUEUE_MAX_BATCH,
+    enabled=settings.DB_WRITE_QUEUE_ENABLED and is_sqlite_url(settings.DATABASE_URL)
+)
@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+from anyio import to_thread
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.security import PinHashingBusyError
+from app.core.sql_profiler import SQLProfilerMiddleware, install_profiler
 from app.db.db import engine, Base
+from app.db.migrations import run_migrations
+from app.services.mobile_money_connector import MobileMoneyUnavailableError, mobile_money_connector
+from app.services.overdue_sweeper import overdue_sweeper
+from app.services.usage_counter import usage_counter
 from app.routers import (
-    health, ussd, auth, loan, consent, scoring, wallet, audit
+    health, ussd, auth, loan, consent, scoring, wallet, audit, metrics
 )
 
 # Création de l'application FastAPI
@@ -27,11 +37,53 @@ app = FastAPI(
     version="2.0.0"
 )
 
+if settings.SQL_PROFILER_ENABLED:
+    install_profiler(engine)
+    app.add_middleware(SQLProfilerMiddleware)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
     """Créer les tables de base de données au démarrage"""
+    # Les endpoints sont synchrones : FastAPI les exécute dans le pool de
+    # threads d'anyio, dont on borne ici la taille
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_MAX_WORKERS
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    usage_counter.start()
+    if settings.OVERDUE_SWEEPER_ENABLED:
+        overdue_sweeper.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Écrire les compteurs encore en file avant l'arrêt"""
+    overdue_sweeper.stop()
+    usage_counter.stop()
+    mobile_money_connector.close()
+
+
+@app.exception_handler(PinHashingBusyError)
+async def pin_hashing_busy_handler(request: Request, exc: PinHashingBusyError):
+    """Contre-pression du pool de hachage : le client doit réessayer"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(MobileMoneyUnavailableError)
+async def mobile_money_unavailable_handler(request: Request, exc: MobileMoneyUnavailableError):
+    """Fournisseur Mobile Money indisponible et aucune donnée en cache"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after_seconds + 0.5))}
+    )
 
 
 # Inclusion des routers
@@ -43,6 +95,8 @@ app.include_router(scoring.router)
 app.include_router(loan.router)
 app.include_router(wallet.router)
 app.include_router(audit.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -60,6 +114,7 @@ async def root():
             "loans": "/loans",
             "wallet": "/wallet",
             "audit": "/audit",
-            "ussd": "/ussd"
+            "ussd": "/ussd",
+            "metrics": "/metrics"
         }
     }
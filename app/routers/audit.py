@@ -1,29 +1,37 @@
 """
 Router pour l'audit trail
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from app.core.pagination import MAX_PAGE_SIZE
+from app.db.models import AuditEventType
 from app.schemas.audit import AuditLogResponse
-from app.services.auth_service import AuthService
-from app.services.audit_service import AuditService
+from app.services.audit_export import FORMATS, MEDIA_TYPES, AuditExportService, export_filename
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(prefix="/audit", tags=["Audit"])
 
 
 @router.get("/user/{msisdn}/logs", response_model=list[AuditLogResponse])
-async def get_user_audit_logs(
+def get_user_audit_logs(
     msisdn: str,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    event_type: Optional[AuditEventType] = None,
+    services: ServiceContainer = Depends(get_services)
 ):
     """
-    Récupère les logs d'audit d'un utilisateur.
+    Récupère les logs d'audit d'un utilisateur, page par page.
     
     - **msisdn**: Numéro de téléphone
-    - **limit**: Nombre maximum de logs à retourner (défaut: 100)
+    - **limit**: Taille de la page (défaut et max: 100)
+    - **cursor**: Curseur de la page suivante (en-tête `X-Next-Cursor` de la réponse précédente)
+    - **event_type**: Filtrer sur un type d'événement
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -32,23 +40,87 @@ async def get_user_audit_logs(
             detail="Utilisateur introuvable"
         )
     
-    audit_service = AuditService(db)
-    logs = audit_service.get_user_audit_logs(user.id, limit)
+    audit_service = services.audit
+    try:
+        logs, next_cursor = audit_service.get_user_audit_page(user.id, limit, cursor, event_type)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [AuditLogResponse.model_validate(log) for log in logs]
 
 
 @router.get("/loan/{loan_id}/trail", response_model=list[AuditLogResponse])
-async def get_loan_audit_trail(
+def get_loan_audit_trail(
     loan_id: int,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère le trail d'audit complet pour un crédit.
     
     - **loan_id**: ID du crédit
     """
-    audit_service = AuditService(db)
+    audit_service = services.audit
     logs = audit_service.get_loan_audit_trail(loan_id)
     
     return [AuditLogResponse.model_validate(log) for log in logs]
+
+
+@router.get("/export")
+def export_audit_logs(
+    format: str = Query("ndjson", pattern=f"^({'|'.join(FORMATS)})$"),
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    event_type: Optional[AuditEventType] = None,
+    channel: Optional[str] = None,
+    msisdn: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Exporte l'audit trail en flux (NDJSON ou CSV, gzip optionnel).
+    
+    Lecture par curseur serveur : la mémoire utilisée ne dépend pas du
+    nombre d'événements exportés.
+    
+    - **format**: ndjson (défaut) ou csv
+    - **gzip**: Compresser la réponse
+    - **start** / **end**: Période [start, end[ (ISO 8601)
+    - **event_type**, **channel**, **msisdn**: Filtres optionnels
+    """
+    user_id = None
+    if msisdn:
+        user = services.auth.get_user_by_msisdn(msisdn)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Utilisateur introuvable"
+            )
+        user_id = user.id
+    
+    try:
+        chunks = AuditExportService().stream(
+            fmt=format,
+            compress=gzip,
+            start=start,
+            end=end,
+            event_type=event_type,
+            channel=channel,
+            user_id=user_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(format, gzip)}"'}
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers=headers
+    )
@@ -2,21 +2,20 @@
 Router pour l'authentification et la gestion des utilisateurs
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
 from app.schemas.auth import (
     UserCreate, UserResponse, PinSetRequest, PinVerifyRequest, PinVerifyResponse
 )
-from app.services.auth_service import AuthService
+from app.services.container import ServiceContainer, get_services
+from app.services.usage_counter import usage_counter
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     user_data: UserCreate,
     channel: str = "APP",
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Crée un nouveau compte utilisateur.
@@ -25,7 +24,7 @@ async def register(
     - **full_name**: Nom complet (optionnel)
     """
     try:
-        auth_service = AuthService(db)
+        auth_service = services.auth
         user = auth_service.create_user(
             msisdn=user_data.msisdn,
             full_name=user_data.full_name,
@@ -46,10 +45,10 @@ async def register(
 
 
 @router.post("/set-pin", status_code=status.HTTP_200_OK)
-async def set_pin(
+def set_pin(
     pin_data: PinSetRequest,
     channel: str = "APP",
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Définit ou met à jour le PIN d'un utilisateur.
@@ -58,7 +57,7 @@ async def set_pin(
     - **pin**: PIN à 4 chiffres
     """
     try:
-        auth_service = AuthService(db)
+        auth_service = services.auth
         user = auth_service.get_user_by_msisdn(pin_data.msisdn)
         
         if not user:
@@ -77,9 +76,9 @@ async def set_pin(
 
 
 @router.post("/verify-pin", response_model=PinVerifyResponse)
-async def verify_pin(
+def verify_pin(
     pin_data: PinVerifyRequest,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Vérifie le PIN d'un utilisateur.
@@ -87,7 +86,7 @@ async def verify_pin(
     - **msisdn**: Numéro de téléphone
     - **pin**: PIN à vérifier
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(pin_data.msisdn)
     
     if not user:
@@ -115,16 +114,16 @@ async def verify_pin(
 
 
 @router.get("/user/{msisdn}", response_model=UserResponse)
-async def get_user(
+def get_user(
     msisdn: str,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère les informations d'un utilisateur.
     
     - **msisdn**: Numéro de téléphone
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -140,3 +139,13 @@ async def get_user(
         has_pin=user.pin_hash is not None,
         created_at=user.created_at
     )
+
+
+@router.get("/usage-counter/stats")
+def get_usage_counter_stats():
+    """
+    Métriques des compteurs d'utilisation agrégés.
+    
+    Utilisateurs en attente d'écriture, nombre de flushs et latences (ms).
+    """
+    return usage_counter.stats()
@@ -2,20 +2,17 @@
 Router pour la gestion des consentements (T&C)
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
 from app.db.models import ConsentType
 from app.schemas.consent import ConsentRequest, ConsentResponse, ConsentCheckResponse
-from app.services.auth_service import AuthService
-from app.services.consent_service import ConsentService
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(prefix="/consent", tags=["Consent"])
 
 
 @router.post("/accept", response_model=ConsentResponse, status_code=status.HTTP_201_CREATED)
-async def accept_consent(
+def accept_consent(
     consent_data: ConsentRequest,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Accepte ou refuse un consentement (T&C).
@@ -27,7 +24,7 @@ async def accept_consent(
     - **accepted**: True si accepté, False si refusé
     """
     try:
-        auth_service = AuthService(db)
+        auth_service = services.auth
         user = auth_service.get_user_by_msisdn(consent_data.msisdn)
         
         if not user:
@@ -36,7 +33,7 @@ async def accept_consent(
                 detail="Utilisateur introuvable"
             )
         
-        consent_service = ConsentService(db)
+        consent_service = services.consent
         consent = consent_service.accept_consent(
             user=user,
             consent_type=consent_data.consent_type,
@@ -54,16 +51,16 @@ async def accept_consent(
 
 
 @router.get("/check/{msisdn}", response_model=ConsentCheckResponse)
-async def check_consents(
+def check_consents(
     msisdn: str,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Vérifie le statut des consentements d'un utilisateur.
     
     - **msisdn**: Numéro de téléphone
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -72,23 +69,23 @@ async def check_consents(
             detail="Utilisateur introuvable"
         )
     
-    consent_service = ConsentService(db)
+    consent_service = services.consent
     result = consent_service.check_consents(user)
     
     return ConsentCheckResponse(**result)
 
 
 @router.get("/text/{consent_type}")
-async def get_consent_text(
+def get_consent_text(
     consent_type: ConsentType,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère le texte d'un consentement.
     
     - **consent_type**: Type de consentement
     """
-    consent_service = ConsentService(db)
+    consent_service = services.consent
     text = consent_service.get_consent_text(consent_type)
     
     return {
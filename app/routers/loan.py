@@ -1,15 +1,16 @@
 """
 Router pour la gestion des microcrédits
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.db.models import LoanStatus
 from app.schemas.loan import (
     LoanRequest, LoanResponse, LoanDecisionResponse,
     LoanRepayRequest, LoanRepayResponse, LoanStatusResponse
 )
 from app.services.auth_service import AuthService
-from app.services.loan_service import LoanService
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(prefix="/loans", tags=["Loans"])
 
@@ -17,10 +18,9 @@ router = APIRouter(prefix="/loans", tags=["Loans"])
 def get_user_with_pin_verification(
     msisdn: str,
     pin: str,
-    db: Session
+    auth_service: AuthService
 ):
     """Helper pour vérifier l'utilisateur et son PIN"""
-    auth_service = AuthService(db)
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -45,10 +45,10 @@ def get_user_with_pin_verification(
 
 
 @router.post("/request", response_model=LoanDecisionResponse, status_code=status.HTTP_201_CREATED)
-async def request_loan(
+def request_loan(
     loan_request: LoanRequest,
     channel: str = "APP",
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Demande un microcrédit.
@@ -63,11 +63,11 @@ async def request_loan(
         user = get_user_with_pin_verification(
             loan_request.msisdn,
             loan_request.pin,
-            db
+            services.auth
         )
         
         # Traiter la demande
-        loan_service = LoanService(db)
+        loan_service = services.loan
         loan = loan_service.request_loan(
             user=user,
             amount=loan_request.amount,
@@ -93,10 +93,10 @@ async def request_loan(
 
 
 @router.post("/repay", response_model=LoanRepayResponse)
-async def repay_loan(
+def repay_loan(
     repay_request: LoanRepayRequest,
     channel: str = "APP",
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Rembourse un crédit.
@@ -111,11 +111,11 @@ async def repay_loan(
         user = get_user_with_pin_verification(
             repay_request.msisdn,
             repay_request.pin,
-            db
+            services.auth
         )
         
         # Traiter le remboursement
-        loan_service = LoanService(db)
+        loan_service = services.loan
         result = loan_service.repay_loan(
             user=user,
             loan_id=repay_request.loan_id,
@@ -132,10 +132,10 @@ async def repay_loan(
 
 
 @router.get("/{loan_id}/status", response_model=LoanStatusResponse)
-async def get_loan_status(
+def get_loan_status(
     loan_id: int,
     msisdn: str,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère le statut d'un crédit.
@@ -144,7 +144,7 @@ async def get_loan_status(
     - **msisdn**: Numéro de téléphone
     """
     try:
-        auth_service = AuthService(db)
+        auth_service = services.auth
         user = auth_service.get_user_by_msisdn(msisdn)
         
         if not user:
@@ -153,7 +153,7 @@ async def get_loan_status(
                 detail="Utilisateur introuvable"
             )
         
-        loan_service = LoanService(db)
+        loan_service = services.loan
         status_data = loan_service.get_loan_status(user, loan_id)
         
         return LoanStatusResponse(**status_data)
@@ -165,16 +165,23 @@ async def get_loan_status(
 
 
 @router.get("/user/{msisdn}/history", response_model=list[LoanResponse])
-async def get_loan_history(
+def get_loan_history(
     msisdn: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status_filter: Optional[LoanStatus] = Query(None, alias="status"),
+    services: ServiceContainer = Depends(get_services)
 ):
     """
-    Récupère l'historique des crédits d'un utilisateur.
+    Récupère l'historique des crédits d'un utilisateur, page par page.
     
     - **msisdn**: Numéro de téléphone
+    - **limit**: Taille de la page (défaut: 20, max: 100)
+    - **cursor**: Curseur de la page suivante (en-tête `X-Next-Cursor` de la réponse précédente)
+    - **status**: Filtrer sur un statut
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -183,7 +190,15 @@ async def get_loan_history(
             detail="Utilisateur introuvable"
         )
     
-    loan_service = LoanService(db)
-    loans = loan_service.get_user_loans(user)
+    loan_service = services.loan
+    try:
+        loans, next_cursor = loan_service.get_loan_history(user, limit, cursor, status_filter)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [LoanResponse.model_validate(loan) for loan in loans]
@@ -0,0 +1,56 @@
+"""
+Router des métriques Prometheus
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import CONTENT_TYPE, registry
+from app.db.write_queue import write_queue
+from app.services.consent_cache import consent_cache
+from app.services.mobile_money_connector import mobile_money_connector
+from app.services.overdue_sweeper import overdue_sweeper
+from app.services.score_cache import score_cache
+from app.services.usage_counter import usage_counter
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _mobile_money(key: str):
+    # Compteurs du cache et du disjoncteur : backend HTTP uniquement
+    return lambda: mobile_money_connector.stats().get(key)
+
+
+def _breaker_open():
+    breaker = mobile_money_connector.stats().get("circuit_breaker")
+    return None if breaker is None else int(breaker["state"] != "closed")
+
+
+# Métriques lues sur les composants du processus à chaque collecte
+registry.callback("db_write_queue_pending", "Travaux en attente dans la file d'écriture",
+                  write_queue.pending)
+registry.callback("score_cache_hit_ratio", "Part des scores servis par le cache (mémoire ou persisté)",
+                  lambda: score_cache.stats()["hit_rate"])
+registry.callback("score_cache_lookups_total", "Consultations du cache de score par résultat",
+                  lambda: {(name,): score_cache.stats()[name] for name in ("memory_hits", "persisted_hits", "misses")},
+                  kind="counter", labelnames=("result",))
+registry.callback("consent_cache_hit_ratio", "Part des statuts de consentement servis par le cache",
+                  lambda: consent_cache.stats()["hit_rate"])
+registry.callback("usage_counter_pending_users", "Utilisateurs dont les compteurs d'usage attendent l'écriture",
+                  lambda: usage_counter.stats()["pending_users"])
+registry.callback("usage_counter_flush_errors_total", "Échecs d'écriture des compteurs d'usage",
+                  lambda: usage_counter.stats()["flush_errors"], kind="counter")
+registry.callback("overdue_sweeper_runs_total", "Balayages des crédits échus",
+                  lambda: overdue_sweeper.stats()["runs"], kind="counter")
+registry.callback("loans_marked_overdue_total", "Crédits passés en retard par le balayage",
+                  lambda: overdue_sweeper.stats()["loans_marked_overdue"], kind="counter")
+registry.callback("mobile_money_cache_hit_ratio", "Part des données Mobile Money servies par le cache",
+                  _mobile_money("hit_rate"))
+registry.callback("mobile_money_stale_served_total", "Données Mobile Money périmées servies pendant une panne",
+                  _mobile_money("stale_served_on_error"), kind="counter")
+registry.callback("mobile_money_circuit_open", "Disjoncteur Mobile Money ouvert (1) ou fermé (0)",
+                  _breaker_open)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Métriques du processus au format texte Prometheus"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -2,19 +2,18 @@
 Router pour le scoring et les offres de crédit
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
 from app.schemas.scoring import ScoringDataResponse
-from app.services.auth_service import AuthService
-from app.services.scoring_service import ScoringService
+from app.services.score_cache import score_cache
+from app.services.mobile_money_connector import mobile_money_connector
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(prefix="/scoring", tags=["Scoring"])
 
 
 @router.get("/{msisdn}/offer", response_model=ScoringDataResponse)
-async def get_credit_offer(
+def get_credit_offer(
     msisdn: str,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère l'offre de crédit (score et plafond) pour un utilisateur.
@@ -24,7 +23,7 @@ async def get_credit_offer(
     Retourne le score, le montant maximum autorisé, et une explication,
     sans exposer les données brutes de scoring.
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -33,7 +32,27 @@ async def get_credit_offer(
             detail="Utilisateur introuvable"
         )
     
-    scoring_service = ScoringService(db)
+    scoring_service = services.scoring
     score_result = scoring_service.calculate_score(user)
     
     return ScoringDataResponse(**score_result)
+
+
+@router.get("/cache/stats")
+def get_score_cache_stats():
+    """
+    Statistiques du cache de score.
+    
+    Hits mémoire, hits persistés, recalculs (misses) et taux de hit.
+    """
+    return score_cache.stats()
+
+
+@router.get("/mobile-money/stats")
+def get_mobile_money_stats():
+    """
+    Statistiques du connecteur Mobile Money.
+    
+    Cache par MSISDN, état du disjoncteur et appels au fournisseur.
+    """
+    return mobile_money_connector.stats()
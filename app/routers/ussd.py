@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.db.db import get_db
-from app.services.ussd_service import USSDService
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter()
 
@@ -15,9 +13,9 @@ class USSDRequest(BaseModel):
 
 
 @router.post("/ussd")
-async def ussd_handler(
+def ussd_handler(
     request: USSDRequest,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Endpoint USSD compatible Africa's Talking - Lisalisi cash
@@ -33,22 +31,16 @@ async def ussd_handler(
     
     Format de réponse: CON ... ou END ...
     """
-    ussd_service = USSDService(db)
+    ussd_service = services.ussd
     
     # Traiter la requête USSD
     response_text, is_end = ussd_service.process_ussd_request(
         phone_number=request.phoneNumber,
-        text=request.text
+        text=request.text,
+        session_id=request.sessionId
     )
     
-    # Mettre à jour le compteur d'utilisation USSD si utilisateur existe
-    try:
-        from app.services.auth_service import AuthService
-        auth_service = AuthService(db)
-        user = auth_service.get_user_by_msisdn(request.phoneNumber)
-        if user:
-            auth_service.update_usage_count(user, "USSD")
-    except:
-        pass  # Ignorer les erreurs de comptage
+    # Compteur d'utilisation USSD (cumulé en mémoire, sans lecture de l'utilisateur)
+    services.auth.record_usage(request.phoneNumber, "USSD")
     
     return {"response": response_text}
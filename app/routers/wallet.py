@@ -2,25 +2,23 @@
 Router pour la gestion du portefeuille
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.db import get_db
 from app.schemas.wallet import WalletResponse
-from app.services.auth_service import AuthService
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(prefix="/wallet", tags=["Wallet"])
 
 
 @router.get("/{msisdn}", response_model=WalletResponse)
-async def get_wallet(
+def get_wallet(
     msisdn: str,
-    db: Session = Depends(get_db)
+    services: ServiceContainer = Depends(get_services)
 ):
     """
     Récupère les informations du portefeuille d'un utilisateur.
     
     - **msisdn**: Numéro de téléphone
     """
-    auth_service = AuthService(db)
+    auth_service = services.auth
     user = auth_service.get_user_by_msisdn(msisdn)
     
     if not user:
@@ -8,6 +8,7 @@ class AuditLogResponse(BaseModel):
     """Schéma de réponse pour un log d'audit"""
     id: int
     user_id: Optional[int]
+    loan_id: Optional[int] = None
     event_type: AuditEventType
     event_data: Optional[str]
     channel: Optional[str]
@@ -0,0 +1,413 @@
+"""
+Archivage mensuel de l'audit trail.
+
+audit_logs ne garde que les AUDIT_HOT_RETENTION_MONTHS derniers mois
+(partition « chaude »). Chaque mois plus ancien devient une partition
+froide : un fichier NDJSON gzip par mois dans AUDIT_ARCHIVE_DIR, inscrit au
+catalogue `audit_archives` (intervalle d'ids et de dates, nombre de lignes,
+empreinte SHA-256), puis supprimé de audit_logs par lots.
+
+Les lectures de AuditService et l'export consultent le catalogue et
+fusionnent les partitions froides concernées avec la table : l'archivage
+est transparent pour les endpoints du trail.
+
+Les lectures interactives (trail d'un utilisateur ou d'un crédit) ne
+parcourent jamais toutes les partitions : `audit_archive_users` et
+`audit_archive_loans` listent, pour chaque mois archivé, les utilisateurs
+et crédits qui y ont des événements. Sans événement archivé, la lecture
+coûte une requête indexée et n'ouvre aucun fichier.
+
+AUDIT_ARCHIVE_DIR doit être un stockage partagé, monté au même chemin sur
+tous les nœuds (volume réseau) : le catalogue est en base, les fichiers
+non. Un fichier absent est journalisé et sa partition ignorée (lecture
+incomplète plutôt qu'une erreur 500) ; `verify()` le signale.
+
+Ordre des opérations (reprise sûre après interruption) :
+1. écriture du fichier temporaire, fsync, renommage ;
+2. inscription au catalogue et des utilisateurs/crédits du mois (commit) ;
+3. suppression des lignes archivées (id <= max_id), un commit par lot.
+Entre 2 et 3, une ligne peut exister des deux côtés : les lectures
+dédoublonnent par id, et relancer le job termine la suppression.
+
+Utilisation:
+    python -m scripts.archive_audit
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models import AuditArchive, AuditArchiveLoan, AuditArchiveUser, AuditEventType, AuditLog
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["id", "created_at", "user_id", "loan_id", "event_type", "channel", "ip_address", "event_data"]
+
+# Encodeur réutilisé : json.dumps avec options en recrée un à chaque ligne
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def row_values(row) -> list:
+    """Valeurs sérialisées d'une ligne (dates ISO 8601, type d'événement en clair)"""
+    row_id, created_at, user_id, loan_id, event_type, channel, ip_address, event_data = row
+    return [
+        row_id,
+        created_at.isoformat() if created_at else None,
+        user_id,
+        loan_id,
+        event_type.value if isinstance(event_type, AuditEventType) else event_type,
+        channel,
+        ip_address,
+        event_data,
+    ]
+
+
+def encode_record(values: list) -> str:
+    """Ligne NDJSON d'une ligne sérialisée"""
+    return _json_encoder.encode(dict(zip(COLUMNS, values))) + "\n"
+
+
+def month_key(moment: datetime) -> str:
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """[début, fin[ d'un mois "AAAA-MM\""""
+    year, number = (int(part) for part in month.split("-"))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def add_months(month: str, count: int) -> str:
+    year, number = (int(part) for part in month.split("-"))
+    index = year * 12 + number - 1 + count
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class AuditArchiveService:
+    """Partitions froides de l'audit : lecture et job de rétention"""
+
+    def __init__(
+        self,
+        db: Session,
+        archive_dir: Optional[str] = None,
+        retention_months: Optional[int] = None,
+        delete_chunk_size: Optional[int] = None
+    ):
+        self.db = db
+        self.archive_dir = archive_dir or settings.AUDIT_ARCHIVE_DIR
+        self.retention_months = settings.AUDIT_HOT_RETENTION_MONTHS if retention_months is None else retention_months
+        self.delete_chunk_size = delete_chunk_size or settings.AUDIT_ARCHIVE_DELETE_CHUNK_SIZE
+
+    # ----- Lecture -----
+
+    def partitions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[AuditArchive]:
+        """Mois archivés qui recoupent [start, end[, du plus ancien au plus récent"""
+        query = self.db.query(AuditArchive)
+        if start is not None:
+            query = query.filter(AuditArchive.last_event_at >= start)
+        if end is not None:
+            query = query.filter(AuditArchive.first_event_at < end)
+        return query.order_by(AuditArchive.month).all()
+
+    def partitions_for(
+        self,
+        user_id: Optional[int] = None,
+        loan_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[AuditArchive]:
+        """Mois archivés où l'utilisateur (ou le crédit) a des événements, dans [since, until]"""
+        if loan_id is not None:
+            keys, key_filter = AuditArchiveLoan, AuditArchiveLoan.loan_id == loan_id
+        else:
+            keys, key_filter = AuditArchiveUser, AuditArchiveUser.user_id == user_id
+        # Tri sur la clé primaire (id, month) de la table de présence : pas de tri temporaire
+        query = self.db.query(AuditArchive).join(keys, keys.month == AuditArchive.month).filter(key_filter)
+        if since is not None:
+            query = query.filter(AuditArchive.last_event_at >= since)
+        if until is not None:
+            query = query.filter(AuditArchive.first_event_at <= until)
+        return query.order_by(keys.month).all()
+
+    def read_records(self, partition: AuditArchive) -> Iterator[Dict[str, Any]]:
+        """Lignes d'une partition froide (rien, journalisé, si le fichier est absent)"""
+        path = os.path.join(self.archive_dir, partition.path)
+        try:
+            source = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            logger.error(
+                "Archive d'audit %s absente (%s) : partition ignorée (AUDIT_ARCHIVE_DIR partagé ?)",
+                partition.month, path
+            )
+            return
+        with source:
+            for line in source:
+                yield json.loads(line)
+
+    def find(
+        self,
+        user_id: Optional[int] = None,
+        loan_id: Optional[int] = None,
+        event_type: Optional[AuditEventType] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[AuditLog]:
+        """
+        Événements archivés d'un utilisateur ou d'un crédit.
+
+        Seuls les mois où il a des événements sont lus (voir `partitions_for`).
+
+        Args:
+            user_id, loan_id: Utilisateur ou crédit (l'un des deux est requis)
+            event_type: Filtrer sur un type d'événement
+            since: Ignorer les mois entièrement antérieurs (ex: création du
+                compte ou demande du crédit)
+            until: Ignorer les mois entièrement postérieurs (ex: curseur)
+            predicate: Filtre supplémentaire sur l'enregistrement brut
+
+        Returns:
+            AuditLog détachés (hors session), triés par (created_at, id)
+
+        Raises:
+            ValueError: Ni utilisateur ni crédit (lecture de toutes les partitions)
+        """
+        if user_id is None and loan_id is None:
+            raise ValueError("Lecture des archives d'audit sans utilisateur ni crédit")
+        event_value = event_type.value if event_type is not None else None
+        # Marge : défauts serveur en UTC, événements d'audit en heure locale
+        if since is not None:
+            since = _naive(since) - timedelta(days=1)
+        if until is not None:
+            until = _naive(until) + timedelta(days=1)
+        found = []
+        for partition in self.partitions_for(user_id, loan_id, since, until):
+            for record in self.read_records(partition):
+                if user_id is not None and record["user_id"] != user_id:
+                    continue
+                if loan_id is not None and record["loan_id"] != loan_id:
+                    continue
+                if event_value is not None and record["event_type"] != event_value:
+                    continue
+                if predicate is not None and not predicate(record):
+                    continue
+                found.append(self.to_audit_log(record))
+        return found
+
+    @staticmethod
+    def to_audit_log(record: Dict[str, Any]) -> AuditLog:
+        return AuditLog(
+            id=record["id"],
+            created_at=datetime.fromisoformat(record["created_at"]),
+            user_id=record["user_id"],
+            loan_id=record["loan_id"],
+            event_type=AuditEventType(record["event_type"]),
+            channel=record["channel"],
+            ip_address=record["ip_address"],
+            event_data=record["event_data"]
+        )
+
+    # ----- Rétention -----
+
+    def eligible_months(self, now: Optional[datetime] = None) -> List[str]:
+        """Mois encore présents dans audit_logs et plus anciens que la rétention"""
+        cutoff = add_months(month_key(now or datetime.now()), -self.retention_months)
+        oldest = self.db.execute(select(func.min(AuditLog.created_at))).scalar()
+        if oldest is None:
+            return []
+        months = []
+        month = month_key(oldest)
+        while month < cutoff:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def run(self, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Archive tous les mois éligibles.
+
+        Returns:
+            Dict avec les mois archivés et le nombre de lignes déplacées
+        """
+        months = self.eligible_months(now)
+        if dry_run:
+            return {"eligible_months": months, "dry_run": True}
+
+        archived = []
+        rows_moved = 0
+        for month in months:
+            result = self.archive_month(month)
+            if result["rows_deleted"] or result["rows_archived"]:
+                archived.append(result)
+                rows_moved += result["rows_deleted"]
+        return {"months": archived, "rows_moved": rows_moved}
+
+    def archive_month(self, month: str) -> Dict[str, Any]:
+        """Archive un mois (ou termine un archivage interrompu)"""
+        start, end = month_bounds(month)
+        partition = self.db.get(AuditArchive, month)
+        rows_archived = 0
+        if partition is None:
+            written = self._write_partition(month, start, end)
+            if written is None:
+                return {"month": month, "rows_archived": 0, "rows_deleted": 0}
+            partition, user_ids, loan_ids = written
+            rows_archived = partition.row_count
+            self.db.add(partition)
+            self.db.flush()
+            self._insert_keys(month, user_ids, loan_ids)
+            self.db.commit()
+            logger.info("Audit %s archivé : %s lignes (%s)", month, rows_archived, partition.path)
+
+        deleted = self._delete_archived(start, end, partition.max_id)
+        late = self.db.execute(
+            select(func.count(AuditLog.id)).where(
+                AuditLog.created_at >= start, AuditLog.created_at < end, AuditLog.id > partition.max_id
+            )
+        ).scalar()
+        if late:
+            logger.warning("Audit %s : %s événements postérieurs à l'archive restent dans audit_logs", month, late)
+        return {"month": month, "rows_archived": rows_archived, "rows_deleted": deleted}
+
+    def _write_partition(
+        self,
+        month: str,
+        start: datetime,
+        end: datetime
+    ) -> Optional[Tuple[AuditArchive, Set[int], Set[int]]]:
+        """Écrit le fichier du mois ; (catalogue, utilisateurs, crédits) ou None si le mois est vide"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        filename = f"audit_logs_{month.replace('-', '_')}.ndjson.gz"
+        final_path = os.path.join(self.archive_dir, filename)
+        temp_path = final_path + ".tmp"
+
+        statement = (
+            select(*(getattr(AuditLog, name) for name in COLUMNS))
+            .where(AuditLog.created_at >= start, AuditLog.created_at < end)
+            .order_by(AuditLog.created_at, AuditLog.id)
+        )
+        count = 0
+        min_id = max_id = None
+        first_at = last_at = None
+        user_ids, loan_ids = set(), set()
+        with open(temp_path, "wb") as raw:
+            with gzip.GzipFile(filename=filename[:-3], mode="wb", fileobj=raw, mtime=0) as target:
+                result = self.db.execute(statement.execution_options(stream_results=True, yield_per=5000))
+                for row in result:
+                    target.write(encode_record(row_values(row)).encode("utf-8"))
+                    count += 1
+                    min_id = row.id if min_id is None else min(min_id, row.id)
+                    max_id = row.id if max_id is None else max(max_id, row.id)
+                    first_at = first_at or row.created_at
+                    last_at = row.created_at
+                    if row.user_id is not None:
+                        user_ids.add(row.user_id)
+                    if row.loan_id is not None:
+                        loan_ids.add(row.loan_id)
+            raw.flush()
+            os.fsync(raw.fileno())
+        self.db.rollback()  # Fin de la transaction de lecture
+
+        if not count:
+            os.remove(temp_path)
+            return None
+        os.replace(temp_path, final_path)
+        partition = AuditArchive(
+            month=month,
+            path=filename,
+            row_count=count,
+            min_id=min_id,
+            max_id=max_id,
+            first_event_at=first_at,
+            last_event_at=last_at,
+            sha256=_sha256(final_path)
+        )
+        return partition, user_ids, loan_ids
+
+    def _insert_keys(self, month: str, user_ids: Iterable[int], loan_ids: Iterable[int]):
+        """Inscrit les utilisateurs et crédits du mois (sans commit)"""
+        for model, column, ids in ((AuditArchiveUser, "user_id", user_ids), (AuditArchiveLoan, "loan_id", loan_ids)):
+            rows = [{column: key, "month": month} for key in sorted(ids)]
+            for offset in range(0, len(rows), self.delete_chunk_size):
+                self.db.execute(insert(model), rows[offset:offset + self.delete_chunk_size])
+
+    def index_partition(self, partition: AuditArchive) -> bool:
+        """
+        Reconstruit les utilisateurs et crédits d'un mois depuis son fichier (commit).
+
+        Returns:
+            False si le fichier est absent (mois non indexé)
+        """
+        path = os.path.join(self.archive_dir, partition.path)
+        if not os.path.exists(path):
+            logger.warning("Archive d'audit %s absente (%s) : mois non indexé", partition.month, path)
+            return False
+        user_ids, loan_ids = set(), set()
+        for record in self.read_records(partition):
+            if record["user_id"] is not None:
+                user_ids.add(record["user_id"])
+            if record["loan_id"] is not None:
+                loan_ids.add(record["loan_id"])
+        self.db.execute(delete(AuditArchiveUser).where(AuditArchiveUser.month == partition.month))
+        self.db.execute(delete(AuditArchiveLoan).where(AuditArchiveLoan.month == partition.month))
+        self._insert_keys(partition.month, user_ids, loan_ids)
+        self.db.commit()
+        return True
+
+    def _delete_archived(self, start: datetime, end: datetime, max_id: int) -> int:
+        """Supprime de audit_logs les lignes archivées du mois, un commit par lot"""
+        deleted = 0
+        while True:
+            ids = self.db.execute(
+                select(AuditLog.id)
+                .where(AuditLog.created_at >= start, AuditLog.created_at < end, AuditLog.id <= max_id)
+                .limit(self.delete_chunk_size)
+            ).scalars().all()
+            if not ids:
+                return deleted
+            self.db.execute(delete(AuditLog.__table__).where(AuditLog.__table__.c.id.in_(ids)))
+            self.db.commit()
+            deleted += len(ids)
+
+    def verify(self) -> List[Dict[str, Any]]:
+        """Partitions dont le fichier manque ou ne correspond plus au catalogue"""
+        problems = []
+        for partition in self.partitions():
+            path = os.path.join(self.archive_dir, partition.path)
+            if not os.path.exists(path):
+                problems.append({"month": partition.month, "problem": "fichier absent"})
+            elif _sha256(path) != partition.sha256:
+                problems.append({"month": partition.month, "problem": "empreinte différente"})
+        return problems
+
+
+def merge_logs(hot: List[AuditLog], archived: List[AuditLog], reverse: bool = False) -> List[AuditLog]:
+    """Fusionne table et archives, dédoublonnées par id, triées par (created_at, id)"""
+    seen = {log.id for log in hot}
+    merged = hot + [log for log in archived if log.id not in seen]
+    merged.sort(key=lambda log: (_naive(log.created_at), log.id), reverse=reverse)
+    return merged
+
+
+def _naive(moment: datetime) -> datetime:
+    """Datetime naïf en UTC (les dates naïves sont déjà en UTC/heure du serveur)"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,173 @@
+"""
+Export en flux de l'audit trail (NDJSON ou CSV, gzip optionnel).
+
+Les mois archivés (voir audit_archive) qui recoupent la période sont lus
+en premier depuis leurs fichiers, puis la table audit_logs. Les lignes sont lues par paquets de `batch_size` avec un curseur serveur
+(`stream_results` + `yield_per` : curseur nommé sous PostgreSQL, lecture
+incrémentale sous SQLite), en colonnes brutes sans objets ORM ni modèles
+Pydantic, puis sérialisées par blocs d'environ CHUNK_BYTES. La mémoire
+utilisée ne dépend pas du nombre de lignes exportées.
+
+L'export ouvre sa propre session : le générateur est consommé après la fin
+du traitement de la requête HTTP, par morceaux.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.db import SessionLocal
+from app.db.models import AuditEventType, AuditLog
+from app.services.audit_archive import (
+    COLUMNS, AuditArchiveService, _naive, encode_record, month_bounds, row_values
+)
+
+FORMATS = ("ndjson", "csv")
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+class AuditExportService:
+    """Export de l'audit trail filtré, ligne à ligne"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 5000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def stream(
+        self,
+        fmt: str = "ndjson",
+        compress: bool = False,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        event_type: Optional[AuditEventType] = None,
+        channel: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """
+        Flux d'octets de l'export.
+
+        Args:
+            fmt: "ndjson" ou "csv"
+            compress: Compresser en gzip
+            start: Début de la période (inclus)
+            end: Fin de la période (exclue)
+            event_type: Filtrer sur un type d'événement
+            channel: Filtrer sur un canal (USSD, APP, SYSTEM)
+            user_id: Filtrer sur un utilisateur
+
+        Returns:
+            Générateur de blocs d'octets
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Format d'export inconnu: {fmt} (attendu: {', '.join(FORMATS)})")
+        # Bornes, archives et lignes comparées en UTC naïf (ex: start=...Z)
+        start = _naive(start) if start is not None else None
+        end = _naive(end) if end is not None else None
+        if start and end and start >= end:
+            raise ValueError("La date de début doit précéder la date de fin")
+
+        filters = {"start": start, "end": end, "event_type": event_type, "channel": channel, "user_id": user_id}
+        chunks = self._serialize(self._rows(filters), fmt)
+        return _gzip(chunks) if compress else chunks
+
+    def _statement(self, start, end, event_type, channel, user_id):
+        statement = select(*(getattr(AuditLog, name) for name in COLUMNS))
+        if start is not None:
+            statement = statement.where(AuditLog.created_at >= start)
+        if end is not None:
+            statement = statement.where(AuditLog.created_at < end)
+        if event_type is not None:
+            statement = statement.where(AuditLog.event_type == event_type)
+        if channel is not None:
+            statement = statement.where(AuditLog.channel == channel)
+        if user_id is not None:
+            statement = statement.where(AuditLog.user_id == user_id)
+        return statement.order_by(AuditLog.created_at, AuditLog.id)
+
+    def _rows(self, filters: dict) -> Iterator[list]:
+        """Valeurs sérialisées des lignes : mois archivés puis table"""
+        with self.session_factory() as db:
+            archives = AuditArchiveService(db)
+            partitions = archives.partitions(filters["start"], filters["end"])
+            archived_ranges = []
+            for partition in partitions:
+                archived_ranges.append(month_bounds(partition.month) + (partition.max_id,))
+                for record in archives.read_records(partition):
+                    if _record_matches(record, filters):
+                        yield [record[name] for name in COLUMNS]
+
+            statement = self._statement(**filters)
+            result = db.execute(
+                statement.execution_options(stream_results=True, yield_per=self.batch_size)
+            )
+            for row in result:
+                # Ligne déjà archivée mais pas encore supprimée (archivage en cours)
+                if archived_ranges and _is_archived(row, archived_ranges):
+                    continue
+                yield row_values(row)
+
+    @staticmethod
+    def _serialize(rows: Iterable[list], fmt: str) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(COLUMNS)
+            write = lambda values: writer.writerow(values)
+        else:
+            write = lambda values: buffer.write(encode_record(values))
+
+        for values in rows:
+            write(values)
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+def _record_matches(record: dict, filters: dict) -> bool:
+    """Filtres de l'export appliqués à une ligne archivée"""
+    created_at = _naive(datetime.fromisoformat(record["created_at"]))
+    if filters["start"] is not None and created_at < filters["start"]:
+        return False
+    if filters["end"] is not None and created_at >= filters["end"]:
+        return False
+    if filters["event_type"] is not None and record["event_type"] != filters["event_type"].value:
+        return False
+    if filters["channel"] is not None and record["channel"] != filters["channel"]:
+        return False
+    if filters["user_id"] is not None and record["user_id"] != filters["user_id"]:
+        return False
+    return True
+
+
+def _is_archived(row, archived_ranges) -> bool:
+    created_at = _naive(row.created_at)
+    for start, end, max_id in archived_ranges:
+        if start <= created_at < end and row.id <= max_id:
+            return True
+    return False
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compression gzip en flux"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_filename(fmt: str, compress: bool) -> str:
+    """Nom de fichier proposé au téléchargement"""
+    return f"audit_{datetime.now():%Y%m%d_%H%M%S}.{fmt}" + (".gz" if compress else "")
@@ -2,17 +2,25 @@
 Service d'audit trail pour traçabilité complète
 """
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import json
-from app.db.models import AuditLog, AuditEventType
+from app.core.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, paginate_desc
+from app.db.models import AuditLog, AuditEventType, Loan, User
+from app.db.unit_of_work import current_unit_of_work, unit_of_work
+from app.services.audit_archive import AuditArchiveService, merge_logs
 from datetime import datetime
 
 
 class AuditService:
     """Service de gestion de l'audit trail"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        archive: Optional[AuditArchiveService] = None
+    ):
         self.db = db
+        self.archive = archive or AuditArchiveService(db)
     
     def log_event(
         self,
@@ -20,20 +28,23 @@ class AuditService:
         user_id: Optional[int] = None,
         event_data: Optional[Dict[str, Any]] = None,
         channel: Optional[str] = None,
-        ip_address: Optional[str] = None
-    ) -> AuditLog:
+        ip_address: Optional[str] = None,
+        loan_id: Optional[int] = None
+    ):
         """
         Enregistre un événement d'audit.
         
+        Dans une unité de travail, l'événement est inséré dans la même
+        transaction que l'opération, au commit (cas de tous les services
+        métier). Sinon il est écrit et commité seul.
+        
         Args:
             event_type: Type d'événement (register, set_pin, consent, etc.)
             user_id: ID de l'utilisateur (optionnel)
             event_data: Données de l'événement (sera sérialisé en JSON)
             channel: Canal (USSD ou APP)
             ip_address: Adresse IP
-            
-        Returns:
-            AuditLog créé
+            loan_id: ID du crédit concerné (indexé pour le trail)
         """
         # Convertir event_data en JSON string
         event_data_json = None
@@ -47,23 +58,25 @@ class AuditService:
             # Si le type n'existe pas dans l'enum, utiliser une valeur par défaut
             event_enum = AuditEventType.REGISTER
         
-        audit_log = AuditLog(
-            user_id=user_id,
-            event_type=event_enum,
-            event_data=event_data_json,
-            channel=channel,
-            ip_address=ip_address
-        )
-        
-        self.db.add(audit_log)
-        self.db.commit()
-        self.db.refresh(audit_log)
-        
-        return audit_log
+        row = {
+            "user_id": user_id,
+            "loan_id": loan_id,
+            "event_type": event_enum,
+            "event_data": event_data_json,
+            "channel": channel,
+            "ip_address": ip_address,
+            "created_at": datetime.now()
+        }
+        uow = current_unit_of_work(self.db)
+        if uow is not None:
+            uow.add_audit(row)
+        else:
+            with unit_of_work(self.db) as uow:
+                uow.add_audit(row)
     
     def get_user_audit_logs(self, user_id: int, limit: int = 100) -> list:
         """
-        Récupère les logs d'audit d'un utilisateur.
+        Récupère les logs d'audit d'un utilisateur (mois archivés compris).
         
         Args:
             user_id: ID de l'utilisateur
@@ -72,41 +85,109 @@ class AuditService:
         Returns:
             Liste des AuditLog
         """
-        return self.db.query(AuditLog).filter(
+        logs = self.db.query(AuditLog).filter(
             AuditLog.user_id == user_id
         ).order_by(
-            AuditLog.created_at.desc()
+            AuditLog.created_at.desc(), AuditLog.id.desc()
         ).limit(limit).all()
+        if len(logs) < limit:
+            logs = self._fill_from_archive(logs, limit, user_id)
+        return logs[:limit]
+    
+    def get_user_audit_page(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        event_type: Optional[AuditEventType] = None
+    ) -> Tuple[List[AuditLog], Optional[str]]:
+        """
+        Une page des logs d'audit d'un utilisateur, du plus récent au plus ancien.
+        
+        Une fois la table épuisée, la pagination continue dans les mois
+        archivés, avec le même curseur.
+        
+        Args:
+            user_id: ID de l'utilisateur
+            limit: Taille de la page
+            cursor: Curseur renvoyé par la page précédente
+            event_type: Filtrer sur un type d'événement
+            
+        Returns:
+            (logs, curseur de la page suivante ou None)
+        """
+        query = self.db.query(AuditLog).filter(AuditLog.user_id == user_id)
+        if event_type is not None:
+            query = query.filter(AuditLog.event_type == event_type)
+        logs, next_cursor = paginate_desc(query, AuditLog.created_at, AuditLog.id, limit, cursor)
+        if next_cursor is not None:
+            return logs, next_cursor
+        
+        before = decode_cursor(cursor) if cursor else None
+        logs = self._fill_from_archive(logs, limit + 1, user_id, event_type, before)
+        if len(logs) <= limit:
+            return logs, None
+        logs = logs[:limit]
+        return logs, encode_cursor(logs[-1].created_at, logs[-1].id)
     
     def get_loan_audit_trail(self, loan_id: int) -> list:
         """
         Récupère le trail d'audit pour un crédit spécifique.
         
+        Si la demande du crédit n'est plus dans la table, le début du trail
+        est relu dans les mois archivés.
+        
         Args:
             loan_id: ID du crédit
             
         Returns:
             Liste des événements liés au crédit
         """
-        # Chercher les événements contenant le loan_id dans event_data
-        all_logs = self.db.query(AuditLog).filter(
-            AuditLog.event_type.in_([
-                AuditEventType.LOAN_REQUEST,
-                AuditEventType.LOAN_DECISION,
-                AuditEventType.PAYOUT_SIMULATED,
-                AuditEventType.REPAY
-            ])
+        # Lecture par plage sur l'index (loan_id, created_at)
+        logs = self.db.query(AuditLog).filter(
+            AuditLog.loan_id == loan_id
+        ).order_by(
+            AuditLog.created_at, AuditLog.id
         ).all()
         
-        # Filtrer ceux qui concernent ce crédit
-        loan_logs = []
-        for log in all_logs:
-            if log.event_data:
-                try:
-                    data = json.loads(log.event_data)
-                    if data.get("loan_id") == loan_id:
-                        loan_logs.append(log)
-                except:
-                    pass
+        # Les mois archivés précèdent la table : trail complet s'il commence par la demande
+        if logs and logs[0].event_type == AuditEventType.LOAN_REQUEST:
+            return logs
+        requested_at = self.db.query(Loan.requested_at).filter(Loan.id == loan_id).scalar()
+        if requested_at is None:
+            return []  # Crédit inconnu
+        # Mois archivés où le crédit a des événements (aucun fichier ouvert sinon)
+        archived = self.archive.find(loan_id=loan_id, since=requested_at)
+        return merge_logs(logs, archived) if archived else logs
+    
+    def _fill_from_archive(
+        self,
+        logs: List[AuditLog],
+        limit: int,
+        user_id: int,
+        event_type: Optional[AuditEventType] = None,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[AuditLog]:
+        """Complète une liste décroissante avec les événements archivés plus anciens"""
+        if logs:
+            before = (logs[-1].created_at, logs[-1].id)
+        if before is not None:
+            before_key = (before[0].isoformat(), before[1])
+            predicate = lambda record: (record["created_at"], record["id"]) < before_key
+        else:
+            predicate = None
         
-        return sorted(loan_logs, key=lambda x: x.created_at)
+        created_at = self.db.query(User.created_at).filter(User.id == user_id).scalar()
+        if created_at is None:
+            return logs  # Utilisateur inconnu
+        # Mois archivés où l'utilisateur a des événements, entre sa création et le curseur
+        archived = self.archive.find(
+            user_id=user_id,
+            event_type=event_type,
+            since=created_at,
+            until=before[0] if before is not None else None,
+            predicate=predicate
+        )
+        if not archived:
+            return logs
+        return merge_logs(logs, archived, reverse=True)[:limit]
@@ -1,19 +1,29 @@
 """
 Service d'authentification et gestion des utilisateurs
 """
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
-from app.db.models import User, Wallet
-from app.core.security import hash_password, verify_password
+from app.db.models import User, UserLoanStats, Wallet
+from app.db.unit_of_work import unit_of_work
+from app.core.security import hash_password, needs_rehash, verify_password_cached
 from app.services.audit_service import AuditService
-from datetime import datetime
+from app.services.usage_counter import UsageCounter, usage_counter as default_usage_counter
 
 
 class AuthService:
     """Service d'authentification"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        audit_service: Optional[AuditService] = None,
+        usage_counter: Optional[UsageCounter] = None
+    ):
         self.db = db
-        self.audit_service = AuditService(db)
+        self.audit_service = audit_service or AuditService(db)
+        self.usage_counter = usage_counter or default_usage_counter
+        # Utilisateurs déjà chargés par ce service (une requête HTTP)
+        self._users_by_msisdn: Dict[str, User] = {}
     
     def create_user(self, msisdn: str, full_name: str = None, channel: str = "APP") -> User:
         """
@@ -32,35 +42,28 @@ class AuthService:
         if existing_user:
             raise ValueError("Un utilisateur avec ce numéro existe déjà")
         
-        # Créer l'utilisateur
-        user = User(
-            msisdn=msisdn,
-            full_name=full_name
-        )
-        self.db.add(user)
-        self.db.flush()  # Pour obtenir l'ID
-        
-        # Créer le wallet associé
-        wallet = Wallet(
-            user_id=user.id,
-            balance=0,
-            savings_balance=0
-        )
-        self.db.add(wallet)
-        self.db.commit()
-        self.db.refresh(user)
-        
-        # Audit
-        self.audit_service.log_event(
-            event_type="register",
-            user_id=user.id,
-            event_data={
-                "msisdn": msisdn,
-                "full_name": full_name,
-                "channel": channel
-            },
-            channel=channel
-        )
+        with unit_of_work(self.db) as uow:
+            # Créer l'utilisateur, son wallet et ses compteurs de crédits à zéro
+            user = User(
+                msisdn=msisdn,
+                full_name=full_name,
+                wallet=Wallet(balance=0, savings_balance=0),
+                loan_stats=UserLoanStats()
+            )
+            self.db.add(user)
+            uow.flush()  # Un seul flush : l'ID pour l'audit
+            
+            # Audit
+            self.audit_service.log_event(
+                event_type="register",
+                user_id=user.id,
+                event_data={
+                    "msisdn": msisdn,
+                    "full_name": full_name,
+                    "channel": channel
+                },
+                channel=channel
+            )
         
         return user
     
@@ -78,20 +81,19 @@ class AuthService:
         """
         # Hasher le PIN
         pin_hash = hash_password(pin)
-        user.pin_hash = pin_hash
-        self.db.commit()
-        self.db.refresh(user)
-        
-        # Audit (sans logger le PIN)
-        self.audit_service.log_event(
-            event_type="set_pin",
-            user_id=user.id,
-            event_data={
-                "pin_set": True,
-                "channel": channel
-            },
-            channel=channel
-        )
+        with unit_of_work(self.db):
+            user.pin_hash = pin_hash
+            
+            # Audit (sans logger le PIN)
+            self.audit_service.log_event(
+                event_type="set_pin",
+                user_id=user.id,
+                event_data={
+                    "pin_set": True,
+                    "channel": channel
+                },
+                channel=channel
+            )
         
         return user
     
@@ -109,7 +111,16 @@ class AuthService:
         if not user.pin_hash:
             return False
         
-        return verify_password(pin, user.pin_hash)
+        if not verify_password_cached(user.id, pin, user.pin_hash):
+            return False
+        
+        # Rehash transparent si le coût bcrypt configuré a changé
+        if needs_rehash(user.pin_hash):
+            new_hash = hash_password(pin)
+            with unit_of_work(self.db):
+                user.pin_hash = new_hash
+        
+        return True
     
     def get_user_by_msisdn(self, msisdn: str) -> User:
         """
@@ -121,20 +132,27 @@ class AuthService:
         Returns:
             User ou None
         """
-        return self.db.query(User).filter(User.msisdn == msisdn).first()
+        user = self._users_by_msisdn.get(msisdn)
+        if user is None:
+            user = self.db.query(User).filter(User.msisdn == msisdn).first()
+            if user is not None:
+                self._users_by_msisdn[msisdn] = user
+        return user
     
     def update_usage_count(self, user: User, channel: str):
         """
-        Met à jour le compteur d'utilisation.
+        Compte une utilisation (écrite en base par lots, voir UsageCounter).
         
         Args:
             user: Utilisateur
             channel: Canal (USSD ou APP)
         """
-        if channel.upper() == "USSD":
-            user.ussd_usage_count += 1
-        elif channel.upper() == "APP":
-            user.app_usage_count += 1
+        self.record_usage(user.msisdn, channel)
+    
+    def record_usage(self, msisdn: str, channel: str):
+        """
+        Compte une utilisation par MSISDN, sans lire l'utilisateur.
         
-        user.last_login = datetime.now()
-        self.db.commit()
+        Sans effet si aucun utilisateur n'a ce numéro.
+        """
+        self.usage_counter.record(msisdn, channel)
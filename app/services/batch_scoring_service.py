@@ -0,0 +1,321 @@
+"""
+Scoring par lots de tout le portefeuille.
+
+Le scoring unitaire (`ScoringService.calculate_score`) traite un utilisateur
+par requête. Ici, les utilisateurs sont parcourus par tranches de clé
+primaire ; chaque tranche coûte trois requêtes ensemblistes (utilisateurs,
+agrégats de crédits, données Mobile Money connues), un calcul vectorisé
+NumPy et un upsert en masse de ScoringData.
+
+Les barèmes de `compute_scores` reproduisent exactement ceux de
+`ScoringService._compute_score` : toute modification de l'un doit être
+reportée dans l'autre (voir `check_parity`).
+"""
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.db.models import Loan, LoanStatus, ScoringData, User
+from app.services.mobile_money_connector import EMPTY_PROFILE, MobileMoneyConnector, mobile_money_connector
+from app.services.score_cache import score_cache
+from app.services.scoring_service import ScoringService
+
+MM_FEATURES = [
+    "mm_account_age_months",
+    "mm_monthly_volume_avg",
+    "mm_monthly_transactions_avg",
+    "mm_activity_regularity",
+]
+
+
+def _bands(values: np.ndarray, bands: List[tuple]) -> np.ndarray:
+    """Barème par seuils décroissants : [(seuil, points), ...], 0 sinon"""
+    return np.select([values >= threshold for threshold, _ in bands], [points for _, points in bands], default=0)
+
+
+def compute_scores(features: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Version vectorisée de `ScoringService._compute_score`.
+
+    Args:
+        features: Tableaux alignés (un élément par utilisateur) :
+            account_age_days, total_usage, total_loans_count,
+            repaid_loans_count, overdue_loans_count, has_active_loan
+            et les colonnes de MM_FEATURES
+
+    Returns:
+        Scores (entiers entre MIN_SCORE et MAX_SCORE)
+    """
+    # 1. Ancienneté du compte (0-150 points)
+    age_score = _bands(features["account_age_days"], [(365, 150), (180, 100), (90, 50), (30, 25)])
+
+    # 2. Fréquence d'utilisation (0-100 points)
+    usage_score = _bands(features["total_usage"], [(50, 100), (30, 75), (20, 50), (10, 25)])
+
+    # 3. Historique de crédit (0-150 points)
+    total = features["total_loans_count"]
+    repaid = features["repaid_loans_count"]
+    overdue = features["overdue_loans_count"]
+    rate = np.divide(repaid, total, out=np.zeros(len(total), dtype=np.float64), where=total > 0)
+    no_overdue = overdue == 0
+    history_score = np.select(
+        [(rate >= 0.9) & no_overdue, (rate >= 0.7) & no_overdue, rate >= 0.5],
+        [150, 100, 50],
+        default=0
+    )
+    history_score = np.where(overdue > 0, np.maximum(0, history_score - overdue * 50), history_score)
+    history_score = np.where(total == 0, 0, history_score)
+
+    # 4. Données externes Mobile Money (0-100 points)
+    mm_age_score = _bands(features["mm_account_age_months"], [(24, 40), (12, 30), (6, 20), (3, 10)])
+    volume_score = np.minimum(30, (features["mm_monthly_volume_avg"] / 100000) * 10)
+    regularity_score = features["mm_activity_regularity"] * 30
+    mm_activity_score = np.trunc(volume_score + regularity_score).astype(np.int64)
+
+    score = 500 + age_score + usage_score + history_score + mm_age_score + mm_activity_score
+
+    # Pénalité si crédit actif
+    score = np.where(features["has_active_loan"], np.maximum(0, score - 200), score)
+
+    return np.clip(score, ScoringService.MIN_SCORE, ScoringService.MAX_SCORE)
+
+
+def _select(frame: Dict, mask: np.ndarray) -> Dict:
+    """Sous-ensemble des utilisateurs d'une tranche"""
+    if mask.all():
+        return frame
+    indices = np.flatnonzero(mask)
+    return {
+        name: [values[i] for i in indices] if isinstance(values, list) else values[mask]
+        for name, values in frame.items()
+    }
+
+
+class BatchScoringService:
+    """Service de re-scoring de l'ensemble des utilisateurs"""
+
+    def __init__(
+        self,
+        db: Session,
+        chunk_size: int = 5000,
+        connector: Optional[MobileMoneyConnector] = None
+    ):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.mobile_money_connector = connector or mobile_money_connector
+
+    def score_all(self, refresh_external: bool = False, persist: bool = True) -> Dict:
+        """
+        Recalcule et enregistre le score de tous les utilisateurs.
+
+        Args:
+            refresh_external: Relire les données Mobile Money de tous les
+                utilisateurs (sinon, seules celles absentes de ScoringData
+                sont demandées au fournisseur)
+            persist: Enregistrer les scores (False : calcul seul)
+
+        Les utilisateurs sans données Mobile Money (fournisseur en échec)
+        sont ignorés et gardent leur score précédent.
+        
+        Returns:
+            Dict avec le nombre d'utilisateurs, de tranches et le débit
+        """
+        started = time.perf_counter()
+        scored = 0
+        skipped = 0
+        chunks = 0
+        last_id = 0
+        while True:
+            frame = self.load_chunk(last_id, refresh_external)
+            if frame is None:
+                break
+            last_id = int(frame["user_id"][-1])
+            chunks += 1
+            skipped += int((~frame["has_external_data"]).sum())
+            frame = _select(frame, frame["has_external_data"])
+            if not len(frame["user_id"]):
+                continue
+            frame["score"] = compute_scores(frame)
+            if persist:
+                self._upsert(frame)
+                self.db.commit()
+            scored += len(frame["user_id"])
+
+        if persist:
+            score_cache.clear()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "users_scored": scored,
+            "users_skipped": skipped,
+            "chunks": chunks,
+            "elapsed_seconds": round(elapsed, 3),
+            "users_per_second": round(scored / elapsed, 1) if elapsed else 0.0
+        }
+
+    def load_chunk(self, after_user_id: int, refresh_external: bool = False) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Charge les caractéristiques de la tranche d'utilisateurs suivante.
+
+        Returns:
+            Tableaux alignés par utilisateur, ou None après le dernier
+        """
+        users = self.db.execute(
+            select(User.id, User.msisdn, User.created_at, User.ussd_usage_count, User.app_usage_count)
+            .where(User.id > after_user_id)
+            .order_by(User.id)
+            .limit(self.chunk_size)
+        ).all()
+        if not users:
+            return None
+
+        user_ids = np.fromiter((u.id for u in users), dtype=np.int64, count=len(users))
+        first_id, last_id = int(user_ids[0]), int(user_ids[-1])
+        index = {int(user_id): i for i, user_id in enumerate(user_ids)}
+        n = len(users)
+
+        now = np.datetime64(datetime.now(), "us")
+        created_at = np.array([u.created_at.replace(tzinfo=None) for u in users], dtype="datetime64[us]")
+        ussd = np.fromiter((u.ussd_usage_count for u in users), dtype=np.int64, count=n)
+        app = np.fromiter((u.app_usage_count for u in users), dtype=np.int64, count=n)
+
+        frame = {
+            "user_id": user_ids,
+            "msisdn": [u.msisdn for u in users],
+            "account_age_days": (now - created_at) // np.timedelta64(1, "D"),
+            "ussd_usage_count": ussd,
+            "app_usage_count": app,
+            "total_usage": ussd + app,
+            "total_loans_count": np.zeros(n, dtype=np.int64),
+            "repaid_loans_count": np.zeros(n, dtype=np.int64),
+            "overdue_loans_count": np.zeros(n, dtype=np.int64),
+            "has_active_loan": np.zeros(n, dtype=bool),
+        }
+
+        # Agrégats de crédits : une requête GROUP BY pour la tranche
+        loan_stats = self.db.execute(
+            select(
+                Loan.user_id,
+                func.count(Loan.id),
+                func.sum(case((Loan.status == LoanStatus.REPAID, 1), else_=0)),
+                func.sum(case((Loan.status == LoanStatus.OVERDUE, 1), else_=0)),
+                func.sum(case((Loan.status.in_([LoanStatus.ACTIVE, LoanStatus.PENDING]), 1), else_=0)),
+            )
+            .where(and_(Loan.user_id >= first_id, Loan.user_id <= last_id))
+            .group_by(Loan.user_id)
+        ).all()
+        for user_id, total, repaid, overdue, active in loan_stats:
+            i = index.get(user_id)
+            if i is None:
+                continue
+            frame["total_loans_count"][i] = total
+            frame["repaid_loans_count"][i] = repaid
+            frame["overdue_loans_count"][i] = overdue
+            frame["has_active_loan"][i] = active > 0
+
+        # Données Mobile Money : celles déjà connues, le fournisseur sinon
+        external = {}
+        if not refresh_external:
+            known = self.db.execute(
+                select(ScoringData.user_id, *[getattr(ScoringData, name) for name in MM_FEATURES])
+                .where(and_(ScoringData.user_id >= first_id, ScoringData.user_id <= last_id))
+            ).all()
+            for row in known:
+                values = dict(zip(MM_FEATURES, row[1:]))
+                if all(value is not None for value in values.values()):
+                    external[row.user_id] = values
+        missing = [
+            msisdn for user_id, msisdn in zip(user_ids, frame["msisdn"])
+            if int(user_id) not in external
+        ]
+        fetched = self.mobile_money_connector.get_many(missing) if missing else {}
+        rows = [
+            external.get(int(user_id)) or fetched.get(msisdn)
+            for user_id, msisdn in zip(user_ids, frame["msisdn"])
+        ]
+        frame["has_external_data"] = np.fromiter((row is not None for row in rows), dtype=bool, count=n)
+        rows = [row or EMPTY_PROFILE for row in rows]
+        for name in MM_FEATURES:
+            dtype = np.float64 if name == "mm_activity_regularity" else np.int64
+            frame[name] = np.fromiter((row[name] for row in rows), dtype=dtype, count=n)
+
+        return frame
+
+    def check_parity(self, sample_size: int = 1000, seed: int = 0) -> Dict:
+        """
+        Compare le calcul vectorisé au calcul unitaire sur un échantillon.
+
+        Pour chaque utilisateur tiré, les données internes sont recollectées
+        par `ScoringService._collect_internal_data` et le score recalculé par
+        `ScoringService._compute_score` avec les mêmes données Mobile Money.
+
+        Returns:
+            Dict avec le nombre d'utilisateurs comparés et les écarts
+        """
+        scalar = ScoringService(self.db)
+        rng = random.Random(seed)
+        population = self.db.execute(select(func.count(User.id))).scalar()
+        rate = min(1.0, sample_size / population) if population else 0.0
+        checked = 0
+        mismatches = []
+        last_id = 0
+        while True:
+            frame = self.load_chunk(last_id)
+            if frame is None:
+                break
+            last_id = int(frame["user_id"][-1])
+            scores = compute_scores(frame)
+            for i in range(len(frame["user_id"])):
+                if rng.random() >= rate or not frame["has_external_data"][i]:
+                    continue
+                user = self.db.get(User, int(frame["user_id"][i]))
+                internal = scalar._collect_internal_data(user)
+                external = {name: frame[name][i].item() for name in MM_FEATURES}
+                expected = scalar._compute_score(internal, external)["score"]
+                if expected != int(scores[i]):
+                    mismatches.append({"user_id": user.id, "scalar": expected, "batch": int(scores[i])})
+                checked += 1
+
+        return {"checked": checked, "mismatches": mismatches}
+
+    def _upsert(self, frame: Dict):
+        """INSERT ... ON CONFLICT (user_id) DO UPDATE de toute la tranche"""
+        now = datetime.now()
+        rows = [
+            {
+                "user_id": int(frame["user_id"][i]),
+                "account_age_days": int(frame["account_age_days"][i]),
+                "ussd_usage_count": int(frame["ussd_usage_count"][i]),
+                "app_usage_count": int(frame["app_usage_count"][i]),
+                "total_loans_count": int(frame["total_loans_count"][i]),
+                "repaid_loans_count": int(frame["repaid_loans_count"][i]),
+                "overdue_loans_count": int(frame["overdue_loans_count"][i]),
+                "mm_account_age_months": int(frame["mm_account_age_months"][i]),
+                "mm_monthly_volume_avg": int(frame["mm_monthly_volume_avg"][i]),
+                "mm_monthly_transactions_avg": int(frame["mm_monthly_transactions_avg"][i]),
+                "mm_activity_regularity": float(frame["mm_activity_regularity"][i]),
+                "score": float(frame["score"][i]),
+                "score_version": ScoringService.SCORE_VERSION,
+                "calculated_at": now,
+                "is_stale": False,
+            }
+            for i in range(len(frame["user_id"]))
+        ]
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(ScoringData)
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(ScoringData)
+        else:
+            raise ValueError(f"Upsert non supporté pour le dialecte {dialect}")
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ScoringData.user_id],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "user_id"}
+        )
+        self.db.execute(stmt, rows)
@@ -0,0 +1,74 @@
+"""
+Cache mémoire des statuts de consentement (local au processus).
+
+Chaque statut est stocké avec les versions des textes pour lesquelles il a
+été calculé (TERMS_VERSION, SCORING_VERSION) et n'est servi que pour ces
+versions : changer une version rend d'un coup tous les statuts en cache
+inutilisables, sans parcourir les utilisateurs (les anciennes entrées
+sortent par LRU/TTL ou sont remplacées à la lecture suivante).
+
+Seuls les statuts complets (crédit autorisé) sont mis en cache : un statut
+incomplet est toujours relu, pour qu'un consentement accepté sur un autre
+worker soit vu immédiatement. `accept_consent` invalide l'entrée de
+l'utilisateur ; un retrait sur un autre worker est vu au plus tard après
+CONSENT_CACHE_TTL_SECONDS.
+
+Le cache ne sert qu'aux lectures d'affichage (statut, menus USSD) : la
+décision de crédit (`LoanService.request_loan`) appelle
+`check_consents(user, use_memory_cache=False)` et relit toujours la base.
+"""
+import threading
+from typing import Dict, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class ConsentCache:
+    """Statuts de consentement par utilisateur (avec leurs versions) et compteurs hit/miss"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, versions: tuple) -> Optional[Dict]:
+        entry = self._cache.get(user_id)
+        if entry is not None and entry[0] == versions:
+            self._count("hits")
+            return dict(entry[1])
+        self._count("misses")
+        return None
+
+    def set(self, user_id: int, versions: tuple, status: Dict):
+        self._cache.set(user_id, (versions, dict(status)))
+
+    def invalidate(self, user_id: int):
+        """Retire le statut de l'utilisateur, quelles que soient ses versions"""
+        self._cache.delete(user_id)
+        self._count("invalidations")
+
+    def clear(self):
+        self._cache.clear()
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._cache)
+        }
+
+
+# Cache partagé par le processus
+consent_cache = ConsentCache(
+    max_entries=settings.CONSENT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CONSENT_CACHE_TTL_SECONDS
+)
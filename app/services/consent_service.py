@@ -1,10 +1,13 @@
 """
 Service de gestion des consentements (T&C)
 """
+from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.db.models import User, Consent, ConsentType
+from app.db.unit_of_work import unit_of_work
 from app.services.audit_service import AuditService
+from app.services.consent_cache import consent_cache
 
 
 class ConsentService:
@@ -13,9 +16,19 @@ class ConsentService:
     TERMS_VERSION = "1.0"
     SCORING_VERSION = "1.0"
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, audit_service: Optional[AuditService] = None):
         self.db = db
-        self.audit_service = AuditService(db)
+        self.audit_service = audit_service or AuditService(db)
+    
+    def current_version(self, consent_type: ConsentType) -> str:
+        """Version courante du texte à accepter"""
+        if consent_type == ConsentType.TERMS_AND_CONDITIONS:
+            return self.TERMS_VERSION
+        return self.SCORING_VERSION
+    
+    def current_versions(self) -> tuple:
+        """Versions courantes (un changement invalide tous les statuts en cache)"""
+        return (self.TERMS_VERSION, self.SCORING_VERSION)
     
     def accept_consent(
         self,
@@ -38,82 +51,107 @@ class ConsentService:
         Returns:
             Consent créé ou mis à jour
         """
-        # Vérifier si un consentement existe déjà
-        existing = self.db.query(Consent).filter(
-            Consent.user_id == user.id,
-            Consent.consent_type == consent_type
-        ).first()
-        
-        if existing:
-            # Mettre à jour
-            existing.version = version
-            existing.accepted = accepted
-            existing.channel = channel
-            if accepted:
-                existing.accepted_at = datetime.now()
-            self.db.commit()
-            self.db.refresh(existing)
-            consent = existing
-        else:
-            # Créer nouveau
-            consent = Consent(
+        with unit_of_work(self.db) as uow:
+            # Vérifier si un consentement existe déjà
+            existing = self.db.query(Consent).filter(
+                Consent.user_id == user.id,
+                Consent.consent_type == consent_type
+            ).first()
+            
+            if existing:
+                # Mettre à jour
+                existing.version = version
+                existing.accepted = accepted
+                existing.channel = channel
+                if accepted:
+                    existing.accepted_at = datetime.now()
+                consent = existing
+            else:
+                # Créer nouveau
+                consent = Consent(
+                    user_id=user.id,
+                    consent_type=consent_type,
+                    version=version,
+                    accepted=accepted,
+                    channel=channel,
+                    accepted_at=datetime.now() if accepted else None
+                )
+                self.db.add(consent)
+            
+            # Audit
+            self.audit_service.log_event(
                 user_id=user.id,
-                consent_type=consent_type,
-                version=version,
-                accepted=accepted,
-                channel=channel,
-                accepted_at=datetime.now() if accepted else None
+                event_type="consent",
+                event_data={
+                    "consent_type": consent_type.value,
+                    "version": version,
+                    "accepted": accepted,
+                    "channel": channel
+                },
+                channel=channel
             )
-            self.db.add(consent)
-            self.db.commit()
-            self.db.refresh(consent)
-        
-        # Audit
-        self.audit_service.log_event(
-            user_id=user.id,
-            event_type="consent",
-            event_data={
-                "consent_type": consent_type.value,
-                "version": version,
-                "accepted": accepted,
-                "channel": channel
-            },
-            channel=channel
-        )
+            
+            consent_cache.invalidate(user.id)
+            # Une lecture concurrente a pu remettre l'ancien statut en cache avant le commit
+            uow.after_commit(lambda: consent_cache.invalidate(user.id))
         
         return consent
     
-    def check_consents(self, user: User) -> dict:
+    def check_consents(self, user: User, use_memory_cache: bool = True) -> dict:
         """
-        Vérifie les consentements d'un utilisateur.
+        Vérifie les consentements d'un utilisateur (une seule requête).
+        
+        Un consentement ne compte que s'il porte sur la version courante du
+        texte (TERMS_VERSION, SCORING_VERSION). Les statuts complets sont
+        mis en cache (voir consent_cache).
+        
+        Args:
+            user: Utilisateur
+            use_memory_cache: Autoriser le cache mémoire local (affichage,
+                menus USSD) ; les décisions de crédit relisent la base
         
         Returns:
             Dict avec le statut des consentements
         """
-        terms_consent = self.db.query(Consent).filter(
-            Consent.user_id == user.id,
-            Consent.consent_type == ConsentType.TERMS_AND_CONDITIONS,
-            Consent.accepted == True
-        ).first()
+        versions = self.current_versions()
+        if use_memory_cache:
+            cached = consent_cache.get(user.id, versions)
+            if cached is not None:
+                return cached
         
-        scoring_consent = self.db.query(Consent).filter(
-            Consent.user_id == user.id,
-            Consent.consent_type == ConsentType.SCORING_DATA_ACCESS,
-            Consent.accepted == True
-        ).first()
+        accepted = {
+            (row.consent_type, row.version)
+            for row in self.db.query(Consent.consent_type, Consent.version).filter(
+                Consent.user_id == user.id,
+                Consent.accepted == True
+            )
+        }
         
-        has_terms = terms_consent is not None
-        has_scoring = scoring_consent is not None
+        current = {
+            (ConsentType.TERMS_AND_CONDITIONS, self.TERMS_VERSION),
+            (ConsentType.SCORING_DATA_ACCESS, self.SCORING_VERSION)
+        }
+        has_terms = (ConsentType.TERMS_AND_CONDITIONS, self.TERMS_VERSION) in accepted
+        has_scoring = (ConsentType.SCORING_DATA_ACCESS, self.SCORING_VERSION) in accepted
         can_request_loan = has_terms and has_scoring
         
-        message = "Consentements complets" if can_request_loan else "Consentements manquants"
+        if can_request_loan:
+            message = "Consentements complets"
+        elif accepted - current:
+            # Accepté, mais pour une version antérieure du texte
+            message = "Nouvelle version des conditions à accepter"
+        else:
+            message = "Consentements manquants"
         
-        return {
+        status = {
             "has_terms_consent": has_terms,
             "has_scoring_consent": has_scoring,
             "can_request_loan": can_request_loan,
             "message": message
         }
+        if can_request_loan:
+            consent_cache.set(user.id, versions, status)
+        return status
     
     def get_consent_text(self, consent_type: ConsentType) -> str:
         """
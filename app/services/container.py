@@ -0,0 +1,98 @@
+"""
+Conteneur de services d'une requête.
+
+Un seul exemplaire de chaque service par requête HTTP, tous sur la même
+session : AuditService, AuthService, ConsentService... sont créés à la
+première utilisation puis partagés (LoanService réutilise le
+ScoringService et le ConsentService du conteneur au lieu de construire les
+siens). AuthService garde les utilisateurs déjà chargés : un même MSISDN
+n'est lu qu'une fois par requête.
+
+Les composants sans état (simulateur, connecteur Mobile Money, caches,
+sessions USSD) sont des singletons de processus.
+"""
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from app.db.db import get_db
+from app.services.audit_service import AuditService
+from app.services.auth_service import AuthService
+from app.services.consent_service import ConsentService
+from app.services.loan_service import LoanService
+from app.services.loan_stats_service import LoanStatsService
+from app.services.scoring_service import ScoringService
+from app.services.ussd_service import USSDService
+
+
+class ServiceContainer:
+    """Services partagés par une requête"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._audit = None
+        self._auth = None
+        self._consent = None
+        self._loan_stats = None
+        self._scoring = None
+        self._loan = None
+        self._ussd = None
+
+    # Propriétés simples plutôt que functools.cached_property, qui prend un
+    # verrou à chaque premier accès (Python < 3.12)
+
+    @property
+    def audit(self) -> AuditService:
+        if self._audit is None:
+            self._audit = AuditService(self.db)
+        return self._audit
+
+    @property
+    def auth(self) -> AuthService:
+        if self._auth is None:
+            self._auth = AuthService(self.db, audit_service=self.audit)
+        return self._auth
+
+    @property
+    def consent(self) -> ConsentService:
+        if self._consent is None:
+            self._consent = ConsentService(self.db, audit_service=self.audit)
+        return self._consent
+
+    @property
+    def loan_stats(self) -> LoanStatsService:
+        if self._loan_stats is None:
+            self._loan_stats = LoanStatsService(self.db)
+        return self._loan_stats
+
+    @property
+    def scoring(self) -> ScoringService:
+        if self._scoring is None:
+            self._scoring = ScoringService(self.db, loan_stats_service=self.loan_stats)
+        return self._scoring
+
+    @property
+    def loan(self) -> LoanService:
+        if self._loan is None:
+            self._loan = LoanService(
+                self.db,
+                scoring_service=self.scoring,
+                consent_service=self.consent,
+                audit_service=self.audit,
+                loan_stats_service=self.loan_stats
+            )
+        return self._loan
+
+    @property
+    def ussd(self) -> USSDService:
+        if self._ussd is None:
+            self._ussd = USSDService(
+                self.db,
+                auth_service=self.auth,
+                consent_service=self.consent,
+                loan_service=self.loan
+            )
+        return self._ussd
+
+
+def get_services(db: Session = Depends(get_db)) -> ServiceContainer:
+    """Dépendance FastAPI : conteneur de services de la requête"""
+    return ServiceContainer(db)
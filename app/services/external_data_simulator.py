@@ -3,6 +3,7 @@ Simulateur de données externes (Mobile Money)
 Ce module simule les données d'un fournisseur Mobile Money.
 En production, ce module sera remplacé par un connecteur réel.
 """
+import hashlib
 import random
 from typing import Dict, Optional
 from datetime import datetime, timedelta
@@ -28,24 +29,27 @@ class ExternalDataSimulator:
                 - mm_monthly_transactions_avg: Nombre de transactions mensuelles
                 - mm_activity_regularity: Régularité d'activité (0.0 à 1.0)
         """
-        # Utiliser le MSISDN comme seed pour avoir des données cohérentes
-        # pour le même utilisateur
-        random.seed(hash(msisdn) % 1000000)
+        # Générateur local initialisé par une empreinte stable du MSISDN :
+        # mêmes données pour un même utilisateur quel que soit le processus
+        # (hash() varie d'un processus à l'autre), sans état global partagé
+        # entre threads
+        seed = int.from_bytes(hashlib.sha256(msisdn.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
         
         # Simuler des données réalistes
-        account_age_months = random.randint(1, 60)  # 1 à 60 mois
+        account_age_months = rng.randint(1, 60)  # 1 à 60 mois
         
         # Volume mensuel moyen (plus élevé si compte ancien)
-        base_volume = random.randint(50000, 500000)
+        base_volume = rng.randint(50000, 500000)
         volume_multiplier = 1 + (account_age_months / 60) * 0.5
         monthly_volume_avg = int(base_volume * volume_multiplier)
         
         # Nombre de transactions mensuelles
-        monthly_transactions_avg = random.randint(5, 50)
+        monthly_transactions_avg = rng.randint(5, 50)
         
         # Régularité d'activité (0.0 à 1.0)
         # Plus le compte est ancien, plus la régularité est élevée
-        base_regularity = random.uniform(0.3, 0.9)
+        base_regularity = rng.uniform(0.3, 0.9)
         regularity_boost = min(account_age_months / 60 * 0.2, 0.2)
         activity_regularity = min(base_regularity + regularity_boost, 1.0)
         
@@ -79,3 +83,7 @@ class ExternalDataSimulator:
             "timestamp": datetime.now().isoformat(),
             "note": "Transaction simulée - Pas de décaissement réel"
         }
+
+
+# Sans état : une seule instance pour tout le processus
+external_data_simulator = ExternalDataSimulator()
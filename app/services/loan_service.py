@@ -1,13 +1,20 @@
 """
 Service de gestion des microcrédits
 """
+from typing import List, Optional, Tuple
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime, timedelta
+from app.core.metrics import loan_decisions, loans_requested
+from app.core.pagination import DEFAULT_PAGE_SIZE, paginate_desc
 from app.db.models import User, Loan, LoanStatus
+from app.db.unit_of_work import unit_of_work
 from app.services.scoring_service import ScoringService
 from app.services.consent_service import ConsentService
 from app.services.audit_service import AuditService
-from app.services.external_data_simulator import ExternalDataSimulator
+from app.services.external_data_simulator import ExternalDataSimulator, external_data_simulator
+from app.services.loan_stats_service import LoanStatsService
 
 
 class LoanService:
@@ -17,12 +24,24 @@ class LoanService:
     DEFAULT_INTEREST_RATE = 5.0  # 5% pour les premiers crédits
     STANDARD_INTEREST_RATE = 3.0  # 3% pour les crédits suivants
     
-    def __init__(self, db: Session):
+    # Remboursement rejoué si le crédit change entre la lecture et l'écriture
+    REPAY_MAX_ATTEMPTS = 3
+    
+    def __init__(
+        self,
+        db: Session,
+        scoring_service: Optional[ScoringService] = None,
+        consent_service: Optional[ConsentService] = None,
+        audit_service: Optional[AuditService] = None,
+        loan_stats_service: Optional[LoanStatsService] = None,
+        external_simulator: Optional[ExternalDataSimulator] = None
+    ):
         self.db = db
-        self.scoring_service = ScoringService(db)
-        self.consent_service = ConsentService(db)
-        self.audit_service = AuditService(db)
-        self.external_simulator = ExternalDataSimulator()
+        self.audit_service = audit_service or AuditService(db)
+        self.loan_stats_service = loan_stats_service or LoanStatsService(db)
+        self.scoring_service = scoring_service or ScoringService(db, loan_stats_service=self.loan_stats_service)
+        self.consent_service = consent_service or ConsentService(db, audit_service=self.audit_service)
+        self.external_simulator = external_simulator or external_data_simulator
     
     def request_loan(
         self,
@@ -34,6 +53,9 @@ class LoanService:
         """
         Traite une demande de crédit.
         
+        Une seule transaction : crédit, compteurs, score et événements
+        d'audit sont commités ensemble.
+        
         Args:
             user: Utilisateur
             amount: Montant demandé
@@ -43,125 +65,130 @@ class LoanService:
         Returns:
             Loan créé avec décision
         """
-        # Vérifier les consentements
-        consents = self.consent_service.check_consents(user)
-        if not consents["can_request_loan"]:
-            raise ValueError("Les consentements requis ne sont pas acceptés")
-        
-        # Vérifier qu'il n'y a pas de crédit actif
-        active_loan = self.db.query(Loan).filter(
-            Loan.user_id == user.id,
-            Loan.status.in_([LoanStatus.ACTIVE, LoanStatus.PENDING])
-        ).first()
-        
-        if active_loan:
-            raise ValueError("Un crédit est déjà actif. Veuillez le rembourser d'abord.")
-        
-        # Calculer le score
-        score_result = self.scoring_service.calculate_score(user, force_recalculate=True)
-        score = score_result["score"]
-        max_loan_amount = score_result["max_loan_amount"]
-        
-        # Vérifier le montant demandé
-        if amount > max_loan_amount:
-            raise ValueError(
-                f"Montant demandé ({amount}) dépasse le plafond autorisé ({max_loan_amount} FCFA)"
-            )
-        
-        # Déterminer le taux d'intérêt
-        is_first_loan = score_result["is_first_loan"]
-        interest_rate = self.DEFAULT_INTEREST_RATE if is_first_loan else self.STANDARD_INTEREST_RATE
-        
-        # Calculer le montant approuvé (avec intérêts)
-        interest_amount = int(amount * (interest_rate / 100))
-        amount_approved = amount + interest_amount
-        
-        # Prendre une décision
-        # Pour le MVP, on approuve si le score >= 400
-        decision = LoanStatus.APPROVED if score >= 400 else LoanStatus.REJECTED
-        decision_reason = self._generate_decision_reason(score, amount, max_loan_amount, decision)
-        
-        # Calculer la date d'échéance
-        due_date = datetime.now() + timedelta(days=duration_days) if decision == LoanStatus.APPROVED else None
-        
-        # Créer le crédit
-        loan = Loan(
-            user_id=user.id,
-            amount_requested=amount,
-            amount_approved=amount_approved if decision == LoanStatus.APPROVED else None,
-            amount_remaining=amount_approved if decision == LoanStatus.APPROVED else 0,
-            interest_rate=interest_rate,
-            duration_days=duration_days,
-            status=LoanStatus.ACTIVE if decision == LoanStatus.APPROVED else LoanStatus.REJECTED,
-            decided_at=datetime.now(),
-            due_date=due_date,
-            score_at_request=score,
-            score_explanation=score_result["explanation"],
-            decision_reason=decision_reason
-        )
-        
-        self.db.add(loan)
-        self.db.commit()
-        self.db.refresh(loan)
-        
-        # Audit - Demande
-        self.audit_service.log_event(
-            event_type="loan_request",
-            user_id=user.id,
-            event_data={
-                "loan_id": loan.id,
-                "amount_requested": amount,
-                "duration_days": duration_days,
-                "score": score,
-                "max_loan_amount": max_loan_amount
-            },
-            channel=channel
-        )
-        
-        # Si approuvé, simuler le décaissement
-        if decision == LoanStatus.APPROVED:
-            payout_result = self.external_simulator.simulate_payout(user.msisdn, amount)
+        with unit_of_work(self.db) as uow:
+            # Consentements relus en base : un retrait sur un autre worker compte tout de suite
+            consents = self.consent_service.check_consents(user, use_memory_cache=False)
+            if not consents["can_request_loan"]:
+                raise ValueError("Les consentements requis ne sont pas acceptés")
             
-            # Audit - Décision
-            self.audit_service.log_event(
-                event_type="loan_decision",
-                user_id=user.id,
-                event_data={
-                    "loan_id": loan.id,
-                    "decision": "APPROVED",
-                    "amount_approved": amount_approved,
-                    "due_date": due_date.isoformat() if due_date else None,
-                    "score": score,
-                    "reason": decision_reason
-                },
-                channel=channel
-            )
+            # Vérifier qu'il n'y a pas de crédit actif ni en retard
+            loan_stats = self.loan_stats_service.get_stats(user.id)
+            if loan_stats["active_loans_count"] > 0 or loan_stats["overdue_loans_count"] > 0:
+                raise ValueError("Un crédit est déjà actif. Veuillez le rembourser d'abord.")
             
-            # Audit - Décaissement simulé
-            self.audit_service.log_event(
-                event_type="payout_simulated",
+            # Score persisté (recalculé s'il a été invalidé ou a expiré)
+            score_result = self.scoring_service.calculate_score(user, use_memory_cache=False)
+            score = score_result["score"]
+            max_loan_amount = score_result["max_loan_amount"]
+            
+            # Vérifier le montant demandé
+            if amount > max_loan_amount:
+                raise ValueError(
+                    f"Montant demandé ({amount}) dépasse le plafond autorisé ({max_loan_amount} FCFA)"
+                )
+            
+            # Déterminer le taux d'intérêt
+            is_first_loan = score_result["is_first_loan"]
+            interest_rate = self.DEFAULT_INTEREST_RATE if is_first_loan else self.STANDARD_INTEREST_RATE
+            
+            # Calculer le montant approuvé (avec intérêts)
+            interest_amount = int(amount * (interest_rate / 100))
+            amount_approved = amount + interest_amount
+            
+            # Prendre une décision
+            # Pour le MVP, on approuve si le score >= 400
+            decision = LoanStatus.APPROVED if score >= 400 else LoanStatus.REJECTED
+            decision_reason = self._generate_decision_reason(score, amount, max_loan_amount, decision)
+            
+            # Calculer la date d'échéance
+            due_date = datetime.now() + timedelta(days=duration_days) if decision == LoanStatus.APPROVED else None
+            
+            # Créer le crédit
+            loan = Loan(
                 user_id=user.id,
-                event_data={
-                    "loan_id": loan.id,
-                    "amount": amount,
-                    "transaction_id": payout_result["transaction_id"],
-                    "status": payout_result["status"]
-                },
-                channel=channel
+                amount_requested=amount,
+                amount_approved=amount_approved if decision == LoanStatus.APPROVED else None,
+                amount_remaining=amount_approved if decision == LoanStatus.APPROVED else 0,
+                interest_rate=interest_rate,
+                duration_days=duration_days,
+                status=LoanStatus.ACTIVE if decision == LoanStatus.APPROVED else LoanStatus.REJECTED,
+                requested_at=datetime.now(),  # Horodatage applicatif : clé de pagination
+                decided_at=datetime.now(),
+                due_date=due_date,
+                score_at_request=score,
+                score_explanation=score_result["explanation"],
+                decision_reason=decision_reason
             )
-        else:
-            # Audit - Rejet
+            
+            self.db.add(loan)
+            self.loan_stats_service.record_new_loan(user.id, loan.status)
+            self.scoring_service.invalidate(user.id)
+            uow.flush()  # loan.id pour les événements d'audit
+            
+            # Audit - Demande
             self.audit_service.log_event(
-                event_type="loan_decision",
+                event_type="loan_request",
                 user_id=user.id,
                 event_data={
                     "loan_id": loan.id,
-                    "decision": "REJECTED",
+                    "amount_requested": amount,
+                    "duration_days": duration_days,
                     "score": score,
-                    "reason": decision_reason
+                    "max_loan_amount": max_loan_amount
                 },
-                channel=channel
+                channel=channel,
+                loan_id=loan.id
             )
+            
+            # Si approuvé, simuler le décaissement
+            if decision == LoanStatus.APPROVED:
+                payout_result = self.external_simulator.simulate_payout(user.msisdn, amount)
+            
+                # Audit - Décision
+                self.audit_service.log_event(
+                    event_type="loan_decision",
+                    user_id=user.id,
+                    event_data={
+                        "loan_id": loan.id,
+                        "decision": "APPROVED",
+                        "amount_approved": amount_approved,
+                        "due_date": due_date.isoformat() if due_date else None,
+                        "score": score,
+                        "reason": decision_reason
+                    },
+                    channel=channel,
+                    loan_id=loan.id
+                )
+            
+                # Audit - Décaissement simulé
+                self.audit_service.log_event(
+                    event_type="payout_simulated",
+                    user_id=user.id,
+                    event_data={
+                        "loan_id": loan.id,
+                        "amount": amount,
+                        "transaction_id": payout_result["transaction_id"],
+                        "status": payout_result["status"]
+                    },
+                    channel=channel,
+                    loan_id=loan.id
+                )
+            else:
+                # Audit - Rejet
+                self.audit_service.log_event(
+                    event_type="loan_decision",
+                    user_id=user.id,
+                    event_data={
+                        "loan_id": loan.id,
+                        "decision": "REJECTED",
+                        "score": score,
+                        "reason": decision_reason
+                    },
+                    channel=channel,
+                    loan_id=loan.id
+                )
+            
+            uow.after_commit(lambda: _count_decision(channel, decision))
         
         return loan
     
@@ -173,7 +200,7 @@ class LoanService:
         channel: str = "APP"
     ) -> dict:
         """
-        Traite un remboursement de crédit.
+        Traite un remboursement de crédit (une seule transaction, audit compris).
         
         Args:
             user: Utilisateur
@@ -184,55 +211,91 @@ class LoanService:
         Returns:
             Dict avec les détails du remboursement
         """
-        # Récupérer le crédit
-        loan = self.db.query(Loan).filter(
-            Loan.id == loan_id,
-            Loan.user_id == user.id
-        ).first()
-        
-        if not loan:
-            raise ValueError("Crédit introuvable")
-        
-        if loan.status not in [LoanStatus.ACTIVE, LoanStatus.OVERDUE]:
-            raise ValueError(f"Ce crédit ne peut pas être remboursé (statut: {loan.status.value})")
-        
-        if amount > loan.amount_remaining:
-            raise ValueError(
-                f"Le montant ({amount}) dépasse le montant restant ({loan.amount_remaining} FCFA)"
+        with unit_of_work(self.db):
+            # Récupérer le crédit
+            loan = self.db.query(Loan).filter(
+                Loan.id == loan_id,
+                Loan.user_id == user.id
+            ).first()
+            
+            if not loan:
+                raise ValueError("Crédit introuvable")
+            
+            # Le balayage des retards ou un autre remboursement a pu modifier le
+            # crédit depuis la lecture : écriture conditionnelle, relue en cas de conflit
+            for _ in range(self.REPAY_MAX_ATTEMPTS):
+                if loan.status not in [LoanStatus.ACTIVE, LoanStatus.OVERDUE]:
+                    raise ValueError(f"Ce crédit ne peut pas être remboursé (statut: {loan.status.value})")
+                
+                if amount > loan.amount_remaining:
+                    raise ValueError(
+                        f"Le montant ({amount}) dépasse le montant restant ({loan.amount_remaining} FCFA)"
+                    )
+                
+                previous_status = loan.status
+                is_fully_repaid = loan.amount_remaining == amount
+                new_status = LoanStatus.REPAID if is_fully_repaid else previous_status
+                if self._write_repayment(loan, amount, new_status):
+                    break
+                self.db.refresh(loan)
+            else:
+                raise ValueError("Le crédit a été modifié pendant le remboursement, veuillez réessayer")
+            
+            # Transition réellement écrite (statut vérifié par l'UPDATE)
+            self.loan_stats_service.record_transition(user.id, previous_status, new_status)
+            
+            self.scoring_service.invalidate(user.id)
+            
+            # Audit
+            self.audit_service.log_event(
+                event_type="repay",
+                user_id=user.id,
+                event_data={
+                    "loan_id": loan.id,
+                    "amount_paid": amount,
+                    "amount_remaining": loan.amount_remaining,
+                    "is_fully_repaid": is_fully_repaid
+                },
+                channel=channel,
+                loan_id=loan.id
             )
-        
-        # Mettre à jour le montant restant
-        loan.amount_remaining -= amount
-        
-        # Vérifier si le crédit est entièrement remboursé
-        is_fully_repaid = loan.amount_remaining == 0
-        if is_fully_repaid:
-            loan.status = LoanStatus.REPAID
-            loan.repaid_at = datetime.now()
-        
-        self.db.commit()
-        self.db.refresh(loan)
-        
-        # Audit
-        self.audit_service.log_event(
-            event_type="repay",
-            user_id=user.id,
-            event_data={
+            
+            result = {
                 "loan_id": loan.id,
                 "amount_paid": amount,
                 "amount_remaining": loan.amount_remaining,
-                "is_fully_repaid": is_fully_repaid
-            },
-            channel=channel
-        )
+                "is_fully_repaid": is_fully_repaid,
+                "message": "Crédit entièrement remboursé" if is_fully_repaid else f"Montant restant: {loan.amount_remaining} FCFA"
+            }
         
-        return {
-            "loan_id": loan.id,
-            "amount_paid": amount,
-            "amount_remaining": loan.amount_remaining,
-            "is_fully_repaid": is_fully_repaid,
-            "message": "Crédit entièrement remboursé" if is_fully_repaid else f"Montant restant: {loan.amount_remaining} FCFA"
-        }
+        return result
+    
+    def _write_repayment(self, loan: Loan, amount: int, new_status: LoanStatus) -> bool:
+        """
+        Applique un remboursement si le crédit est toujours dans l'état lu.
+        
+        Returns:
+            False si le statut ou le restant dû a changé en base (rien n'est écrit)
+        """
+        values = {"amount_remaining": loan.amount_remaining - amount, "status": new_status}
+        if new_status == LoanStatus.REPAID:
+            values["repaid_at"] = datetime.now()
+        loans = Loan.__table__
+        updated = self.db.execute(
+            update(loans)
+            .where(
+                loans.c.id == loan.id,
+                loans.c.status == loan.status,
+                loans.c.amount_remaining == loan.amount_remaining
+            )
+            .values(**values)
+        ).rowcount
+        if not updated:
+            return False
+        # État en session aligné sur la ligne écrite (pas de second UPDATE au flush)
+        for name, value in values.items():
+            set_committed_value(loan, name, value)
+        return True
     
     def get_loan_status(self, user: User, loan_id: int) -> dict:
         """
@@ -276,6 +339,8 @@ class LoanService:
         """
         Récupère tous les crédits d'un utilisateur.
         
+        Pour un affichage, préférer `get_loan_history` (paginé).
+        
         Args:
             user: Utilisateur
             
@@ -286,6 +351,37 @@ class LoanService:
             Loan.user_id == user.id
         ).order_by(Loan.requested_at.desc()).all()
     
+    def get_loan_history(
+        self,
+        user: User,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[LoanStatus] = None
+    ) -> Tuple[List[Loan], Optional[str]]:
+        """
+        Une page de l'historique des crédits, du plus récent au plus ancien.
+        
+        Args:
+            user: Utilisateur
+            limit: Taille de la page
+            cursor: Curseur renvoyé par la page précédente
+            status: Filtrer sur un statut
+            
+        Returns:
+            (crédits, curseur de la page suivante ou None)
+        """
+        query = self.db.query(Loan).filter(Loan.user_id == user.id)
+        if status is not None:
+            query = query.filter(Loan.status == status)
+        return paginate_desc(query, Loan.requested_at, Loan.id, limit, cursor)
+    
+    def get_active_loans(self, user: User, limit: int = 5) -> List[Loan]:
+        """Crédits à rembourser (ACTIVE/OVERDUE), les plus récents, au plus `limit`"""
+        return self.db.query(Loan).filter(
+            Loan.user_id == user.id,
+            Loan.status.in_([LoanStatus.ACTIVE, LoanStatus.OVERDUE])
+        ).order_by(Loan.requested_at.desc(), Loan.id.desc()).limit(limit).all()
+    
     def _generate_decision_reason(
         self,
         score: float,
@@ -303,3 +399,9 @@ class LoanService:
                 return f"Montant demandé ({amount}) dépasse le plafond ({max_amount} FCFA)"
             else:
                 return "Crédit refusé pour raisons de scoring"
+
+
+def _count_decision(channel: str, decision: LoanStatus):
+    """Compteurs de demandes et de décisions (crédit commité uniquement)"""
+    loans_requested.inc(channel)
+    loan_decisions.inc(decision.value.lower())
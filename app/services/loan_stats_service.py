@@ -0,0 +1,198 @@
+"""
+Compteurs de crédits par utilisateur.
+
+Le scoring et la demande de crédit ont besoin, pour un utilisateur, du
+nombre de crédits (total, remboursés, en retard, actifs). Plutôt que de
+relire tous ses crédits, ces nombres sont tenus dans `user_loan_stats` et
+mis à jour par un UPDATE atomique (`x = x + :n`) dans la transaction qui
+crée le crédit ou change son statut.
+
+`aggregate` recalcule les mêmes nombres par une requête GROUP BY sur
+loans ; elle sert à reconstruire et à vérifier les compteurs.
+"""
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.db.models import Loan, LoanStatus, User, UserLoanStats
+
+# Statuts comptés comme crédit actif (bloquent une nouvelle demande)
+ACTIVE_STATUSES = (LoanStatus.ACTIVE, LoanStatus.PENDING)
+
+COUNTERS = ["total_loans_count", "repaid_loans_count", "overdue_loans_count", "active_loans_count"]
+
+
+def status_counters(status: LoanStatus) -> Dict[str, int]:
+    """Contribution d'un crédit d'un statut donné aux compteurs (hors total)"""
+    return {
+        "repaid_loans_count": int(status == LoanStatus.REPAID),
+        "overdue_loans_count": int(status == LoanStatus.OVERDUE),
+        "active_loans_count": int(status in ACTIVE_STATUSES),
+    }
+
+
+class LoanStatsService:
+    """Service de maintenance des compteurs de crédits"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_stats(self, user_id: int) -> Dict[str, int]:
+        """
+        Compteurs d'un utilisateur (lecture par clé primaire).
+        
+        Les compteurs absents (utilisateur antérieur à la table) sont
+        reconstruits à la volée.
+        """
+        stats = self.db.get(UserLoanStats, user_id)
+        if stats is None:
+            return self.rebuild_user(user_id)
+        return {name: getattr(stats, name) for name in COUNTERS}
+    
+    def record_new_loan(self, user_id: int, status: LoanStatus):
+        """Compte un crédit créé (à appeler avant le commit de la création)"""
+        deltas = status_counters(status)
+        deltas["total_loans_count"] = 1
+        self._apply(user_id, deltas)
+    
+    def record_transition(self, user_id: int, old_status: LoanStatus, new_status: LoanStatus):
+        """Répercute un changement de statut (à appeler avant le commit)"""
+        if old_status == new_status:
+            return
+        before = status_counters(old_status)
+        after = status_counters(new_status)
+        self._apply(user_id, {name: after[name] - before[name] for name in after})
+    
+    def record_bulk_transition(self, loans_per_user: Dict[int, int], old_status: LoanStatus, new_status: LoanStatus):
+        """
+        Répercute un même changement de statut pour plusieurs crédits.
+        
+        Un UPDATE exécuté en lot (executemany) ; les compteurs absents
+        sont reconstruits.
+        
+        Args:
+            loans_per_user: {user_id: nombre de crédits concernés}
+        """
+        if not loans_per_user or old_status == new_status:
+            return
+        before = status_counters(old_status)
+        after = status_counters(new_status)
+        table = UserLoanStats.__table__
+        values = {
+            name: table.c[name] + (after[name] - before[name]) * bindparam("n")
+            for name in after if after[name] != before[name]
+        }
+        values["updated_at"] = func.now()
+        self.db.connection().execute(
+            update(table).where(table.c.user_id == bindparam("uid")).values(**values),
+            [{"uid": user_id, "n": count} for user_id, count in loans_per_user.items()]
+        )
+        
+        existing = set(self.db.execute(
+            select(UserLoanStats.user_id).where(UserLoanStats.user_id.in_(list(loans_per_user)))
+        ).scalars())
+        for user_id in loans_per_user:
+            if user_id not in existing:
+                self.rebuild_user(user_id)
+    
+    def _apply(self, user_id: int, deltas: Dict[str, int]):
+        """UPDATE atomique des compteurs ; reconstruction s'ils n'existent pas"""
+        values = {
+            getattr(UserLoanStats, name): getattr(UserLoanStats, name) + delta
+            for name, delta in deltas.items() if delta
+        }
+        if not values:
+            return
+        values[UserLoanStats.updated_at] = func.now()
+        updated = self.db.query(UserLoanStats).filter(
+            UserLoanStats.user_id == user_id
+        ).update(values, synchronize_session=False)
+        if not updated:
+            # Le GROUP BY voit déjà le changement en cours une fois flushé
+            self.db.flush()
+            self.rebuild_user(user_id)
+        else:
+            stats = self.db.identity_map.get(self.db.identity_key(UserLoanStats, (user_id,)))
+            if stats is not None:
+                self.db.expire(stats)
+    
+    def aggregate(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Compteurs recalculés depuis loans (une requête GROUP BY user_id, status).
+        
+        Args:
+            user_ids: Utilisateurs à agréger (tous si None)
+            
+        Returns:
+            {user_id: compteurs} pour les utilisateurs ayant au moins un crédit
+        """
+        query = select(Loan.user_id, Loan.status, func.count(Loan.id)).group_by(Loan.user_id, Loan.status)
+        if user_ids is not None:
+            query = query.where(Loan.user_id.in_(list(user_ids)))
+        
+        result: Dict[int, Dict[str, int]] = {}
+        for user_id, status, count in self.db.execute(query):
+            counters = result.setdefault(user_id, dict.fromkeys(COUNTERS, 0))
+            counters["total_loans_count"] += count
+            for name, weight in status_counters(status).items():
+                counters[name] += weight * count
+        return result
+    
+    def rebuild_user(self, user_id: int) -> Dict[str, int]:
+        """Reconstruit les compteurs d'un utilisateur (dans la transaction en cours)"""
+        counters = self.aggregate([user_id]).get(user_id, dict.fromkeys(COUNTERS, 0))
+        self.db.execute(delete(UserLoanStats).where(UserLoanStats.user_id == user_id))
+        self.db.execute(insert(UserLoanStats).values(user_id=user_id, **counters))
+        return counters
+    
+    def rebuild_all(self, chunk_size: int = 5000) -> int:
+        """
+        Reconstruit les compteurs de tous les utilisateurs (un commit par tranche).
+        
+        Returns:
+            Nombre d'utilisateurs traités
+        """
+        done = 0
+        for user_ids in self._user_id_chunks(chunk_size):
+            aggregated = self.aggregate(user_ids)
+            self.db.execute(delete(UserLoanStats).where(UserLoanStats.user_id.in_(user_ids)))
+            self.db.execute(insert(UserLoanStats), [
+                {"user_id": user_id, **aggregated.get(user_id, dict.fromkeys(COUNTERS, 0))}
+                for user_id in user_ids
+            ])
+            self.db.commit()
+            done += len(user_ids)
+        return done
+    
+    def verify(self, chunk_size: int = 5000) -> List[Dict]:
+        """
+        Compare les compteurs enregistrés aux compteurs recalculés.
+        
+        Returns:
+            Écarts : [{"user_id", "stored", "expected"}, ...]
+        """
+        mismatches = []
+        for user_ids in self._user_id_chunks(chunk_size):
+            aggregated = self.aggregate(user_ids)
+            stored = {
+                row.user_id: {name: getattr(row, name) for name in COUNTERS}
+                for row in self.db.execute(
+                    select(UserLoanStats).where(UserLoanStats.user_id.in_(user_ids))
+                ).scalars()
+            }
+            for user_id in user_ids:
+                expected = aggregated.get(user_id, dict.fromkeys(COUNTERS, 0))
+                if stored.get(user_id) != expected:
+                    mismatches.append({"user_id": user_id, "stored": stored.get(user_id), "expected": expected})
+        return mismatches
+    
+    def _user_id_chunks(self, chunk_size: int):
+        """Identifiants d'utilisateurs par tranches de clé primaire"""
+        last_id = 0
+        while True:
+            user_ids = self.db.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+            ).scalars().all()
+            if not user_ids:
+                return
+            yield user_ids
+            last_id = user_ids[-1]
@@ -0,0 +1,448 @@
+"""
+Connecteurs de données Mobile Money.
+
+Le scoring lit les caractéristiques Mobile Money d'un abonné à travers
+`MobileMoneyConnector`. Deux implémentations :
+- `SimulatedMobileMoneyConnector` : le simulateur déterministe (développement) ;
+- `HttpMobileMoneyConnector` : l'API du fournisseur, appelée par un client
+  httpx asynchrone (pool de connexions, timeouts, nouvelles tentatives).
+
+`CachedMobileMoneyConnector` enveloppe l'un ou l'autre : cache par MSISDN
+avec rafraîchissement en arrière-plan des données périmées
+(stale-while-revalidate) et disjoncteur. Quand le fournisseur est
+indisponible, les données périmées sont servies tant qu'elles ont moins de
+MOBILE_MONEY_CACHE_STALE_SECONDS ; sinon `MobileMoneyUnavailableError`
+est levée (HTTP 503).
+
+Contrat de l'API fournisseur:
+    GET {MOBILE_MONEY_BASE_URL}/v1/subscribers/{msisdn}/profile
+    200 -> {"account_age_months", "monthly_volume_avg",
+            "monthly_transactions_avg", "activity_regularity"}
+    404 -> abonné sans compte Mobile Money
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional
+from app.core.cache import TTLCache
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+from app.services.external_data_simulator import ExternalDataSimulator, external_data_simulator
+
+logger = logging.getLogger(__name__)
+
+# Données d'un abonné sans compte Mobile Money
+EMPTY_PROFILE = {
+    "mm_account_age_months": 0,
+    "mm_monthly_volume_avg": 0,
+    "mm_monthly_transactions_avg": 0,
+    "mm_activity_regularity": 0.0,
+}
+
+
+class MobileMoneyUnavailableError(RuntimeError):
+    """Le fournisseur Mobile Money ne répond pas et aucune donnée n'est en cache"""
+
+    def __init__(self, message: str, retry_after_seconds: float = 1.0):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class MobileMoneyConnector:
+    """Interface d'accès aux données Mobile Money"""
+
+    def get_mobile_money_data(self, msisdn: str) -> Dict:
+        """
+        Caractéristiques Mobile Money d'un abonné.
+
+        Returns:
+            Dict avec mm_account_age_months, mm_monthly_volume_avg,
+            mm_monthly_transactions_avg et mm_activity_regularity
+        """
+        raise NotImplementedError
+
+    def get_many(self, msisdns: Iterable[str]) -> Dict[str, Dict]:
+        """Caractéristiques de plusieurs abonnés ({msisdn: données})"""
+        return {msisdn: self.get_mobile_money_data(msisdn) for msisdn in msisdns}
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__}
+
+    def close(self):
+        """Libère les ressources (arrêt du serveur)"""
+
+
+class SimulatedMobileMoneyConnector(MobileMoneyConnector):
+    """Données simulées, déterministes par MSISDN"""
+
+    def __init__(self, simulator: Optional[ExternalDataSimulator] = None):
+        self.simulator = simulator or external_data_simulator
+
+    def get_mobile_money_data(self, msisdn: str) -> Dict:
+        return self.simulator.get_mobile_money_data(msisdn)
+
+
+class HttpMobileMoneyConnector(MobileMoneyConnector):
+    """
+    Client de l'API du fournisseur.
+
+    Les appels sont des coroutines httpx exécutées sur une boucle asyncio
+    dédiée (thread de fond) : les endpoints synchrones attendent le résultat
+    avec une échéance globale, et les lots (`get_many`) sont parallélisés
+    sur un même pool de connexions.
+    """
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = "",
+        connect_timeout_seconds: float = 0.5,
+        read_timeout_seconds: float = 1.0,
+        deadline_seconds: float = 2.5,
+        max_retries: int = 2,
+        retry_backoff_seconds: float = 0.1,
+        max_connections: int = 50,
+        max_concurrency: int = 20
+    ):
+        import httpx
+
+        self._httpx = httpx
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_concurrency = max_concurrency
+        self._timeout = httpx.Timeout(read_timeout_seconds, connect=connect_timeout_seconds)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Métriques
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    # ----- Boucle asyncio de fond -----
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="mobile-money-http", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    def _run(self, coroutine, timeout: float):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.failures += 1
+            raise MobileMoneyUnavailableError(f"Échéance de {timeout}s dépassée")
+
+    def _get_client(self):
+        # Créé dans la boucle de fond, seule à l'utiliser
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = self._httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self._timeout,
+                limits=self._limits,
+                headers=headers
+            )
+        return self._client
+
+    # ----- Appels -----
+
+    async def _fetch(self, msisdn: str) -> Dict:
+        """Un appel, avec nouvelles tentatives (backoff exponentiel)"""
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff_seconds * (2 ** (attempt - 1)))
+            self.requests += 1
+            try:
+                response = await client.get(f"/v1/subscribers/{msisdn}/profile")
+            except self._httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code == 404:
+                return dict(EMPTY_PROFILE)
+            if response.status_code in self.RETRYABLE_STATUS:
+                error = f"HTTP {response.status_code}"
+                continue
+            if response.status_code != 200:
+                self.failures += 1
+                raise MobileMoneyUnavailableError(f"HTTP {response.status_code}")
+            return self._parse_profile(response.json())
+
+        self.failures += 1
+        raise MobileMoneyUnavailableError(f"Échec après {self.max_retries + 1} tentatives ({error})")
+
+    async def _fetch_many(self, msisdns: List[str]) -> Dict[str, Dict]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(msisdn: str):
+            async with semaphore:
+                return await self._fetch(msisdn)
+
+        results = await asyncio.gather(*(bounded(m) for m in msisdns), return_exceptions=True)
+        return {m: r for m, r in zip(msisdns, results)}
+
+    @staticmethod
+    def _parse_profile(payload: Dict) -> Dict:
+        return {
+            "mm_account_age_months": int(payload.get("account_age_months") or 0),
+            "mm_monthly_volume_avg": int(payload.get("monthly_volume_avg") or 0),
+            "mm_monthly_transactions_avg": int(payload.get("monthly_transactions_avg") or 0),
+            "mm_activity_regularity": float(payload.get("activity_regularity") or 0.0),
+        }
+
+    def get_mobile_money_data(self, msisdn: str) -> Dict:
+        return self._run(self._fetch(msisdn), timeout=self.deadline_seconds)
+
+    def get_many(self, msisdns: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Appels parallèles (au plus max_concurrency à la fois).
+
+        Les abonnés en échec sont absents du résultat.
+        """
+        msisdns = list(msisdns)
+        if not msisdns:
+            return {}
+        # Échéance proportionnelle au nombre de vagues d'appels
+        waves = -(-len(msisdns) // self.max_concurrency)
+        results = self._run(self._fetch_many(msisdns), timeout=self.deadline_seconds * waves)
+        return {m: r for m, r in results.items() if not isinstance(r, BaseException)}
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+
+class CachedMobileMoneyConnector(MobileMoneyConnector):
+    """
+    Cache par MSISDN (stale-while-revalidate) et disjoncteur autour d'un connecteur.
+
+    - données de moins de `ttl_seconds` : servies depuis le cache ;
+    - données plus anciennes (moins de `ttl_seconds + stale_seconds`) :
+      servies immédiatement, rafraîchies en arrière-plan ;
+    - absentes : appel synchrone au fournisseur ; en cas d'échec ou de
+      circuit ouvert, la donnée périmée est servie si elle existe.
+    """
+
+    def __init__(
+        self,
+        inner: MobileMoneyConnector,
+        ttl_seconds: float,
+        stale_seconds: float,
+        max_entries: int,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.inner = inner
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds + stale_seconds)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mobile-money-refresh")
+        self._metrics_lock = threading.Lock()
+
+        # Métriques
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.stale_served_on_error = 0
+
+    def get_mobile_money_data(self, msisdn: str) -> Dict:
+        entry = self._cache.get(msisdn)
+        if entry is not None:
+            data, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl_seconds:
+                self._count("fresh_hits")
+            else:
+                self._count("stale_hits")
+                self._schedule_refresh(msisdn)
+            return dict(data)
+
+        self._count("misses")
+        return dict(self._fetch(msisdn))
+
+    def get_many(self, msisdns: Iterable[str]) -> Dict[str, Dict]:
+        """Lit le cache puis interroge le fournisseur en un lot pour le reste"""
+        results = {}
+        missing = []
+        now = time.monotonic()
+        for msisdn in msisdns:
+            entry = self._cache.get(msisdn)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._count("fresh_hits")
+                results[msisdn] = dict(entry[0])
+            else:
+                missing.append(msisdn)
+        if not missing:
+            return results
+
+        fetched = {}
+        if self.breaker.allow_request():
+            try:
+                fetched = self.inner.get_many(missing)
+            except Exception:
+                logger.exception("Échec du lot Mobile Money (%s abonnés)", len(missing))
+            # Un abonné sans réponse est un échec de transport (absent du résultat du lot)
+            failed = len(missing) - len(fetched)
+            if not failed:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+                if fetched:
+                    logger.warning("Lot Mobile Money partiel : %s abonnés sur %s sans réponse", failed, len(missing))
+        for msisdn, data in fetched.items():
+            self._cache.set(msisdn, (data, time.monotonic()))
+            results[msisdn] = dict(data)
+
+        # Données périmées pour les abonnés restés sans réponse
+        for msisdn in missing:
+            if msisdn not in results:
+                entry = self._cache.get(msisdn)
+                if entry is not None:
+                    self._count("stale_served_on_error")
+                    results[msisdn] = dict(entry[0])
+        return results
+
+    def _fetch(self, msisdn: str) -> Dict:
+        """Appel protégé par le disjoncteur, repli sur la donnée périmée"""
+        if not self.breaker.allow_request():
+            return self._stale_or_raise(msisdn, "Fournisseur Mobile Money indisponible (circuit ouvert)")
+        try:
+            data = self.inner.get_mobile_money_data(msisdn)
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.warning("Échec de l'appel Mobile Money pour %s: %s", msisdn, e)
+            return self._stale_or_raise(msisdn, f"Fournisseur Mobile Money indisponible ({e})")
+        self.breaker.record_success()
+        self._cache.set(msisdn, (data, time.monotonic()))
+        return data
+
+    def _stale_or_raise(self, msisdn: str, message: str) -> Dict:
+        entry = self._cache.get(msisdn)
+        if entry is not None:
+            self._count("stale_served_on_error")
+            return entry[0]
+        raise MobileMoneyUnavailableError(message, retry_after_seconds=max(1.0, self.breaker.retry_after_seconds()))
+
+    def _schedule_refresh(self, msisdn: str):
+        """Rafraîchit une entrée périmée en arrière-plan (une fois par MSISDN)"""
+        with self._refresh_lock:
+            if msisdn in self._refreshing:
+                return
+            self._refreshing.add(msisdn)
+
+        def refresh():
+            try:
+                self._fetch(msisdn)
+            except MobileMoneyUnavailableError:
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(msisdn)
+
+        self._refresh_pool.submit(refresh)
+
+    def invalidate(self, msisdn: str):
+        self._cache.delete(msisdn)
+
+    def _count(self, name: str):
+        with self._metrics_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def close(self):
+        self._refresh_pool.shutdown(wait=False)
+        self.inner.close()
+
+    def stats(self) -> Dict:
+        lookups = self.fresh_hits + self.stale_hits + self.misses
+        return {
+            "backend": type(self.inner).__name__,
+            "cache_entries": len(self._cache),
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "stale_served_on_error": self.stale_served_on_error,
+            "hit_rate": round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "circuit_breaker": self.breaker.stats(),
+            "provider": self.inner.stats()
+        }
+
+
+def create_mobile_money_connector() -> MobileMoneyConnector:
+    """Construit le connecteur selon MOBILE_MONEY_BACKEND"""
+    if settings.MOBILE_MONEY_BACKEND == "simulator":
+        # Calcul local et déterministe : ni cache ni disjoncteur
+        return SimulatedMobileMoneyConnector()
+    if settings.MOBILE_MONEY_BACKEND == "http":
+        inner = HttpMobileMoneyConnector(
+            base_url=settings.MOBILE_MONEY_BASE_URL,
+            api_key=settings.MOBILE_MONEY_API_KEY,
+            connect_timeout_seconds=settings.MOBILE_MONEY_CONNECT_TIMEOUT_SECONDS,
+            read_timeout_seconds=settings.MOBILE_MONEY_READ_TIMEOUT_SECONDS,
+            deadline_seconds=settings.MOBILE_MONEY_DEADLINE_SECONDS,
+            max_retries=settings.MOBILE_MONEY_MAX_RETRIES,
+            retry_backoff_seconds=settings.MOBILE_MONEY_RETRY_BACKOFF_SECONDS,
+            max_connections=settings.MOBILE_MONEY_MAX_CONNECTIONS,
+            max_concurrency=settings.MOBILE_MONEY_MAX_CONCURRENCY
+        )
+        return CachedMobileMoneyConnector(
+            inner,
+            ttl_seconds=settings.MOBILE_MONEY_CACHE_TTL_SECONDS,
+            stale_seconds=settings.MOBILE_MONEY_CACHE_STALE_SECONDS,
+            max_entries=settings.MOBILE_MONEY_CACHE_MAX_ENTRIES,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.MOBILE_MONEY_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout_seconds=settings.MOBILE_MONEY_BREAKER_RESET_SECONDS
+            )
+        )
+    raise ValueError(f"MOBILE_MONEY_BACKEND inconnu: {settings.MOBILE_MONEY_BACKEND}")
+
+
+# Connecteur partagé par le processus
+mobile_money_connector = create_mobile_money_connector()
@@ -0,0 +1,284 @@
+"""
+Passage en retard des crédits échus.
+
+Les crédits ACTIVE dont l'échéance est dépassée passent en OVERDUE par
+lots (index loans(status, due_date)). Chaque lot est une transaction
+courte : mise à jour des crédits, des compteurs par utilisateur, insertion
+en masse des événements d'audit `loan_overdue` et invalidation des scores.
+Une courte pause entre deux lots laisse passer les écritures en ligne.
+
+Le balayage tourne dans un thread du serveur, toutes les
+OVERDUE_SWEEP_INTERVAL_SECONDS, sous un bail (`scheduler_leases`) : avec
+plusieurs nœuds, un seul l'exécute. Il peut aussi être lancé à la main :
+    python -m scripts.sweep_overdue
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models import AuditEventType, AuditLog, Loan, LoanStatus, SchedulerLease
+from app.db.write_queue import WriteQueue, write_queue as default_write_queue
+from app.services.loan_stats_service import LoanStatsService
+from app.services.scoring_service import ScoringService
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueSweeper:
+    """Balayage périodique des crédits échus"""
+
+    LEASE_NAME = "overdue_sweeper"
+
+    def __init__(
+        self,
+        write_queue: WriteQueue,
+        chunk_size: int = 1000,
+        pause_seconds: float = 0.05,
+        interval_seconds: float = 300,
+        lease_seconds: float = 600,
+        owner: Optional[str] = None
+    ):
+        self.write_queue = write_queue
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+        # Métriques
+        self._runs = 0
+        self._loans_marked = 0
+        self._last_run_at = None
+        self._last_run_ms = 0.0
+        self._max_chunk_ms = 0.0
+
+    # ----- Bail -----
+
+    def acquire_lease(self) -> bool:
+        """Prend ou renouvelle le bail (libre, expiré ou déjà détenu)"""
+        def job(db: Session) -> bool:
+            now = datetime.now()
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            taken = db.execute(
+                update(SchedulerLease.__table__)
+                .where(
+                    SchedulerLease.__table__.c.name == self.LEASE_NAME,
+                    or_(
+                        SchedulerLease.__table__.c.owner == self.owner,
+                        SchedulerLease.__table__.c.expires_at < now
+                    )
+                )
+                .values(owner=self.owner, expires_at=expires_at)
+            ).rowcount
+            if taken:
+                return True
+            if db.get(SchedulerLease, self.LEASE_NAME) is not None:
+                return False
+            db.execute(insert(SchedulerLease.__table__).values(
+                name=self.LEASE_NAME, owner=self.owner, expires_at=expires_at
+            ))
+            return True
+
+        try:
+            return self.write_queue.execute(job)
+        except Exception:
+            # Insertion concurrente par un autre nœud
+            logger.debug("Bail %s non obtenu", self.LEASE_NAME, exc_info=True)
+            return False
+
+    def release_lease(self):
+        """Libère le bail s'il est détenu par ce nœud"""
+        def job(db: Session):
+            db.execute(
+                update(SchedulerLease.__table__)
+                .where(
+                    SchedulerLease.__table__.c.name == self.LEASE_NAME,
+                    SchedulerLease.__table__.c.owner == self.owner
+                )
+                .values(expires_at=datetime.now())
+            )
+
+        self.write_queue.execute(job)
+
+    # ----- Balayage -----
+
+    def count_due(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Nombre de crédits actifs échus (sans les modifier)"""
+        return db.execute(
+            select(func.count(Loan.id)).where(
+                Loan.status == LoanStatus.ACTIVE,
+                Loan.due_date < (now or datetime.now())
+            )
+        ).scalar()
+
+    def sweep(self, now: Optional[datetime] = None, renew_lease: bool = False) -> Dict[str, Any]:
+        """
+        Passe en OVERDUE tous les crédits actifs échus avant `now`.
+
+        Args:
+            now: Date de référence (maintenant par défaut)
+            renew_lease: Renouveler le bail avant chaque lot ; le balayage
+                s'arrête si le bail a été perdu
+
+        Returns:
+            Dict avec le nombre de crédits passés en retard et de lots
+        """
+        now = now or datetime.now()
+        started = time.perf_counter()
+        marked = 0
+        chunks = 0
+        max_chunk_ms = 0.0
+        while not self._stopping.is_set():
+            if renew_lease and not self.acquire_lease():
+                logger.warning("Bail %s perdu, balayage interrompu", self.LEASE_NAME)
+                break
+            chunk_started = time.perf_counter()
+            selected, transitioned, user_ids = self.write_queue.execute(lambda db: self._sweep_chunk(db, now))
+            # Lot commité : une lecture concurrente a pu remettre l'ancien score en cache avant
+            ScoringService.invalidate_memory(user_ids)
+            max_chunk_ms = max(max_chunk_ms, (time.perf_counter() - chunk_started) * 1000)
+            marked += transitioned
+            chunks += 1
+            if selected < self.chunk_size:
+                break
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._runs += 1
+        self._loans_marked += marked
+        self._last_run_at = datetime.now()
+        self._last_run_ms = elapsed_ms
+        self._max_chunk_ms = max(self._max_chunk_ms, max_chunk_ms)
+        if marked:
+            logger.info("%s crédits passés en retard en %s lots (%.0f ms)", marked, chunks, elapsed_ms)
+        return {
+            "loans_marked_overdue": marked,
+            "chunks": chunks,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "max_chunk_ms": round(max_chunk_ms, 1)
+        }
+
+    def _sweep_chunk(self, db: Session, now: datetime) -> tuple:
+        """
+        Un lot, dans la transaction de la file d'écriture (sans commit).
+
+        Returns:
+            (crédits sélectionnés, crédits effectivement passés en retard,
+            utilisateurs dont le score est invalidé)
+        """
+        rows = db.execute(
+            select(Loan.id, Loan.user_id, Loan.due_date, Loan.amount_remaining)
+            .where(Loan.status == LoanStatus.ACTIVE, Loan.due_date < now)
+            .order_by(Loan.due_date)
+            .limit(self.chunk_size)
+        ).all()
+        selected = len(rows)
+        if not rows:
+            return 0, 0, []
+
+        # Le statut est revérifié : un remboursement a pu passer entre-temps
+        loans = Loan.__table__
+        stmt = (
+            update(loans)
+            .where(loans.c.id.in_([row.id for row in rows]), loans.c.status == LoanStatus.ACTIVE)
+            .values(status=LoanStatus.OVERDUE)
+        )
+        if db.get_bind().dialect.update_returning:
+            transitioned = set(db.execute(stmt.returning(loans.c.id)).scalars())
+            rows = [row for row in rows if row.id in transitioned]
+        else:
+            # Sans RETURNING, les lignes sélectionnées sont supposées toutes modifiées
+            db.execute(stmt)
+
+        per_user = Counter(row.user_id for row in rows)
+        LoanStatsService(db).record_bulk_transition(per_user, LoanStatus.ACTIVE, LoanStatus.OVERDUE)
+        if rows:
+            db.execute(insert(AuditLog), self._audit_rows(rows, now))
+        ScoringService(db).invalidate_many(list(per_user))
+        return selected, len(rows), list(per_user)
+
+    @staticmethod
+    def _audit_rows(rows: List, now: datetime) -> List[Dict[str, Any]]:
+        created_at = datetime.now()
+        return [
+            {
+                "user_id": row.user_id,
+                "loan_id": row.id,
+                "event_type": AuditEventType.LOAN_OVERDUE,
+                "event_data": json.dumps({
+                    "loan_id": row.id,
+                    "due_date": row.due_date.isoformat(),
+                    "amount_remaining": row.amount_remaining,
+                    "days_overdue": (now - row.due_date.replace(tzinfo=None)).days
+                }),
+                "channel": "SYSTEM",
+                "created_at": created_at,
+            }
+            for row in rows
+        ]
+
+    # ----- Exécution périodique -----
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Un balayage sous bail ; None si un autre nœud détient le bail"""
+        if not self.acquire_lease():
+            return None
+        return self.sweep(renew_lease=True)
+
+    def start(self):
+        """Démarre le thread de balayage périodique"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="overdue-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread (le lot en cours se termine) et libère le bail"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+            self._thread = None
+            try:
+                self.release_lease()
+            except Exception:
+                logger.exception("Échec de la libération du bail %s", self.LEASE_NAME)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Échec du balayage des crédits échus, nouvel essai au prochain cycle")
+            self._stopping.wait(timeout=self.interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "loans_marked_overdue": self._loans_marked,
+            "last_run_at": self._last_run_at.isoformat() if self._last_run_at else None,
+            "last_run_ms": round(self._last_run_ms, 1),
+            "max_chunk_ms": round(self._max_chunk_ms, 1)
+        }
+
+
+# Balayage partagé par le processus
+overdue_sweeper = OverdueSweeper(
+    write_queue=default_write_queue,
+    chunk_size=settings.OVERDUE_SWEEP_CHUNK_SIZE,
+    pause_seconds=settings.OVERDUE_SWEEP_PAUSE_SECONDS,
+    interval_seconds=settings.OVERDUE_SWEEP_INTERVAL_SECONDS,
+    lease_seconds=settings.OVERDUE_SWEEP_LEASE_SECONDS
+)
@@ -0,0 +1,71 @@
+"""
+Cache des scores de crédit.
+
+Deux niveaux :
+- le score persisté (ScoringData), valable SCORE_CACHE_TTL_SECONDS tant
+  qu'il n'est pas marqué `is_stale` et que SCORE_VERSION n'a pas changé ;
+- un cache mémoire local au processus, de courte durée, qui évite même la
+  lecture de ScoringData pour les affichages (offre USSD/APP).
+"""
+import threading
+from typing import Dict, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class ScoreCache:
+    """Cache mémoire des réponses de score et compteurs hit/miss"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persisted_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, score_version: str) -> Optional[Dict]:
+        result = self._cache.get((user_id, score_version))
+        if result is not None:
+            self._count("memory_hits")
+            return dict(result)
+        return None
+
+    def set(self, user_id: int, score_version: str, result: Dict):
+        self._cache.set((user_id, score_version), dict(result))
+
+    def invalidate(self, user_id: int, score_version: str):
+        self._cache.delete((user_id, score_version))
+        self._count("invalidations")
+
+    def clear(self):
+        """Vide le cache mémoire (re-scoring complet du portefeuille)"""
+        self._cache.clear()
+
+    def record_persisted_hit(self):
+        self._count("persisted_hits")
+
+    def record_miss(self):
+        self._count("misses")
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.persisted_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "persisted_hits": self.persisted_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.memory_hits + self.persisted_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._cache)
+        }
+
+
+# Cache partagé par le processus
+score_cache = ScoreCache(
+    max_entries=settings.SCORE_MEMORY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SCORE_MEMORY_CACHE_TTL_SECONDS
+)
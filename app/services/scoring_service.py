@@ -2,10 +2,14 @@
 Service de scoring déterministe et explicable
 Le scoring est basé sur des règles métier claires, sans ML en Phase 2.
 """
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from app.db.models import User, ScoringData, Loan, LoanStatus
-from app.services.external_data_simulator import ExternalDataSimulator
+from app.core.config import settings
+from app.db.models import User, ScoringData
+from app.db.unit_of_work import current_unit_of_work, unit_of_work
+from app.services.mobile_money_connector import MobileMoneyConnector, mobile_money_connector
+from app.services.loan_stats_service import LoanStatsService
+from app.services.score_cache import score_cache
 from datetime import datetime, timedelta
 
 
@@ -26,50 +30,119 @@ class ScoringService:
         0: 10000      # Score < 400: 10k FCFA (crédit d'amorçage)
     }
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        loan_stats_service: Optional[LoanStatsService] = None,
+        connector: Optional[MobileMoneyConnector] = None
+    ):
         self.db = db
-        self.external_simulator = ExternalDataSimulator()
+        self.mobile_money_connector = connector or mobile_money_connector
+        self.loan_stats_service = loan_stats_service or LoanStatsService(db)
     
-    def calculate_score(self, user: User, force_recalculate: bool = False) -> Dict:
+    def calculate_score(
+        self,
+        user: User,
+        force_recalculate: bool = False,
+        use_memory_cache: bool = True
+    ) -> Dict:
         """
         Calcule le score de crédit pour un utilisateur.
         
+        Le score persisté est réutilisé tant qu'il est frais (voir
+        `_is_fresh`) ; il est recalculé sinon.
+        
         Args:
             user: Utilisateur
             force_recalculate: Forcer le recalcul même si un score existe
+            use_memory_cache: Autoriser le cache mémoire local (affichage) ;
+                les décisions de crédit lisent le score persisté
             
         Returns:
             Dict avec score, explication, et données utilisées
         """
+        if use_memory_cache and not force_recalculate:
+            cached = score_cache.get(user.id, self.SCORE_VERSION)
+            if cached is not None:
+                return cached
+        
         # Vérifier si un score existe déjà
         scoring_data = self.db.query(ScoringData).filter(
             ScoringData.user_id == user.id
         ).first()
         
-        if scoring_data and not force_recalculate:
+        if scoring_data and not force_recalculate and self._is_fresh(scoring_data):
             # Retourner le score existant
-            return self._format_score_response(scoring_data)
+            score_cache.record_persisted_hit()
+            result = self._format_score_response(scoring_data)
+            score_cache.set(user.id, self.SCORE_VERSION, result)
+            return result
+        
+        score_cache.record_miss()
         
         # Collecter les données internes
         internal_data = self._collect_internal_data(user)
         
-        # Collecter les données externes (simulées)
-        external_data = self.external_simulator.get_mobile_money_data(user.msisdn)
+        # Collecter les données externes (fournisseur Mobile Money ou simulateur)
+        external_data = self.mobile_money_connector.get_mobile_money_data(user.msisdn)
         
         # Calculer le score
         score_result = self._compute_score(internal_data, external_data)
         
-        # Sauvegarder ou mettre à jour
-        if scoring_data:
-            self._update_scoring_data(scoring_data, internal_data, external_data, score_result)
-        else:
-            scoring_data = self._create_scoring_data(user.id, internal_data, external_data, score_result)
-            self.db.add(scoring_data)
+        # Sauvegarder ou mettre à jour (dans l'opération en cours s'il y en a une)
+        with unit_of_work(self.db) as uow:
+            if scoring_data:
+                self._update_scoring_data(scoring_data, internal_data, external_data, score_result)
+            else:
+                scoring_data = self._create_scoring_data(user.id, internal_data, external_data, score_result)
+                self.db.add(scoring_data)
+            result = self._format_score_response(scoring_data)
+            uow.after_commit(lambda: score_cache.set(user.id, self.SCORE_VERSION, result))
+        
+        return result
+    
+    def invalidate(self, user_id: int):
+        """
+        Invalide le score d'un utilisateur (crédit créé, remboursé, en retard).
         
-        self.db.commit()
-        self.db.refresh(scoring_data)
+        Le marquage persisté fait partie de la transaction de l'appelant,
+        qui doit commiter (ou de son unité de travail).
+        """
+        self.invalidate_many([user_id])
+    
+    def invalidate_many(self, user_ids: List[int]):
+        """
+        Invalide les scores de plusieurs utilisateurs (un seul UPDATE).
         
-        return self._format_score_response(scoring_data)
+        Dans une unité de travail, le cache mémoire est revidé après le
+        commit ; sinon l'appelant rappelle `invalidate_memory` après le sien.
+        """
+        if not user_ids:
+            return
+        # Sessions sans autoflush : un score calculé plus tôt dans la même
+        # transaction (premier crédit) doit être en base pour être marqué
+        self.db.flush()
+        self.db.query(ScoringData).filter(
+            ScoringData.user_id.in_(user_ids)
+        ).update({ScoringData.is_stale: True}, synchronize_session="fetch")
+        self.invalidate_memory(user_ids)
+        uow = current_unit_of_work(self.db)
+        if uow is not None:
+            # Une lecture concurrente a pu remettre l'ancien score en cache avant le commit
+            uow.after_commit(lambda: self.invalidate_memory(user_ids))
+    
+    @classmethod
+    def invalidate_memory(cls, user_ids: List[int]):
+        """Retire les scores du cache mémoire local (scores persistés inchangés)"""
+        for user_id in user_ids:
+            score_cache.invalidate(user_id, cls.SCORE_VERSION)
+    
+    def _is_fresh(self, scoring_data: ScoringData) -> bool:
+        """Score persisté réutilisable : non invalidé, même version, dans le TTL"""
+        if scoring_data.is_stale or scoring_data.score_version != self.SCORE_VERSION:
+            return False
+        age = datetime.now() - scoring_data.calculated_at.replace(tzinfo=None)
+        return age <= timedelta(seconds=settings.SCORE_CACHE_TTL_SECONDS)
     
     def _collect_internal_data(self, user: User) -> Dict:
         """Collecte les données internes de l'utilisateur"""
@@ -81,27 +154,18 @@ class ScoringService:
         app_count = user.app_usage_count
         total_usage = ussd_count + app_count
         
-        # Historique de crédit
-        loans = self.db.query(Loan).filter(Loan.user_id == user.id).all()
-        total_loans = len(loans)
-        repaid_loans = len([l for l in loans if l.status == LoanStatus.REPAID])
-        overdue_loans = len([l for l in loans if l.status == LoanStatus.OVERDUE])
-        
-        # Vérifier s'il y a un crédit actif
-        active_loan = self.db.query(Loan).filter(
-            Loan.user_id == user.id,
-            Loan.status.in_([LoanStatus.ACTIVE, LoanStatus.PENDING])
-        ).first()
+        # Historique de crédit (compteurs maintenus par LoanStatsService)
+        stats = self.loan_stats_service.get_stats(user.id)
         
         return {
             "account_age_days": account_age_days,
             "ussd_usage_count": ussd_count,
             "app_usage_count": app_count,
             "total_usage": total_usage,
-            "total_loans_count": total_loans,
-            "repaid_loans_count": repaid_loans,
-            "overdue_loans_count": overdue_loans,
-            "has_active_loan": active_loan is not None
+            "total_loans_count": stats["total_loans_count"],
+            "repaid_loans_count": stats["repaid_loans_count"],
+            "overdue_loans_count": stats["overdue_loans_count"],
+            "has_active_loan": stats["active_loans_count"] > 0
         }
     
     def _compute_score(self, internal_data: Dict, external_data: Dict) -> Dict:
@@ -317,7 +381,9 @@ class ScoringService:
             mm_monthly_transactions_avg=external_data.get("mm_monthly_transactions_avg"),
             mm_activity_regularity=external_data.get("mm_activity_regularity"),
             score=score_result["score"],
-            score_version=self.SCORE_VERSION
+            score_version=self.SCORE_VERSION,
+            calculated_at=datetime.now(),
+            is_stale=False
         )
     
     def _update_scoring_data(self, scoring_data: ScoringData, internal_data: Dict, external_data: Dict, score_result: Dict):
@@ -333,4 +399,6 @@ class ScoringService:
         scoring_data.mm_monthly_transactions_avg = external_data.get("mm_monthly_transactions_avg")
         scoring_data.mm_activity_regularity = external_data.get("mm_activity_regularity")
         scoring_data.score = score_result["score"]
+        scoring_data.score_version = self.SCORE_VERSION
         scoring_data.calculated_at = datetime.now()
+        scoring_data.is_stale = False
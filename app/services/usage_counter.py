@@ -0,0 +1,177 @@
+"""
+Compteurs d'utilisation agrégés en mémoire.
+
+Chaque saut USSD et chaque connexion APP incrémentait `ussd_usage_count`
+ou `app_usage_count` par lecture-modification-écriture suivie d'un commit.
+Les incréments sont désormais cumulés par MSISDN puis écrits par lots,
+toutes les USAGE_COUNTER_FLUSH_INTERVAL_SECONDS au plus (retard maximal des
+compteurs lus par le scoring), en UPDATE atomiques
+`SET x = x + :n` : pas de lecture préalable ni de mise à jour perdue.
+La file est vidée à l'arrêt du serveur.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+from sqlalchemy import bindparam, update
+from app.core.config import settings
+from app.db.models import User
+from app.db.write_queue import WriteQueue, write_queue as default_write_queue
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_COLUMNS = {"USSD": "ussd", "APP": "app"}
+
+
+class UsageCounter:
+    """Incréments d'utilisation en attente, par MSISDN"""
+
+    def __init__(
+        self,
+        write_queue: WriteQueue,
+        flush_interval_seconds: float,
+        max_pending_users: int
+    ):
+        self.write_queue = write_queue
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending_users = max_pending_users
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        # Métriques
+        self._hits_recorded = 0
+        self._rows_written = 0
+        self._flush_count = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    def record(self, msisdn: str, channel: str, at: datetime = None):
+        """Compte une utilisation (USSD ou APP) ; sans effet pour un autre canal"""
+        column = CHANNEL_COLUMNS.get(channel.upper())
+        if column is None:
+            return
+        at = at or datetime.now()
+        with self._lock:
+            entry = self._pending.get(msisdn)
+            if entry is None:
+                entry = self._pending[msisdn] = {"ussd": 0, "app": 0, "last_login": at}
+            entry[column] += 1
+            if at > entry["last_login"]:
+                entry["last_login"] = at
+            self._hits_recorded += 1
+            pending = len(self._pending)
+
+        if pending >= self.max_pending_users:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Écrit les incréments en attente (une transaction, un UPDATE par utilisateur).
+
+        Returns:
+            Nombre d'utilisateurs mis à jour
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            rows = [
+                {"key_msisdn": msisdn, "n_ussd": entry["ussd"], "n_app": entry["app"], "at": entry["last_login"]}
+                for msisdn, entry in pending.items()
+            ]
+            started = time.perf_counter()
+            try:
+                self.write_queue.execute(lambda db: self._write(db, rows))
+            except Exception:
+                self._restore(pending)
+                self._flush_errors += 1
+                raise
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._rows_written += len(rows)
+            self._flush_count += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            return len(rows)
+
+    @staticmethod
+    def _write(db, rows: List[Dict[str, Any]]):
+        users = User.__table__
+        db.connection().execute(
+            update(users)
+            .where(users.c.msisdn == bindparam("key_msisdn"))
+            .values(
+                ussd_usage_count=users.c.ussd_usage_count + bindparam("n_ussd"),
+                app_usage_count=users.c.app_usage_count + bindparam("n_app"),
+                last_login=bindparam("at", type_=users.c.last_login.type)
+            ),
+            rows
+        )
+
+    def _restore(self, pending: Dict[str, Dict[str, Any]]):
+        """Remet en attente des incréments non écrits (fusionnés avec les nouveaux)"""
+        with self._lock:
+            for msisdn, entry in pending.items():
+                current = self._pending.get(msisdn)
+                if current is None:
+                    self._pending[msisdn] = entry
+                    continue
+                current["ussd"] += entry["ussd"]
+                current["app"] += entry["app"]
+                current["last_login"] = max(current["last_login"], entry["last_login"])
+
+    def start(self):
+        """Démarre le thread de flush périodique"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread et écrit les incréments restants (arrêt du serveur)"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(timeout=self.flush_interval_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Échec de l'écriture des compteurs d'utilisation, nouvel essai au prochain cycle")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_users": pending,
+            "hits_recorded": self._hits_recorded,
+            "rows_written": self._rows_written,
+            "flush_count": self._flush_count,
+            "flush_errors": self._flush_errors,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "max_flush_ms": round(self._max_flush_ms, 3)
+        }
+
+
+# Compteurs partagés par le processus
+usage_counter = UsageCounter(
+    write_queue=default_write_queue,
+    flush_interval_seconds=settings.USAGE_COUNTER_FLUSH_INTERVAL_SECONDS,
+    max_pending_users=settings.USAGE_COUNTER_MAX_PENDING_USERS
+)
@@ -3,10 +3,12 @@ Service USSD pour gérer la navigation multi-niveaux et intégrer avec les servi
 """
 from sqlalchemy.orm import Session
 from typing import Dict, Optional, Tuple
+from app.core.metrics import ussd_requests
 from app.services.auth_service import AuthService
 from app.services.consent_service import ConsentService
 from app.services.loan_service import LoanService
 from app.services.scoring_service import ScoringService
+from app.services.ussd_session_store import USSDSessionStore, session_store as default_session_store
 from app.db.models import User, ConsentType, Loan, LoanStatus
 
 
@@ -15,37 +17,82 @@ class USSDService:
     
     SYSTEM_NAME = "Lisalisi cash"
     
-    def __init__(self, db: Session):
+    DURATION_MAP = {"1": 7, "2": 14, "3": 30, "4": 60, "5": 90}
+    
+    # Crédits affichés dans un menu (requêtes bornées par LIMIT)
+    MAX_MENU_LOANS = 5
+    
+    # Options du menu principal ; les saisies libres (montants, PIN) ne
+    # deviennent jamais des étiquettes de métriques
+    MAIN_MENU_OPTIONS = ("1", "2", "3", "4", "5", "6", "7")
+    
+    # Données de parcours conservées en session entre deux sauts
+    FLOW_KEYS = (
+        "max_loan_amount", "loan_amount", "loan_duration",
+        "active_loans", "repay_loan_id", "repay_amount"
+    )
+    
+    def __init__(
+        self,
+        db: Session,
+        session_store: Optional[USSDSessionStore] = None,
+        auth_service: Optional[AuthService] = None,
+        consent_service: Optional[ConsentService] = None,
+        loan_service: Optional[LoanService] = None
+    ):
         self.db = db
-        self.auth_service = AuthService(db)
-        self.consent_service = ConsentService(db)
-        self.loan_service = LoanService(db)
-        self.scoring_service = ScoringService(db)
-    
-    def process_ussd_request(self, phone_number: str, text: str) -> Tuple[str, bool]:
+        self.loan_service = loan_service or LoanService(db)
+        self.auth_service = auth_service or AuthService(db, audit_service=self.loan_service.audit_service)
+        self.consent_service = consent_service or self.loan_service.consent_service
+        self.scoring_service = self.loan_service.scoring_service
+        self.session_store = session_store or default_session_store
+        self._session: Dict = {}
+        self._user: Optional[User] = None
+    
+    def process_ussd_request(self, phone_number: str, text: str, session_id: Optional[str] = None) -> Tuple[str, bool]:
         """
         Traite une requête USSD et retourne la réponse.
         
         Args:
             phone_number: Numéro de téléphone
             text: Texte de navigation USSD (ex: "1", "1*2", "1*2*3")
+            session_id: Identifiant de session de la passerelle (sessionId)
             
         Returns:
             Tuple (response, is_end)
             - response: Texte à afficher
             - is_end: True si la session se termine (END), False si continue (CON)
         """
+        self._session = self.session_store.load(session_id, phone_number)
+        self._user = None
+        self._reset_flow_if_diverged(text.strip() if text else "")
+        
+        response, is_end = self._dispatch(phone_number, text)
+        
+        if is_end:
+            self.session_store.end(session_id)
+        else:
+            self.session_store.save(session_id, self._session)
+        
+        return response, is_end
+    
+    def _dispatch(self, phone_number: str, text: str) -> Tuple[str, bool]:
+        """Route la requête vers le handler du niveau courant"""
         # Nettoyer et parser le texte
         text = text.strip() if text else ""
         parts = text.split("*") if text else []
         
-        # Menu principal (première interaction)
-        if not text or text == "":
-            return self._get_main_menu(), False
-        
         # Navigation par niveau
         level = len(parts)
         first_choice = parts[0] if parts else ""
+        ussd_requests.inc(
+            str(min(level, 4)),
+            first_choice if first_choice in self.MAIN_MENU_OPTIONS else ("menu" if not level else "other")
+        )
+        
+        # Menu principal (première interaction)
+        if not text or text == "":
+            return self._get_main_menu(), False
         
         # Niveau 1 : Menu principal
         if level == 1:
@@ -114,12 +161,12 @@ class USSDService:
             if len(parts) >= 3:
                 return self._handle_set_pin_confirm(phone_number, parts[1], parts[2])
         elif main_choice == "5":  # Demander crédit
-            if len(parts) >= 3:
+            if len(parts) == 3:
                 return self._handle_loan_duration(phone_number, parts[1], parts[2], parts)
             elif len(parts) >= 4:
                 return self._handle_loan_pin(phone_number, parts[1], parts[2], parts[3], parts)
         elif main_choice == "6":  # Rembourser
-            if len(parts) >= 3:
+            if len(parts) == 3:
                 return self._handle_repay_amount(phone_number, parts[1], parts[2], parts)
             elif len(parts) >= 4:
                 return self._handle_repay_pin(phone_number, parts[1], parts[2], parts[3], parts)
@@ -132,7 +179,7 @@ class USSDService:
         """Créer un compte"""
         try:
             # Vérifier si le compte existe déjà
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if user:
                 return f"END Compte existe deja pour {phone_number}\nUtilisez option 2 pour definir PIN", True
             
@@ -142,6 +189,7 @@ class USSDService:
                 full_name=None,
                 channel="USSD"
             )
+            self._remember_user(user)
             
             return f"END Compte cree avec succes!\nNumero: {phone_number}\nDefinissez votre PIN (option 2)", True
         except ValueError as e:
@@ -153,7 +201,7 @@ class USSDService:
     
     def _handle_set_pin_menu(self, phone_number: str) -> Tuple[str, bool]:
         """Menu pour définir PIN"""
-        user = self.auth_service.get_user_by_msisdn(phone_number)
+        user = self._get_user(phone_number)
         if not user:
             return "END Compte introuvable. Creer un compte d'abord (option 1)", True
         
@@ -175,7 +223,7 @@ class USSDService:
             return "END Les PIN ne correspondent pas. Reessayez", True
         
         try:
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if not user:
                 return "END Compte introuvable", True
             
@@ -188,7 +236,7 @@ class USSDService:
     
     def _handle_consent_menu(self, phone_number: str) -> Tuple[str, bool]:
         """Menu des consentements"""
-        user = self.auth_service.get_user_by_msisdn(phone_number)
+        user = self._get_user(phone_number)
         if not user:
             return "END Compte introuvable. Creer un compte d'abord", True
         
@@ -210,7 +258,7 @@ class USSDService:
     
     def _handle_consent_choice(self, phone_number: str, choice: str) -> Tuple[str, bool]:
         """Gère le choix de consentement"""
-        user = self.auth_service.get_user_by_msisdn(phone_number)
+        user = self._get_user(phone_number)
         if not user:
             return "END Compte introuvable", True
         
@@ -227,7 +275,7 @@ class USSDService:
             consent = self.consent_service.accept_consent(
                 user=user,
                 consent_type=consent_type,
-                version="1.0",
+                version=self.consent_service.current_version(consent_type),
                 channel="USSD",
                 accepted=True
             )
@@ -240,7 +288,7 @@ class USSDService:
     def _handle_check_offer(self, phone_number: str) -> Tuple[str, bool]:
         """Consulter l'offre de crédit"""
         try:
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if not user:
                 return "END Compte introuvable. Creer un compte d'abord", True
             
@@ -259,7 +307,7 @@ class USSDService:
     
     def _handle_loan_request_menu(self, phone_number: str) -> Tuple[str, bool]:
         """Menu demande de crédit"""
-        user = self.auth_service.get_user_by_msisdn(phone_number)
+        user = self._get_user(phone_number)
         if not user:
             return "END Compte introuvable", True
         
@@ -275,6 +323,7 @@ class USSDService:
         
         # Récupérer l'offre
         score_result = self.scoring_service.calculate_score(user)
+        self._session["max_loan_amount"] = score_result["max_loan_amount"]
         
         menu = f"CON Demande de credit\n"
         menu += f"Montant max: {score_result['max_loan_amount']:,} FCFA\n"
@@ -287,11 +336,13 @@ class USSDService:
             amount = int(amount_str)
             if amount < 1000:
                 return "END Montant minimum: 1000 FCFA", True
-            if amount > 1000000:
-                return "END Montant maximum: 1000000 FCFA", True
+            # Plafond de l'offre affichée au saut précédent (le crédit le revérifie)
+            max_amount = self._session.get("max_loan_amount") or 1000000
+            if amount > max_amount:
+                return f"END Montant maximum: {max_amount:,} FCFA", True
+            
+            self._session["loan_amount"] = amount
             
-            # Stocker temporairement (dans une vraie app, utiliser session/cache)
-            # Pour l'instant, on continue avec le montant dans les parts
             menu = "CON Duree du credit:\n"
             menu += "1. 7 jours\n"
             menu += "2. 14 jours\n"
@@ -304,33 +355,26 @@ class USSDService:
     
     def _handle_loan_duration(self, phone_number: str, amount_str: str, duration_choice: str, parts: list) -> Tuple[str, bool]:
         """Choix de la durée"""
-        duration_map = {
-            "1": 7,
-            "2": 14,
-            "3": 30,
-            "4": 60,
-            "5": 90
-        }
-        
-        duration = duration_map.get(duration_choice)
+        duration = self.DURATION_MAP.get(duration_choice)
         if not duration:
             return self._error_response("Duree invalide"), True
         
+        self._session["loan_duration"] = duration
         return "CON Entrez votre PIN pour confirmer:", False
     
     def _handle_loan_pin(self, phone_number: str, amount_str: str, duration_choice: str, pin: str, parts: list) -> Tuple[str, bool]:
         """Confirmation PIN et demande de crédit"""
         try:
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if not user:
                 return "END Compte introuvable", True
             
             if not self.auth_service.verify_pin(user, pin):
                 return "END PIN incorrect", True
             
-            duration_map = {"1": 7, "2": 14, "3": 30, "4": 60, "5": 90}
-            amount = int(amount_str)
-            duration = duration_map.get(duration_choice, 30)
+            # Valeurs mémorisées aux sauts précédents (repli sur le chemin)
+            amount = self._session.get("loan_amount") or int(amount_str)
+            duration = self._session.get("loan_duration") or self.DURATION_MAP.get(duration_choice, 30)
             
             # Demander le crédit
             loan = self.loan_service.request_loan(
@@ -340,7 +384,7 @@ class USSDService:
                 channel="USSD"
             )
             
-            if loan.status.value == "APPROVED":
+            if loan.status in (LoanStatus.APPROVED, LoanStatus.ACTIVE):
                 response = f"END Credit approuve!\n"
                 response += f"Montant: {loan.amount_approved:,} FCFA\n"
                 response += f"Echeance: {loan.due_date.strftime('%d/%m/%Y') if loan.due_date else 'N/A'}\n"
@@ -359,19 +403,18 @@ class USSDService:
     
     def _handle_repay_menu(self, phone_number: str) -> Tuple[str, bool]:
         """Menu remboursement"""
-        user = self.auth_service.get_user_by_msisdn(phone_number)
+        user = self._get_user(phone_number)
         if not user:
             return "END Compte introuvable", True
         
-        loans = self.loan_service.get_user_loans(user)
-        active_loans = [l for l in loans if l.status.value in ["ACTIVE", "OVERDUE"]]
+        active_loans = self._get_active_loans(user)
         
         if not active_loans:
             return "END Aucun credit actif a rembourser", True
         
         menu = "CON Credits actifs:\n"
-        for i, loan in enumerate(active_loans[:5], 1):  # Max 5 crédits
-            menu += f"{i}. Credit #{loan.id}: {loan.amount_remaining:,} FCFA\n"
+        for i, loan in enumerate(active_loans, 1):
+            menu += f"{i}. Credit #{loan['id']}: {loan['amount_remaining']:,} FCFA\n"
         menu += "0. Retour"
         return menu, False
     
@@ -382,16 +425,18 @@ class USSDService:
         
         try:
             loan_index = int(choice) - 1
-            user = self.auth_service.get_user_by_msisdn(phone_number)
-            loans = self.loan_service.get_user_loans(user)
-            active_loans = [l for l in loans if l.status.value in ["ACTIVE", "OVERDUE"]]
+            user = self._get_user(phone_number)
+            if not user:
+                return "END Compte introuvable", True
+            active_loans = self._get_active_loans(user)
             
             if loan_index < 0 or loan_index >= len(active_loans):
                 return self._error_response("Credit invalide"), True
             
             loan = active_loans[loan_index]
-            menu = f"CON Rembourser Credit #{loan.id}\n"
-            menu += f"Montant restant: {loan.amount_remaining:,} FCFA\n"
+            self._session["repay_loan_id"] = loan["id"]
+            menu = f"CON Rembourser Credit #{loan['id']}\n"
+            menu += f"Montant restant: {loan['amount_remaining']:,} FCFA\n"
             menu += "Entrez le montant a rembourser:"
             return menu, False
         except ValueError:
@@ -404,6 +449,7 @@ class USSDService:
             if amount < 100:
                 return "END Montant minimum: 100 FCFA", True
             
+            self._session["repay_amount"] = amount
             return "CON Entrez votre PIN pour confirmer:", False
         except ValueError:
             return "END Montant invalide", True
@@ -411,26 +457,27 @@ class USSDService:
     def _handle_repay_pin(self, phone_number: str, loan_index_str: str, amount_str: str, pin: str, parts: list) -> Tuple[str, bool]:
         """Confirmation PIN et remboursement"""
         try:
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if not user:
                 return "END Compte introuvable", True
             
             if not self.auth_service.verify_pin(user, pin):
                 return "END PIN incorrect", True
             
-            loan_index = int(loan_index_str) - 1
-            loans = self.loan_service.get_user_loans(user)
-            active_loans = [l for l in loans if l.status.value in ["ACTIVE", "OVERDUE"]]
-            
-            if loan_index < 0 or loan_index >= len(active_loans):
-                return "END Credit invalide", True
-            
-            loan = active_loans[loan_index]
-            amount = int(amount_str)
+            loan_id = self._session.get("repay_loan_id")
+            if loan_id is None:
+                loan_index = int(loan_index_str) - 1
+                active_loans = self._get_active_loans(user)
+                
+                if loan_index < 0 or loan_index >= len(active_loans):
+                    return "END Credit invalide", True
+                
+                loan_id = active_loans[loan_index]["id"]
+            amount = self._session.get("repay_amount") or int(amount_str)
             
             result = self.loan_service.repay_loan(
                 user=user,
-                loan_id=loan.id,
+                loan_id=loan_id,
                 amount=amount,
                 channel="USSD"
             )
@@ -454,23 +501,24 @@ class USSDService:
     def _handle_history(self, phone_number: str) -> Tuple[str, bool]:
         """Consulter l'historique"""
         try:
-            user = self.auth_service.get_user_by_msisdn(phone_number)
+            user = self._get_user(phone_number)
             if not user:
                 return "END Compte introuvable", True
             
-            loans = self.loan_service.get_user_loans(user)
+            loans, next_cursor = self.loan_service.get_loan_history(user, limit=self.MAX_MENU_LOANS)
             
             if not loans:
                 return "END Aucun credit dans l'historique", True
             
             response = "END Historique credits:\n"
-            for loan in loans[:5]:  # Max 5 crédits
+            for loan in loans:
                 status_emoji = "✅" if loan.status.value == "REPAID" else "⏳" if loan.status.value == "ACTIVE" else "❌"
                 response += f"{status_emoji} #{loan.id}: {loan.amount_requested:,} FCFA\n"
                 response += f"   Statut: {loan.status.value}\n"
             
-            if len(loans) > 5:
-                response += f"\n... et {len(loans) - 5} autres"
+            if next_cursor:
+                total = self.loan_service.loan_stats_service.get_stats(user.id)["total_loans_count"]
+                response += f"\n... et {total - len(loans)} autres"
             
             return response, True
         except Exception as e:
@@ -478,6 +526,57 @@ class USSDService:
     
     # ========== HELPERS ==========
     
+    def _get_user(self, phone_number: str) -> Optional[User]:
+        """
+        Résout l'utilisateur une seule fois par saut.
+        
+        Si la session connaît déjà son ID, une lecture par clé primaire suffit.
+        """
+        if self._user is not None:
+            return self._user
+        
+        user_id = self._session.get("user_id")
+        if user_id is not None:
+            user = self.db.get(User, user_id)
+        else:
+            user = self.auth_service.get_user_by_msisdn(phone_number)
+        
+        if user:
+            self._remember_user(user)
+        return user
+    
+    def _reset_flow_if_diverged(self, text: str):
+        """
+        Oublie les choix mémorisés si le chemin ne prolonge pas le précédent.
+        
+        Les valeurs en session (montant, durée, crédit choisi) ne sont valides
+        que pour le chemin qui les a produites.
+        """
+        previous_path = self._session.get("path")
+        if previous_path is not None and not (
+            text == previous_path or text.startswith(previous_path + "*")
+        ):
+            for key in self.FLOW_KEYS:
+                self._session.pop(key, None)
+        self._session["path"] = text
+    
+    def _remember_user(self, user: User):
+        """Mémorise l'utilisateur pour le saut courant et les suivants"""
+        self._user = user
+        self._session["user_id"] = user.id
+    
+    def _get_active_loans(self, user: User) -> list:
+        """Crédits actifs (ACTIVE/OVERDUE) du menu, mis en cache dans la session"""
+        active_loans = self._session.get("active_loans")
+        if active_loans is None:
+            loans = self.loan_service.get_active_loans(user, limit=self.MAX_MENU_LOANS)
+            active_loans = [
+                {"id": l.id, "amount_remaining": l.amount_remaining}
+                for l in loans
+            ]
+            self._session["active_loans"] = active_loans
+        return active_loans
+    
     def _error_response(self, message: str) -> str:
         """Format de réponse d'erreur"""
         return f"END {message}\nTapez * pour retourner au menu"
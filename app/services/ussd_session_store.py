@@ -0,0 +1,120 @@
+"""
+Stockage des sessions USSD côté serveur, indexé par sessionId.
+
+Chaque saut USSD renvoie le chemin complet (`1*2*...`) ; la session permet de
+conserver entre les sauts l'utilisateur résolu, le montant, la durée et la
+liste des crédits actifs, sans tout recalculer à chaque niveau.
+"""
+import json
+from typing import Dict, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class USSDSessionBackend:
+    """Interface d'un backend de sessions USSD"""
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def set(self, session_id: str, data: Dict, ttl_seconds: int):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+
+class InMemoryUSSDSessionBackend(USSDSessionBackend):
+    """Backend en mémoire du processus (LRU + TTL)"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        data = self._cache.get(session_id)
+        # Copie pour que les modifications ne soient visibles qu'après save()
+        return dict(data) if data is not None else None
+
+    def set(self, session_id: str, data: Dict, ttl_seconds: int):
+        self._cache.set(session_id, dict(data), ttl_seconds)
+
+    def delete(self, session_id: str):
+        self._cache.delete(session_id)
+
+
+class RedisUSSDSessionBackend(USSDSessionBackend):
+    """
+    Backend compatible Redis (Redis, KeyDB, Valkey...), partagé entre workers.
+
+    Nécessite le paquet `redis` (optionnel).
+    """
+
+    KEY_PREFIX = "ussd:session:"
+
+    def __init__(self, url: str, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "Le backend de session 'redis' nécessite le paquet redis (pip install redis)"
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raw = self.client.get(self.KEY_PREFIX + session_id)
+        return json.loads(raw) if raw else None
+
+    def set(self, session_id: str, data: Dict, ttl_seconds: int):
+        self.client.set(self.KEY_PREFIX + session_id, json.dumps(data), ex=ttl_seconds)
+
+    def delete(self, session_id: str):
+        self.client.delete(self.KEY_PREFIX + session_id)
+
+
+class USSDSessionStore:
+    """Façade du stockage de sessions utilisée par USSDService"""
+
+    def __init__(self, backend: USSDSessionBackend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, session_id: Optional[str], phone_number: str) -> Dict:
+        """
+        Charge la session, ou une session vide si absente/expirée.
+
+        Une session appartenant à un autre numéro est ignorée.
+        """
+        data = self.backend.get(session_id) if session_id else None
+        if not data or data.get("msisdn") != phone_number:
+            data = {"msisdn": phone_number}
+        return data
+
+    def save(self, session_id: Optional[str], data: Dict):
+        """Sauvegarde la session (renouvelle le TTL)"""
+        if session_id:
+            self.backend.set(session_id, data, self.ttl_seconds)
+
+    def end(self, session_id: Optional[str]):
+        """Termine la session (réponse END)"""
+        if session_id:
+            self.backend.delete(session_id)
+
+
+def create_session_store() -> USSDSessionStore:
+    """Construit le store selon la configuration"""
+    if settings.USSD_SESSION_BACKEND == "redis":
+        backend = RedisUSSDSessionBackend(settings.USSD_SESSION_REDIS_URL)
+    elif settings.USSD_SESSION_BACKEND == "memory":
+        backend = InMemoryUSSDSessionBackend(
+            max_entries=settings.USSD_SESSION_MAX_ENTRIES,
+            ttl_seconds=settings.USSD_SESSION_TTL_SECONDS
+        )
+    else:
+        raise ValueError(f"Backend de session USSD inconnu: {settings.USSD_SESSION_BACKEND}")
+    return USSDSessionStore(backend, settings.USSD_SESSION_TTL_SECONDS)
+
+
+# Store partagé par tout le processus
+session_store = create_session_store()
@@ -0,0 +1 @@
+# Benchmarks et tests de charge
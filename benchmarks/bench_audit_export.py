@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Mémoire et débit de l'export d'audit en flux selon le volume exporté.
+
+Peuple une base SQLite temporaire avec le plus grand volume demandé, puis
+exporte des périodes de tailles croissantes (NDJSON, CSV, NDJSON gzip).
+Le pic d'allocation (tracemalloc) doit rester constant quand le nombre de
+lignes augmente.
+
+Utilisation:
+    python -m benchmarks.bench_audit_export --rows 10000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.db import Base, configure_sqlite, sqlite_pragmas
+from app.db.models import AuditEventType, AuditLog
+from app.services.audit_export import AuditExportService
+from scripts.generate_data import _insert_chunks
+
+EVENT_TYPES = [AuditEventType.LOAN_REQUEST, AuditEventType.LOAN_DECISION, AuditEventType.REPAY, AuditEventType.CONSENT]
+START = datetime(2026, 1, 1)
+
+
+def seed(engine, rows: int):
+    _insert_chunks(engine, AuditLog.__table__, (
+        {
+            "user_id": n % 50000 + 1,
+            "event_type": EVENT_TYPES[n % len(EVENT_TYPES)],
+            "event_data": json.dumps({"loan_id": n, "amount": 5000 + n % 1000}),
+            "channel": "USSD" if n % 3 else "APP",
+            "created_at": START + timedelta(seconds=n),
+        }
+        for n in range(rows)
+    ))
+
+
+def measure(service: AuditExportService, rows: int, fmt: str, compress: bool) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    for chunk in service.stream(fmt=fmt, compress=compress, start=START, end=START + timedelta(seconds=rows)):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": rows,
+        "format": fmt + (".gz" if compress else ""),
+        "bytes": size,
+        "rows_per_second": round(rows / elapsed),
+        "peak_alloc_kib": round(peak / 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000], help="Volumes exportés")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_export_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    seed(engine, max(args.rows))
+    print(f"Base peuplée: {max(args.rows):,} événements en {time.perf_counter() - started:.1f}s")
+
+    service = AuditExportService(session_factory=sessionmaker(bind=engine), batch_size=args.batch_size)
+    results = [
+        measure(service, rows, fmt, compress)
+        for rows in sorted(args.rows)
+        for fmt, compress in (("ndjson", False), ("csv", False), ("ndjson", True))
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
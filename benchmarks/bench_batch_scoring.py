@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Débit du scoring : calcul unitaire (ScoringService) contre calcul par lots
+(BatchScoringService), en utilisateurs par seconde.
+
+La base SQLite temporaire est peuplée par `scripts.generate_data.generate`.
+Le calcul unitaire est mesuré sur un sous-ensemble (--scalar-users) pour
+garder un temps d'exécution raisonnable.
+
+Utilisation:
+    python -m benchmarks.bench_batch_scoring --users 50000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.db.db import Base, configure_sqlite, sqlite_pragmas
+from app.db.models import User
+from app.services.batch_scoring_service import BatchScoringService
+from app.services.scoring_service import ScoringService
+from scripts.generate_data import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--loans-per-user", type=int, default=4)
+    parser.add_argument("--scalar-users", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_scoring_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+    generate(engine, args.users, loans_per_user=args.loans_per_user, audit=False, scoring=False)
+
+    results = {"users": args.users}
+    with Session(engine) as db:
+        scalar = ScoringService(db)
+        user_ids = db.execute(select(User.id).order_by(User.id).limit(args.scalar_users)).scalars().all()
+        started = time.perf_counter()
+        for user_id in user_ids:
+            scalar.calculate_score(db.get(User, user_id), force_recalculate=True)
+        elapsed = time.perf_counter() - started
+        results["scalar"] = {
+            "users_scored": len(user_ids),
+            "elapsed_seconds": round(elapsed, 3),
+            "users_per_second": round(len(user_ids) / elapsed, 1)
+        }
+
+    with Session(engine) as db:
+        batch = BatchScoringService(db, chunk_size=args.chunk_size)
+        results["batch_cold"] = batch.score_all()
+        results["batch_warm"] = batch.score_all()
+        parity = batch.check_parity(sample_size=1000)
+        results["parity"] = {"checked": parity["checked"], "mismatches": len(parity["mismatches"])}
+
+    results["speedup"] = round(results["batch_warm"]["users_per_second"] / results["scalar"]["users_per_second"], 1)
+    print(json.dumps(results, indent=2))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de latence p50/p95/p99 de /ussd et /loans/request sous charge concurrente.
+
+La moitié des clients parcourt les menus USSD, l'autre moitié enchaîne
+demande de crédit + remboursement (vérification PIN bcrypt incluse).
+Un endpoint qui bloque la boucle d'événements fait exploser la latence
+des autres : comparer les résultats avant/après en lançant le script
+sur chaque révision.
+
+Utilisation:
+    python -m benchmarks.bench_latency                 # serveur local temporaire
+    python -m benchmarks.bench_latency --url http://127.0.0.1:8000
+"""
+import argparse
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+
+from benchmarks.common import local_server, summarize
+
+PIN = "1234"
+USSD_PATHS = ["", "4", "7", "5", "3", "6"]
+
+
+def seed_users(base_url: str, count: int, prefix: str) -> list:
+    """Crée des utilisateurs prêts à emprunter (PIN + consentements)"""
+    msisdns = []
+    with requests.Session() as http:
+        for i in range(count):
+            msisdn = f"{prefix}{i:06d}"
+            http.post(f"{base_url}/auth/register", json={"msisdn": msisdn})
+            http.post(f"{base_url}/auth/set-pin", json={"msisdn": msisdn, "pin": PIN})
+            for consent_type in ("TERMS_AND_CONDITIONS", "SCORING_DATA_ACCESS"):
+                http.post(f"{base_url}/consent/accept", json={
+                    "msisdn": msisdn,
+                    "consent_type": consent_type,
+                    "version": "1.0",
+                    "channel": "APP",
+                })
+            msisdns.append(msisdn)
+    return msisdns
+
+
+def ussd_client(base_url: str, msisdn: str, iterations: int, latencies: list):
+    with requests.Session() as http:
+        for i in range(iterations):
+            text = USSD_PATHS[i % len(USSD_PATHS)]
+            started = time.perf_counter()
+            http.post(f"{base_url}/ussd", json={
+                "sessionId": f"bench-{msisdn}-{i}",
+                "phoneNumber": msisdn,
+                "text": text,
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+
+
+def loan_client(base_url: str, msisdn: str, iterations: int, latencies: list):
+    with requests.Session() as http:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = http.post(f"{base_url}/loans/request", json={
+                "msisdn": msisdn, "pin": PIN, "amount": 1000, "duration_days": 7
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            body = response.json()
+            if response.status_code == 201 and body.get("amount_approved"):
+                http.post(f"{base_url}/loans/repay", json={
+                    "msisdn": msisdn, "pin": PIN,
+                    "loan_id": body["loan_id"], "amount": body["amount_approved"],
+                })
+
+
+def run(base_url: str, clients: int, iterations: int) -> dict:
+    ussd_clients = max(1, clients // 2)
+    loan_clients = max(1, clients - ussd_clients)
+    msisdns = seed_users(base_url, ussd_clients + loan_clients, prefix="+23769")
+
+    ussd_latencies, loan_latencies = [], []
+    threads = [
+        threading.Thread(target=ussd_client, args=(base_url, msisdns[i], iterations, ussd_latencies))
+        for i in range(ussd_clients)
+    ] + [
+        threading.Thread(target=loan_client, args=(base_url, msisdns[ussd_clients + i], iterations, loan_latencies))
+        for i in range(loan_clients)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "clients": clients,
+        "iterations": iterations,
+        "/ussd": summarize(ussd_latencies, elapsed),
+        "/loans/request": summarize(loan_latencies, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL d'un serveur existant (sinon serveur local temporaire)")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    server = nullcontext(args.url) if args.url else local_server()
+    with server as base_url:
+        result = run(base_url, args.clients, args.iterations)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Coût de l'instrumentation (/metrics) : objectif < 2 % de la latence.
+
+Mesures :
+- coût unitaire : middleware ASGI autour d'une application vide, écoutes
+  SQL par requête, observation d'histogramme et rendu de /metrics ;
+- bout en bout : deux serveurs uvicorn identiques, METRICS_ENABLED=true
+  et false, interrogés en alternance par un même client (sauts USSD sur
+  un utilisateur existant) pour que les dérives de la machine touchent
+  les deux côtés ; écart médian entre les deux côtés, tour par tour.
+
+Utilisation:
+    python -m benchmarks.bench_metrics --rounds 30 --hops 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_metrics_'), 'bench.db')}"
+)
+
+import requests
+from sqlalchemy import text
+
+from app.core.metrics import MetricsMiddleware, http_request_duration, instrument_engine, registry
+from app.db.db import create_app_engine
+from benchmarks.common import local_server
+
+MSISDN = "+237690000002"
+USSD_PATHS = ["", "4", "7", "3"]
+
+
+def measure_middleware(iterations: int) -> float:
+    """Surcoût du middleware par requête (µs)"""
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/ussd"}
+
+    async def run(app) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await app(dict(scope), receive, send)
+        return time.perf_counter() - started
+
+    bare = asyncio.run(run(endpoint))
+    instrumented = asyncio.run(run(MetricsMiddleware(endpoint)))
+    return (instrumented - bare) / iterations * 1e6
+
+
+def measure_query_listeners(iterations: int) -> float:
+    """Surcoût des écoutes SQL par requête (µs)"""
+    timings = []
+    for instrumented in (False, True):
+        engine = create_app_engine("sqlite://")
+        if instrumented:
+            instrument_engine(engine)
+        with engine.connect() as conn:
+            statement = text("SELECT 1")
+            started = time.perf_counter()
+            for _ in range(iterations):
+                conn.execute(statement)
+            timings.append(time.perf_counter() - started)
+        engine.dispose()
+    return (timings[1] - timings[0]) / iterations * 1e6
+
+
+def measure_observe(iterations: int) -> float:
+    """Observation d'histogramme à étiquettes (µs)"""
+    started = time.perf_counter()
+    for n in range(iterations):
+        http_request_duration.observe(0.012, "POST", "/bench", "200")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure_end_to_end(rounds: int, hops: int) -> dict:
+    latencies = {"enabled": [], "disabled": []}
+    ratios = []
+    with local_server({"METRICS_ENABLED": "true"}) as enabled_url, \
+            local_server({"METRICS_ENABLED": "false"}) as disabled_url:
+        urls = {"enabled": enabled_url, "disabled": disabled_url}
+        with requests.Session() as http:
+            for url in urls.values():
+                http.post(f"{url}/auth/register", json={"msisdn": MSISDN})
+            for n in range(rounds):
+                # Ordre alterné d'un tour à l'autre
+                order = ("enabled", "disabled") if n % 2 == 0 else ("disabled", "enabled")
+                medians = {}
+                for name in order:
+                    samples = []
+                    for i in range(hops):
+                        started = time.perf_counter()
+                        http.post(f"{urls[name]}/ussd", json={
+                            "sessionId": f"bench-{n}-{i}",
+                            "phoneNumber": MSISDN,
+                            "text": USSD_PATHS[i % len(USSD_PATHS)],
+                        })
+                        samples.append((time.perf_counter() - started) * 1000)
+                    latencies[name].extend(samples)
+                    medians[name] = statistics.median(samples)
+                ratios.append(medians["enabled"] / medians["disabled"])
+            scrape = http.get(f"{enabled_url}/metrics")
+            assert scrape.status_code == 200 and "ussd_requests_total" in scrape.text
+            assert http.get(f"{disabled_url}/metrics").status_code == 404
+
+    return {
+        "median_ms_enabled": round(statistics.median(latencies["enabled"]), 3),
+        "median_ms_disabled": round(statistics.median(latencies["disabled"]), 3),
+        # Médiane des écarts tour par tour : insensible aux dérives lentes
+        "overhead_pct": round((statistics.median(ratios) - 1) * 100, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000, help="Répétitions des mesures unitaires")
+    parser.add_argument("--rounds", type=int, default=30, help="Tours alternés de bout en bout")
+    parser.add_argument("--hops", type=int, default=200, help="Sauts USSD par tour et par serveur")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rendered = registry.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    results = {
+        "middleware_us_per_request": round(measure_middleware(args.iterations), 2),
+        "sql_listeners_us_per_query": round(measure_query_listeners(args.iterations), 2),
+        "histogram_observe_us": round(measure_observe(args.iterations), 3),
+        "render_ms": round(render_ms, 3),
+        "render_bytes": len(rendered),
+        "end_to_end": measure_end_to_end(args.rounds, args.hops),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
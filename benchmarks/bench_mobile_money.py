@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latence du chemin de scoring (recalcul forcé, comme après un crédit) quand
+le fournisseur Mobile Money est lent ou en panne.
+
+Le faux fournisseur (benchmarks.mobile_money_stub) tourne sous uvicorn ; les
+scénarios lui sont appliqués par POST /_faults. Chaque scénario est joué
+avec le client HTTP seul puis avec le cache stale-while-revalidate et le
+disjoncteur (réchauffé au préalable, TTL de fraîcheur nul : chaque lecture
+est servie depuis le cache et rafraîchie en arrière-plan).
+
+Utilisation:
+    python -m benchmarks.bench_mobile_money --users 200 --threads 8 --calls 50
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import requests
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.core.circuit_breaker import CircuitBreaker
+from app.db.db import Base, configure_sqlite, sqlite_pragmas
+from app.db.models import User
+from app.services.mobile_money_connector import (
+    CachedMobileMoneyConnector, HttpMobileMoneyConnector, MobileMoneyUnavailableError
+)
+from app.services.scoring_service import ScoringService
+from benchmarks.common import local_server, summarize
+from scripts.generate_data import generate
+
+SCENARIOS = [
+    ("healthy", {"latency_ms": 20, "jitter_ms": 10, "slow_rate": 0, "error_rate": 0}),
+    ("slow_tail", {"latency_ms": 20, "jitter_ms": 10, "slow_rate": 0.1, "slow_ms": 3000, "error_rate": 0}),
+    ("flaky", {"latency_ms": 20, "jitter_ms": 10, "slow_rate": 0, "error_rate": 0.3}),
+    ("outage", {"latency_ms": 20, "jitter_ms": 0, "slow_rate": 0, "error_rate": 1.0}),
+]
+
+
+def run_scenario(engine, connector, user_ids, threads: int, calls: int) -> dict:
+    latencies, errors = [], []
+
+    def worker(worker_id: int):
+        rng = random.Random(worker_id)
+        # Utilisateurs disjoints par thread : pas de création concurrente de ScoringData
+        own_ids = user_ids[worker_id::threads]
+        with Session(engine) as db:
+            service = ScoringService(db)
+            service.mobile_money_connector = connector
+            for _ in range(calls):
+                user = db.get(User, rng.choice(own_ids))
+                started = time.perf_counter()
+                try:
+                    service.calculate_score(user, force_recalculate=True)
+                except MobileMoneyUnavailableError:
+                    errors.append(1)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    result = summarize(latencies, time.perf_counter() - started)
+    result["errors"] = len(errors)
+    result["connector"] = connector.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=50, help="Appels par thread et par scénario")
+    parser.add_argument("--deadline", type=float, default=1.0, help="Échéance d'un appel fournisseur (s)")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_mm_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=args.threads)
+    configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+    generate(engine, args.users, loans_per_user=2, audit=False, scoring=False)
+    with Session(engine) as db:
+        user_ids = db.execute(select(User.id)).scalars().all()
+        msisdns = db.execute(select(User.msisdn)).scalars().all()
+
+    results = []
+    with local_server(app="benchmarks.mobile_money_stub:app") as stub_url:
+        def http_connector():
+            return HttpMobileMoneyConnector(
+                stub_url,
+                connect_timeout_seconds=0.5,
+                read_timeout_seconds=args.deadline / 2,
+                deadline_seconds=args.deadline,
+                max_retries=2,
+                retry_backoff_seconds=0.05
+            )
+
+        direct = http_connector()
+        cached = CachedMobileMoneyConnector(
+            http_connector(),
+            ttl_seconds=0,
+            stale_seconds=3600,
+            max_entries=100000,
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout_seconds=2.0)
+        )
+        requests.post(f"{stub_url}/_faults", json=dict(SCENARIOS[0][1]))
+        cached.get_many(msisdns)
+
+        for name, faults in SCENARIOS:
+            for mode, connector in (("direct", direct), ("cached", cached)):
+                requests.post(f"{stub_url}/_faults", json=faults)
+                result = run_scenario(engine, connector, user_ids, args.threads, args.calls)
+                result.update({"scenario": name, "mode": mode})
+                results.append(result)
+                print(
+                    f"{name:<10} {mode:<7} p50={result['p50_ms']:>8.1f} ms  p99={result['p99_ms']:>8.1f} ms"
+                    f"  max={result['max_ms']:>8.1f} ms  erreurs={result['errors']}"
+                )
+
+        direct.close()
+        cached.close()
+
+    print(json.dumps(results, indent=2))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
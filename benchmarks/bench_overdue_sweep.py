@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Balayage d'un arriéré de crédits échus pendant un trafic d'écriture en ligne.
+
+Peuple une base SQLite temporaire (--loans crédits ACTIVE échus), lance
+OverdueSweeper et, en parallèle, des écritures courtes (événement d'audit +
+compteur d'usage) passant par la même file d'écriture. Mesure le débit du
+balayage, la durée maximale d'un lot (durée de détention du verrou
+d'écriture) et la latence des écritures en ligne.
+
+Utilisation:
+    python -m benchmarks.bench_overdue_sweep --loans 300000 --chunk-size 1000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+from app.db.db import Base, configure_sqlite, sqlite_pragmas
+from app.db.models import AuditLog, Loan, LoanStatus, User
+from app.db.write_queue import WriteQueue
+from app.services.loan_stats_service import LoanStatsService
+from app.services.overdue_sweeper import OverdueSweeper
+from benchmarks.bench_sqlite_profile import write_job
+from benchmarks.common import summarize
+from scripts.generate_data import _insert_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=300000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Pause entre deux lots (s)")
+    parser.add_argument("--writers", type=int, default=4, help="Threads d'écriture en ligne")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_sweep_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.now()
+    users = args.loans // 3 + 1
+    _insert_chunks(engine, User.__table__, ({"id": i, "msisdn": f"+2376{i:08d}"} for i in range(1, users + 1)))
+    _insert_chunks(engine, Loan.__table__, (
+        {
+            "user_id": n % users + 1,
+            "amount_requested": 5000,
+            "amount_approved": 5250,
+            "amount_remaining": 5250,
+            "interest_rate": 5.0,
+            "duration_days": 30,
+            "status": LoanStatus.ACTIVE,
+            "requested_at": now - timedelta(days=60),
+            "due_date": now - timedelta(days=30, minutes=n % 1440),
+        }
+        for n in range(args.loans)
+    ))
+    with Session(engine) as db:
+        LoanStatsService(db).rebuild_all()
+
+    queue = WriteQueue(sessionmaker(bind=engine), max_batch=100)
+    sweeper = OverdueSweeper(queue, chunk_size=args.chunk_size, pause_seconds=args.pause, owner="bench")
+    latencies = []
+    done = threading.Event()
+
+    def writer(worker_id: int):
+        n = 0
+        while not done.is_set():
+            started = time.perf_counter()
+            queue.execute(write_job((worker_id * 7919 + n) % users + 1))
+            latencies.append((time.perf_counter() - started) * 1000)
+            n += 1
+            time.sleep(0.01)
+
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    for thread in writers:
+        thread.start()
+    result = sweeper.run_once()
+    done.set()
+    for thread in writers:
+        thread.join()
+
+    with Session(engine) as db:
+        overdue = db.execute(select(func.count(Loan.id)).where(Loan.status == LoanStatus.OVERDUE)).scalar()
+        events = db.execute(select(func.count(AuditLog.id)).where(AuditLog.loan_id.is_not(None))).scalar()
+        mismatches = len(LoanStatsService(db).verify())
+
+    result.update({
+        "loans": args.loans,
+        "loans_per_second": round(result["loans_marked_overdue"] / (result["elapsed_ms"] / 1000), 1),
+        "overdue_in_db": overdue,
+        "overdue_audit_events": events,
+        "counter_mismatches": mismatches,
+        "online_writes": summarize(latencies),
+    })
+    print(json.dumps(result, indent=2))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
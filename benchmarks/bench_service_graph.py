@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Coût de construction des services par saut USSD : graphe reconstruit par
+chaque service (ancienne construction) contre conteneur de requête.
+
+Mesures :
+- construction seule : temps, allocations (tracemalloc) et objets service
+  créés par saut ;
+- saut USSD complet (« 7. Historique credits » d'un utilisateur existant,
+  puis comptage d'usage comme le router) sur SQLite en mémoire : temps et
+  nombre de requêtes SQL, sur une base SQLite temporaire (les événements
+  d'audit passent par la file d'écriture du processus).
+
+Utilisation:
+    python -m benchmarks.bench_service_graph --iterations 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_graph_'), 'bench.db')}"
+)
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.db.db import Base, SessionLocal, engine
+from app.services.audit_service import AuditService
+from app.services.auth_service import AuthService
+from app.services.consent_service import ConsentService
+from app.services.container import ServiceContainer
+from app.services.external_data_simulator import ExternalDataSimulator
+from app.services.loan_service import LoanService
+from app.services.loan_stats_service import LoanStatsService
+from app.services.scoring_service import ScoringService
+from app.services.ussd_service import USSDService
+
+MSISDN = "+237690000001"
+HOP_TEXT = "7"
+
+
+def legacy_graph(db):
+    """Graphe construit comme avant le conteneur (chaque service crée ses dépendances)"""
+    scoring = ScoringService(db, loan_stats_service=LoanStatsService(db))
+    loan = LoanService(
+        db,
+        scoring_service=ScoringService(db, loan_stats_service=LoanStatsService(db)),
+        consent_service=ConsentService(db, audit_service=AuditService(db)),
+        audit_service=AuditService(db),
+        loan_stats_service=LoanStatsService(db),
+        external_simulator=ExternalDataSimulator()
+    )
+    ussd = USSDService(
+        db,
+        auth_service=AuthService(db, audit_service=AuditService(db)),
+        consent_service=ConsentService(db, audit_service=AuditService(db)),
+        loan_service=loan
+    )
+    ussd.scoring_service = scoring
+    # Le router reconstruisait un AuthService pour le comptage d'usage
+    return ussd, AuthService(db, audit_service=AuditService(db))
+
+
+def container_graph(db):
+    services = ServiceContainer(db)
+    return services.ussd, services.auth
+
+
+SERVICE_TYPES = (
+    AuditService, AuthService, ConsentService, ExternalDataSimulator,
+    LoanService, LoanStatsService, ScoringService, USSDService
+)
+
+
+def count_services(graph) -> int:
+    """Objets service distincts atteignables depuis le graphe"""
+    seen = set()
+    stack = list(graph)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or not isinstance(obj, SERVICE_TYPES):
+            continue
+        seen.add(id(obj))
+        stack.extend(vars(obj).values())
+    return len(seen)
+
+
+def measure_construction(build, iterations: int) -> dict:
+    with Session() as db:
+        services = count_services(build(db))
+        started = time.perf_counter()
+        for _ in range(iterations):
+            build(db)
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = [build(db) for _ in range(1000)]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        del kept
+    return {
+        "service_objects_per_hop": services,
+        "construction_us": round(elapsed / iterations * 1e6, 2),
+        "allocated_bytes_per_hop": round(sum(s.size_diff for s in stats) / 1000),
+        "allocated_blocks_per_hop": round(sum(s.count_diff for s in stats) / 1000, 1),
+    }
+
+
+def measure_hop(build, iterations: int) -> dict:
+    queries = []
+    listener = lambda *args: queries.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    for n in range(iterations):
+        with SessionLocal() as db:
+            ussd, auth = build(db)
+            ussd.process_ussd_request(MSISDN, HOP_TEXT, f"bench-{n}")
+            user = auth.get_user_by_msisdn(MSISDN)
+            if user:
+                auth.update_usage_count(user, "USSD")
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", listener)
+    return {
+        "hop_ms": round(elapsed / iterations * 1000, 3),
+        "queries_per_hop": round(len(queries) / iterations, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="Constructions mesurées")
+    parser.add_argument("--hops", type=int, default=500, help="Sauts USSD complets mesurés")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        AuthService(db).create_user(MSISDN, channel="USSD")
+
+    results = {}
+    for name, build in (("legacy", legacy_graph), ("container", container_graph)):
+        results[name] = measure_construction(build, args.iterations)
+        results[name].update(measure_hop(build, args.hops))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
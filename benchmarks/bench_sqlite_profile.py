@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare le profil SQLite par défaut, le profil optimisé (WAL, synchronous=NORMAL,
+busy_timeout, mmap, cache) et le profil optimisé + file d'écriture unique.
+
+Chaque thread enchaîne de petites transactions d'écriture (un événement
+d'audit + incrément d'un compteur utilisateur) entrecoupées de lectures,
+comme le trafic USSD.
+
+Utilisation:
+    python -m benchmarks.bench_sqlite_profile --threads 16 --ops 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.db.db import Base, configure_sqlite, sqlite_pragmas
+from app.db.models import AuditEventType, AuditLog, User
+from app.db.write_queue import WriteQueue
+from benchmarks.common import summarize
+
+USERS = 100
+
+
+def make_engine(tuned: bool, threads: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_sqlite_"), "bench.db")
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=threads,
+        max_overflow=0,
+    )
+    if tuned:
+        configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"msisdn": f"+2376{i:08d}"} for i in range(USERS)])
+    return engine
+
+
+def write_job(user_id: int):
+    def job(db):
+        db.execute(insert(AuditLog.__table__).values(
+            user_id=user_id,
+            event_type=AuditEventType.LOAN_REQUEST,
+            channel="USSD",
+            created_at=datetime.now(),
+        ))
+        db.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == user_id)
+            .values(ussd_usage_count=User.__table__.c.ussd_usage_count + 1)
+        )
+    return job
+
+
+def run_mode(name: str, tuned: bool, use_queue: bool, threads: int, ops: int) -> dict:
+    engine = make_engine(tuned, threads)
+    Session = sessionmaker(bind=engine)
+    queue = WriteQueue(Session, max_batch=100) if use_queue else None
+    latencies, errors = [], []
+
+    def worker(worker_id: int):
+        for i in range(ops):
+            user_id = (worker_id * ops + i) % USERS + 1
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.execute(select(User.id, User.ussd_usage_count).where(User.id == user_id)).first()
+                job = write_job(user_id)
+                if queue:
+                    queue.execute(job)
+                else:
+                    with Session() as db:
+                        job(db)
+                        db.commit()
+            except OperationalError as e:
+                errors.append(str(e.orig))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    engine.dispose()
+
+    result = summarize(latencies, elapsed)
+    result.update({
+        "mode": name,
+        "journal_mode": journal_mode,
+        "errors": len(errors),
+        "commits": queue.batches if queue else ops * threads - len(errors),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200, help="Opérations par thread")
+    args = parser.parse_args()
+
+    results = [
+        run_mode("default", tuned=False, use_queue=False, threads=args.threads, ops=args.ops),
+        run_mode("tuned", tuned=True, use_queue=False, threads=args.threads, ops=args.ops),
+        run_mode("tuned+write_queue", tuned=True, use_queue=True, threads=args.threads, ops=args.ops),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
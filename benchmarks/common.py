@@ -0,0 +1,97 @@
+"""
+Utilitaires communs aux benchmarks : serveur uvicorn local et percentiles
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par rang le plus proche (valeurs en ms)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ms: List[float], elapsed_s: Optional[float] = None) -> Dict:
+    """Résumé statistique d'une série de latences"""
+    summary = {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+    if elapsed_s:
+        summary["throughput_rps"] = round(len(latencies_ms) / elapsed_s, 1)
+    return summary
+
+
+def git_revision() -> Optional[str]:
+    """Révision courante (abrégée), enregistrée avec les références"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_server(env: Optional[Dict[str, str]] = None, workers: int = 1, app: str = "app.main:app"):
+    """
+    Démarre `uvicorn <app>` (par défaut l'API) sur une base SQLite temporaire.
+
+    L'application doit exposer GET /health.
+
+    Yields:
+        URL de base du serveur
+    """
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    server_env = dict(os.environ)
+    server_env.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    server_env.update(env or {})
+    server_env["PYTHONPATH"] = ROOT_DIR
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", app,
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=workdir,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            if time.time() > deadline or process.poll() is not None:
+                raise RuntimeError("Le serveur uvicorn n'a pas démarré")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
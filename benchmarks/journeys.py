@@ -0,0 +1,141 @@
+"""
+Parcours scriptés rejoués par le test de charge (benchmarks.load_test).
+
+Un parcours est une suite d'étapes HTTP exécutées dans l'ordre pour un
+MSISDN synthétique. Chemin et corps peuvent dépendre du contexte du
+parcours (identifiant du crédit obtenu, montant à rembourser) ; chaque
+réponse est vérifiée (code HTTP et texte attendu) pour qu'une erreur
+rapide ne passe pas pour un gain de latence.
+
+Parcours USSD : les sauts d'un même menu partagent un sessionId, comme
+avec la passerelle (les données de parcours sont conservées en session).
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+PIN = "1234"
+LOAN_AMOUNT = 2000
+# Premier crédit à 5 % : montant dû pour un crédit de LOAN_AMOUNT
+FIRST_LOAN_DUE = 2100
+
+Value = Union[Any, Callable[[Dict[str, Any]], Any]]
+
+
+@dataclass
+class Step:
+    """Une requête d'un parcours"""
+
+    name: str
+    method: str
+    path: Value
+    body: Value = None
+    expect_status: int = 200
+    expect_text: Optional[str] = None
+    # Niveau USSD (nombre de saisies) pour le rapport par niveau
+    ussd_level: Optional[int] = None
+    # Mise à jour du contexte à partir du corps JSON de la réponse
+    capture: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+    # Étiquette de l'endpoint (gabarit de route, pas l'URL avec le MSISDN)
+    endpoint: Optional[str] = None
+
+    def resolve(self, value: Value, context: Dict[str, Any]):
+        return value(context) if callable(value) else value
+
+
+@dataclass
+class Journey:
+    name: str
+    steps: List[Step] = field(default_factory=list)
+
+
+def ussd_step(session: str, text: str, expect_text: Optional[str] = None) -> Step:
+    """Saut USSD : sessionId propre au menu et au MSISDN"""
+    return Step(
+        name=f"ussd {text or '<menu>'}",
+        method="POST",
+        path="/ussd",
+        body=lambda context: {
+            "sessionId": f"{context['msisdn']}-{session}",
+            "phoneNumber": context["msisdn"],
+            "text": text,
+        },
+        expect_text=expect_text,
+        ussd_level=len(text.split("*")) if text else 0,
+    )
+
+
+def _menu(session: str, texts: List[str], expect_text: str) -> List[Step]:
+    """Saisies successives d'un menu ; le texte attendu porte sur la dernière"""
+    return [
+        ussd_step(session, text, expect_text if n == len(texts) - 1 else None)
+        for n, text in enumerate(texts)
+    ]
+
+
+def ussd_journey() -> Journey:
+    """Inscription → PIN → consentements → offre → crédit → remboursement → historique"""
+    loan = f"5*{LOAN_AMOUNT}*1"
+    repay = f"6*1*{FIRST_LOAN_DUE}"
+    return Journey("ussd", [
+        ussd_step("menu", "", "Lisalisi"),
+        ussd_step("register", "1", "Compte cree"),
+        *_menu("pin", ["2", f"2*{PIN}", f"2*{PIN}*{PIN}"], "PIN defini"),
+        *_menu("terms", ["3", "3*1"], "Consentement accepte"),
+        *_menu("scoring", ["3", "3*2"], "Consentement accepte"),
+        ussd_step("offer", "4", "Offre de credit"),
+        *_menu("loan", ["5", f"5*{LOAN_AMOUNT}", loan, f"{loan}*{PIN}"], "Credit approuve"),
+        *_menu("repay", ["6", "6*1", repay, f"{repay}*{PIN}"], "rembourse completement"),
+        ussd_step("history", "7", "REPAID"),
+    ])
+
+
+def _consent(consent_type: str) -> Step:
+    return Step(
+        name=f"consent {consent_type}",
+        method="POST",
+        path="/consent/accept",
+        body=lambda context: {
+            "msisdn": context["msisdn"],
+            "consent_type": consent_type,
+            "version": "1.0",
+            "channel": "APP",
+        },
+        expect_status=201,
+    )
+
+
+def _capture_loan(context: Dict[str, Any], body: Dict[str, Any]):
+    context["loan_id"] = body["loan_id"]
+    context["amount_due"] = body["amount_approved"]
+
+
+def app_journey() -> Journey:
+    """Même parcours par l'API de l'application mobile"""
+    return Journey("app", [
+        Step("register", "POST", "/auth/register",
+             body=lambda context: {"msisdn": context["msisdn"]}, expect_status=201),
+        Step("set pin", "POST", "/auth/set-pin",
+             body=lambda context: {"msisdn": context["msisdn"], "pin": PIN}),
+        _consent("TERMS_AND_CONDITIONS"),
+        _consent("SCORING_DATA_ACCESS"),
+        Step("offer", "GET", lambda context: f"/scoring/{context['msisdn']}/offer",
+             endpoint="GET /scoring/{msisdn}/offer"),
+        Step("loan", "POST", "/loans/request",
+             body=lambda context: {
+                 "msisdn": context["msisdn"], "pin": PIN, "amount": LOAN_AMOUNT, "duration_days": 7
+             },
+             expect_status=201, expect_text="ACTIVE", capture=_capture_loan),
+        Step("repay", "POST", "/loans/repay",
+             body=lambda context: {
+                 "msisdn": context["msisdn"], "pin": PIN,
+                 "loan_id": context["loan_id"], "amount": context["amount_due"],
+             }),
+        Step("history", "GET", lambda context: f"/loans/user/{context['msisdn']}/history",
+             endpoint="GET /loans/user/{msisdn}/history", expect_text="REPAID"),
+    ])
+
+
+JOURNEYS: Dict[str, Callable[[], Journey]] = {
+    "ussd": ussd_journey,
+    "app": app_journey,
+}
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test de charge rejouable : parcours USSD et application (benchmarks.journeys)
+pour des milliers de MSISDN synthétiques, à concurrence configurable.
+
+Cibles :
+- in-process (défaut) : l'application ASGI appelée par httpx sans réseau,
+  sur une base SQLite temporaire ;
+- --local-server : serveur uvicorn local temporaire ;
+- --url : serveur existant.
+
+Rapport JSON : débit, erreurs, p50/p95/p99 par endpoint (gabarit de route),
+par niveau USSD et par parcours. --save écrit le rapport comme référence ;
+--compare le confronte à une référence et échoue (code 1) si un p95 ou un
+p99 se dégrade, ou si le débit baisse, de plus de --max-regression-pct.
+
+Utilisation:
+    python -m benchmarks.load_test --users 2000 --concurrency 50 --save benchmarks/baselines/local.json
+    python -m benchmarks.load_test --users 2000 --concurrency 50 --compare benchmarks/baselines/local.json
+    python -m benchmarks.load_test --local-server --mix ussd=1 --users 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.common import git_revision, local_server, summarize
+from benchmarks.journeys import JOURNEYS, Journey
+
+# Métriques comparées à la référence : plus haut est pire
+COMPARED_PERCENTILES = ("p95_ms", "p99_ms")
+MAX_ERROR_SAMPLES = 10
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """ "ussd=0.7,app=0.3" -> {"ussd": 0.7, "app": 0.3}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"Parcours inconnu: {name} (attendu: {', '.join(JOURNEYS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def assign_journeys(users: int, mix: Dict[str, float], seed: int) -> List[Tuple[str, Journey]]:
+    """(MSISDN, parcours) déterministes pour une graine donnée"""
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    journeys = {name: JOURNEYS[name]() for name in names}
+    prefix = f"+2376{seed % 10}{rng.randrange(10 ** 4):04d}"
+    return [
+        (f"{prefix}{n:05d}", journeys[rng.choices(names, weights)[0]])
+        for n in range(users)
+    ]
+
+
+class Recorder:
+    """Latences par endpoint, niveau USSD et parcours ; échantillon d'erreurs"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, List[float]] = defaultdict(list)
+        self.ussd_levels: Dict[str, List[float]] = defaultdict(list)
+        self.journeys: Dict[str, List[float]] = defaultdict(list)
+        self.requests = 0
+        self.errors = 0
+        self.failed_journeys = 0
+        self.error_samples: List[Dict[str, Any]] = []
+
+    def request(self, endpoint: str, ussd_level: Optional[int], elapsed_ms: float):
+        self.requests += 1
+        self.endpoints[endpoint].append(elapsed_ms)
+        if ussd_level is not None:
+            self.ussd_levels[str(ussd_level)].append(elapsed_ms)
+
+    def error(self, journey: str, step: str, detail: str):
+        self.errors += 1
+        if len(self.error_samples) < MAX_ERROR_SAMPLES:
+            self.error_samples.append({"journey": journey, "step": step, "detail": detail[:300]})
+
+
+async def run_journey(client, msisdn: str, journey: Journey, recorder: Recorder):
+    """Exécute les étapes dans l'ordre ; s'arrête à la première réponse inattendue"""
+    context: Dict[str, Any] = {"msisdn": msisdn}
+    started = time.perf_counter()
+    for step in journey.steps:
+        path = step.resolve(step.path, context)
+        body = step.resolve(step.body, context)
+        request_started = time.perf_counter()
+        try:
+            response = await client.request(step.method, path, json=body)
+        except Exception as e:
+            recorder.error(journey.name, step.name, repr(e))
+            recorder.failed_journeys += 1
+            return
+        elapsed_ms = (time.perf_counter() - request_started) * 1000
+        recorder.request(step.endpoint or f"{step.method} {path}", step.ussd_level, elapsed_ms)
+
+        if response.status_code != step.expect_status or (
+            step.expect_text and step.expect_text not in response.text
+        ):
+            recorder.error(journey.name, step.name, f"HTTP {response.status_code}: {response.text}")
+            recorder.failed_journeys += 1
+            return
+        if step.capture:
+            step.capture(context, response.json())
+    recorder.journeys[journey.name].append((time.perf_counter() - started) * 1000)
+
+
+async def run_load(client, assignments: List[Tuple[str, Journey]], concurrency: int) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in assignments:
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                msisdn, journey = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await run_journey(client, msisdn, journey, recorder)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder, time.perf_counter() - started
+
+
+@asynccontextmanager
+async def in_process_client():
+    """Client httpx branché directement sur l'application ASGI (démarrage compris)"""
+    import httpx
+    from app.main import app
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=60
+        ) as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+
+
+@asynccontextmanager
+async def http_client(base_url: str, concurrency: int):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        yield client
+
+
+def build_report(recorder: Recorder, elapsed: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "config": config,
+        "elapsed_s": round(elapsed, 2),
+        "requests": recorder.requests,
+        "throughput_rps": round(recorder.requests / elapsed, 1) if elapsed else 0.0,
+        "journeys_per_s": round(sum(map(len, recorder.journeys.values())) / elapsed, 2) if elapsed else 0.0,
+        "errors": recorder.errors,
+        "failed_journeys": recorder.failed_journeys,
+        "error_samples": recorder.error_samples,
+        "endpoints": {name: summarize(values) for name, values in sorted(recorder.endpoints.items())},
+        "ussd_levels": {level: summarize(values) for level, values in sorted(recorder.ussd_levels.items())},
+        "journeys": {name: summarize(values) for name, values in sorted(recorder.journeys.items())},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression_pct: float) -> List[str]:
+    """Dégradations au-delà du seuil par rapport à la référence"""
+    regressions = []
+    limit = 1 + max_regression_pct / 100
+
+    def check(label: str, current: float, reference: float, higher_is_worse: bool = True):
+        if not reference:
+            return
+        ratio = current / reference if higher_is_worse else reference / current if current else float("inf")
+        if ratio > limit:
+            regressions.append(f"{label}: {reference} -> {current} ({(ratio - 1) * 100:+.1f} %)")
+
+    for section in ("endpoints", "ussd_levels", "journeys"):
+        for name, reference in baseline.get(section, {}).items():
+            current = report[section].get(name)
+            if current is None:
+                continue
+            for key in COMPARED_PERCENTILES:
+                check(f"{section}[{name}].{key}", current[key], reference[key])
+    check("throughput_rps", report["throughput_rps"], baseline["throughput_rps"], higher_is_worse=False)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Serveur existant")
+    target.add_argument("--local-server", action="store_true", help="Serveur uvicorn local temporaire")
+    parser.add_argument("--users", type=int, default=1000, help="MSISDN synthétiques (un parcours chacun)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Parcours simultanés")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("ussd=0.7,app=0.3"), help="Répartition des parcours")
+    parser.add_argument("--seed", type=int, default=42, help="Graine (MSISDN et répartition)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="Coût bcrypt des cibles locales (12 en production)")
+    parser.add_argument("--save", help="Écrire le rapport comme référence JSON")
+    parser.add_argument("--compare", help="Référence JSON à laquelle comparer le rapport")
+    parser.add_argument("--max-regression-pct", type=float, default=15.0)
+    args = parser.parse_args()
+
+    mode = "url" if args.url else "local-server" if args.local_server else "in-process"
+    config = {
+        "target": mode,
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "seed": args.seed,
+        "bcrypt_rounds": args.bcrypt_rounds if mode != "url" else None,
+        "revision": git_revision(),
+    }
+
+    # La configuration est lue à l'import des modules de l'application
+    env = {"BCRYPT_ROUNDS": str(args.bcrypt_rounds)}
+    if mode == "in-process":
+        os.environ.update(env)
+        os.environ.setdefault(
+            "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='load_test_'), 'load.db')}"
+        )
+    assignments = assign_journeys(args.users, args.mix, args.seed)
+
+    async def run(client_factory):
+        async with client_factory as client:
+            return await run_load(client, assignments, args.concurrency)
+
+    if mode == "in-process":
+        recorder, elapsed = asyncio.run(run(in_process_client()))
+    else:
+        server = nullcontext(args.url) if args.url else local_server(env)
+        with server as base_url:
+            recorder, elapsed = asyncio.run(run(http_client(base_url, args.concurrency)))
+
+    report = build_report(recorder, elapsed, config)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+    failed = bool(report["errors"])
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as source:
+            baseline = json.load(source)
+        different = {
+            key: (baseline["config"].get(key), config[key])
+            for key in ("target", "users", "concurrency", "mix", "bcrypt_rounds")
+            if baseline["config"].get(key) != config[key]
+        }
+        if different:
+            print(f"Attention : configuration différente de la référence {different}", file=sys.stderr)
+        regressions = compare(report, baseline, args.max_regression_pct)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}", file=sys.stderr)
+        failed = failed or bool(regressions)
+        if not regressions:
+            print(f"Aucune régression au-delà de {args.max_regression_pct} % "
+                  f"(référence {baseline['config'].get('revision')})", file=sys.stderr)
+    if report["errors"]:
+        print(f"{report['errors']} erreurs, exemples : {report['error_samples'][:3]}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks des chemins chauds, avec références et détection des
+régressions.
+
+Cas mesurés (à la manière de pytest-benchmark : une fonction @case reçoit
+les fixtures et retourne l'appel à mesurer) :
+- ScoringService._compute_score, données collectées une fois ;
+- USSDService.process_ussd_request : menu, offre, historique ;
+- AuditService.log_event dans une unité de travail : insertion et commit ;
+- security.verify_password (bcrypt à BCRYPT_ROUNDS) et sa variante en cache ;
+- ExternalDataSimulator.get_mobile_money_data.
+
+Fixtures : base SQLite en mémoire peuplée par scripts.generate_data et une
+session.
+
+Par cas : étalonnage du nombre d'appels par tour (--min-time), --rounds
+tours, ops/s du tour médian, µs par appel (min, médiane, écart-type) ; puis
+un échantillon sous tracemalloc (mesure séparée, tracemalloc ralentit les
+appels) : pic d'allocation et mémoire retenue par appel.
+
+--save écrit le rapport comme référence JSON ; --compare échoue (code 1)
+si les ops/s d'un cas baissent, ou si son pic d'allocation augmente, de
+plus de --max-regression-pct.
+
+Utilisation:
+    python -m benchmarks.micro --save benchmarks/baselines/micro.json
+    python -m benchmarks.micro --compare benchmarks/baselines/micro.json
+    python -m benchmarks.micro -k ussd --rounds 20
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_micro_'), 'bench.db')}"
+)
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.security import verify_password, verify_password_cached
+from app.db.db import Base
+from app.db.models import Loan, User
+from app.db.unit_of_work import unit_of_work
+from app.services.audit_service import AuditService
+from app.services.external_data_simulator import ExternalDataSimulator
+from app.services.scoring_service import ScoringService
+from app.services.ussd_service import USSDService
+from benchmarks.common import git_revision
+from scripts.generate_data import DEFAULT_PIN, generate
+
+# En dessous de cet écart, une hausse du pic d'allocation est du bruit
+ALLOC_NOISE_BYTES = 256
+
+
+class Fixtures:
+    """Base SQLite en mémoire peuplée et session du benchmark"""
+
+    def __init__(self, users: int, seed: int):
+        # Une seule connexion partagée : la base en mémoire vit avec elle
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=self.engine)
+        generate(self.engine, users, loans_per_user=3, seed=seed, pin=DEFAULT_PIN)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.db = self.session_factory()
+
+        # Utilisateur du crédit médian : PIN, consentements et historique
+        median_loan_id = self.db.execute(select(Loan.id).order_by(Loan.id.desc()).limit(1)).scalar() // 2
+        self.user = self.db.execute(
+            select(User).join(Loan, Loan.user_id == User.id).where(Loan.id >= median_loan_id).limit(1)
+        ).scalar_one()
+        self.msisdns = self.db.execute(select(User.msisdn).order_by(User.id)).scalars().all()
+
+    def after_round(self):
+        """Entre deux tours : fin de transaction"""
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+        self.engine.dispose()
+
+
+CASES: Dict[str, Callable[[Fixtures], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    """Enregistre un cas : fonction(fixtures) -> appel à mesurer"""
+    def decorator(func):
+        CASES[name] = func
+        return func
+    return decorator
+
+
+@case("scoring.compute_score")
+def bench_compute_score(fx: Fixtures):
+    service = ScoringService(fx.db)
+    internal = service._collect_internal_data(fx.user)
+    external = ExternalDataSimulator.get_mobile_money_data(fx.user.msisdn)
+    return lambda: service._compute_score(internal, external)
+
+
+def _ussd(text: str):
+    def factory(fx: Fixtures):
+        service = USSDService(fx.db)
+        session_id = f"bench-{text or 'menu'}"
+        return lambda: service.process_ussd_request(fx.user.msisdn, text, session_id)
+    return factory
+
+
+case("ussd.menu")(_ussd(""))
+case("ussd.offer")(_ussd("4"))
+case("ussd.history")(_ussd("7"))
+
+
+@case("audit.log_event")
+def bench_log_event(fx: Fixtures):
+    service = AuditService(fx.db)
+    user_id = fx.user.id
+
+    def log_event():
+        with unit_of_work(fx.db):
+            service.log_event(
+                event_type="loan_request",
+                user_id=user_id,
+                event_data={"loan_id": 1, "amount_requested": 5000, "duration_days": 30, "score": 612.5},
+                channel="USSD",
+                loan_id=1
+            )
+    return log_event
+
+
+@case("security.verify_password")
+def bench_verify_password(fx: Fixtures):
+    pin_hash = fx.user.pin_hash
+    return lambda: verify_password(DEFAULT_PIN, pin_hash)
+
+
+@case("security.verify_password_cached")
+def bench_verify_password_cached(fx: Fixtures):
+    user_id, pin_hash = fx.user.id, fx.user.pin_hash
+    return lambda: verify_password_cached(user_id, DEFAULT_PIN, pin_hash)
+
+
+@case("external.get_mobile_money_data")
+def bench_mobile_money_data(fx: Fixtures):
+    msisdns = itertools.cycle(fx.msisdns)
+    return lambda: ExternalDataSimulator.get_mobile_money_data(next(msisdns))
+
+
+def _time_calls(func: Callable[[], Any], calls: int) -> float:
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for _ in range(calls):
+        func()
+    return perf_counter() - started
+
+
+def measure_speed(func: Callable[[], Any], fx: Fixtures, rounds: int, min_time: float) -> Dict[str, Any]:
+    """Tours chronométrés après étalonnage (l'étalonnage sert d'échauffement)"""
+    calls = 1
+    while True:
+        elapsed = _time_calls(func, calls)
+        fx.after_round()
+        if elapsed >= min_time or calls >= 10 ** 7:
+            break
+        calls = calls * 10 if elapsed < min_time / 10 else int(calls * min_time / elapsed) + 1
+
+    per_call = []
+    for _ in range(rounds):
+        per_call.append(_time_calls(func, calls) / calls)
+        fx.after_round()
+    median = statistics.median(per_call)
+    return {
+        "ops_per_s": round(1 / median, 1),
+        "us_per_call": {
+            "min": round(min(per_call) * 1e6, 3),
+            "median": round(median * 1e6, 3),
+            "stddev": round(statistics.stdev(per_call) * 1e6, 3) if len(per_call) > 1 else 0.0,
+        },
+        "calls_per_round": calls,
+        "rounds": rounds,
+    }
+
+
+def measure_allocations(func: Callable[[], Any], fx: Fixtures, calls: int) -> Dict[str, Any]:
+    """Pic d'allocation (médiane par appel) et mémoire retenue par appel"""
+    func()  # Caches et imports paresseux hors mesure
+    tracemalloc.start()
+    try:
+        peaks = []
+        start = tracemalloc.get_traced_memory()[0]
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+        fx.after_round()
+    return {
+        "alloc_peak_bytes": int(statistics.median(peaks)),
+        "alloc_retained_bytes": round(retained / calls, 1),
+    }
+
+
+def run_cases(fx: Fixtures, names: List[str], rounds: int, min_time: float, alloc_calls: int) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        func = CASES[name](fx)
+        result = measure_speed(func, fx, rounds, min_time)
+        result.update(measure_allocations(func, fx, min(alloc_calls, result["calls_per_round"])))
+        results[name] = result
+        print(
+            f"{name:<36} {result['ops_per_s']:>12,.0f} ops/s  "
+            f"{result['us_per_call']['median']:>10.2f} µs  {result['alloc_peak_bytes']:>8} o",
+            file=sys.stderr
+        )
+    return results
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression_pct: float) -> List[str]:
+    """Dégradations au-delà du seuil par rapport à la référence"""
+    regressions = []
+    limit = 1 + max_regression_pct / 100
+    for name, reference in baseline["cases"].items():
+        current = report["cases"].get(name)
+        if current is None:
+            continue
+        if reference["ops_per_s"] / current["ops_per_s"] > limit:
+            regressions.append(
+                f"{name}.ops_per_s: {reference['ops_per_s']} -> {current['ops_per_s']} "
+                f"({(current['ops_per_s'] / reference['ops_per_s'] - 1) * 100:+.1f} %)"
+            )
+        peak, reference_peak = current["alloc_peak_bytes"], reference["alloc_peak_bytes"]
+        if peak > reference_peak * limit and peak - reference_peak > ALLOC_NOISE_BYTES:
+            regressions.append(f"{name}.alloc_peak_bytes: {reference_peak} -> {peak}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="Seulement les cas dont le nom contient ce texte")
+    parser.add_argument("--rounds", type=int, default=10, help="Tours chronométrés par cas")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Durée minimale d'un tour (s)")
+    parser.add_argument("--alloc-calls", type=int, default=200, help="Appels mesurés sous tracemalloc")
+    parser.add_argument("--users", type=int, default=2000, help="Utilisateurs de la base en mémoire")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Écrire le rapport comme référence JSON")
+    parser.add_argument("--compare", help="Référence JSON à laquelle comparer le rapport")
+    parser.add_argument("--max-regression-pct", type=float, default=15.0)
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.keyword or args.keyword in name]
+    if not names:
+        parser.error(f"Aucun cas ne correspond à {args.keyword!r} (cas: {', '.join(CASES)})")
+
+    fx = Fixtures(args.users, args.seed)
+    try:
+        cases = run_cases(fx, names, args.rounds, args.min_time, args.alloc_calls)
+    finally:
+        fx.close()
+
+    config = {
+        "users": args.users,
+        "seed": args.seed,
+        "rounds": args.rounds,
+        "min_time": args.min_time,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "python": platform.python_version(),
+        "revision": git_revision(),
+    }
+    report = {"config": config, "cases": cases}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as source:
+            baseline = json.load(source)
+        different = {
+            key: (baseline["config"].get(key), config[key])
+            for key in ("users", "seed", "bcrypt_rounds", "python")
+            if baseline["config"].get(key) != config[key]
+        }
+        if different:
+            print(f"Attention : configuration différente de la référence {different}", file=sys.stderr)
+        regressions = compare(report, baseline, args.max_regression_pct)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"Aucune régression au-delà de {args.max_regression_pct} % "
+              f"(référence {baseline['config'].get('revision')})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Faux fournisseur Mobile Money avec injection de latence et de pannes.
+
+Sert le contrat attendu par HttpMobileMoneyConnector
+(GET /v1/subscribers/{msisdn}/profile) à partir du simulateur déterministe.
+Les pannes se règlent par variables d'environnement au démarrage ou à
+chaud par POST /_faults :
+
+    latency_ms      latence de base de chaque réponse
+    jitter_ms       latence aléatoire ajoutée (0 à jitter_ms)
+    slow_rate       part des réponses retardées de slow_ms
+    slow_ms         latence des réponses lentes
+    error_rate      part des réponses en HTTP 503
+    not_found_rate  part des abonnés inconnus (HTTP 404)
+
+Utilisation:
+    MM_STUB_LATENCY_MS=50 uvicorn benchmarks.mobile_money_stub:app --port 8081
+    curl -X POST localhost:8081/_faults -H 'Content-Type: application/json' -d '{"error_rate": 0.3}'
+"""
+import asyncio
+import os
+import random
+from typing import Dict
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from app.services.external_data_simulator import ExternalDataSimulator
+
+FAULT_KEYS = ["latency_ms", "jitter_ms", "slow_rate", "slow_ms", "error_rate", "not_found_rate"]
+
+faults: Dict[str, float] = {
+    key: float(os.environ.get(f"MM_STUB_{key.upper()}", 0)) for key in FAULT_KEYS
+}
+stats = {"requests": 0, "errors": 0, "slow": 0}
+
+app = FastAPI(title="Mobile Money stub")
+_rng = random.Random(0)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/_faults")
+async def get_faults():
+    return {"faults": faults, "stats": stats}
+
+
+@app.post("/_faults")
+async def set_faults(new_faults: Dict[str, float]):
+    """Modifie l'injection de pannes (clés absentes inchangées) et remet les compteurs à zéro"""
+    faults.update({key: float(value) for key, value in new_faults.items() if key in FAULT_KEYS})
+    stats.update(requests=0, errors=0, slow=0)
+    return {"faults": faults}
+
+
+@app.get("/v1/subscribers/{msisdn}/profile")
+async def get_profile(msisdn: str):
+    stats["requests"] += 1
+    delay_ms = faults["latency_ms"] + _rng.uniform(0, faults["jitter_ms"])
+    if _rng.random() < faults["slow_rate"]:
+        stats["slow"] += 1
+        delay_ms += faults["slow_ms"]
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+
+    if _rng.random() < faults["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"detail": "Service indisponible (injecté)"})
+    if _rng.random() < faults["not_found_rate"]:
+        return JSONResponse(status_code=404, content={"detail": "Abonné inconnu"})
+
+    data = ExternalDataSimulator.get_mobile_money_data(msisdn)
+    return {
+        "msisdn": msisdn,
+        "account_age_months": data["mm_account_age_months"],
+        "monthly_volume_avg": data["mm_monthly_volume_avg"],
+        "monthly_transactions_avg": data["mm_monthly_transactions_avg"],
+        "activity_regularity": data["mm_activity_regularity"],
+    }
@@ -0,0 +1 @@
+# Outils en ligne de commande (exploitation, données, vérifications)
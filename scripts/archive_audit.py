@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Job de rétention de l'audit trail : archive les mois plus anciens que
+AUDIT_HOT_RETENTION_MONTHS dans AUDIT_ARCHIVE_DIR (NDJSON gzip, un fichier
+par mois) puis les retire de audit_logs.
+
+Le job peut être relancé sans risque : un mois déjà catalogué n'est pas
+réécrit, seules ses lignes restantes sont supprimées. À planifier une fois
+par jour (cron), hors des heures de pointe.
+
+AUDIT_ARCHIVE_DIR doit être partagé par tous les nœuds qui servent l'API.
+--reindex reconstruit la présence des utilisateurs/crédits par mois
+(audit_archive_users/loans) depuis les fichiers, par exemple si la
+migration 9 a tourné sur un nœud qui ne les voyait pas.
+
+Utilisation:
+    python -m scripts.archive_audit --dry-run
+    python -m scripts.archive_audit --retention-months 12
+    python -m scripts.archive_audit --verify
+    python -m scripts.archive_audit --reindex
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base cible (défaut: DATABASE_URL)")
+    parser.add_argument("--archive-dir", help="Répertoire des archives (défaut: AUDIT_ARCHIVE_DIR)")
+    parser.add_argument("--retention-months", type=int, help="Mois gardés dans audit_logs (défaut: AUDIT_HOT_RETENTION_MONTHS)")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="Date de référence (ISO 8601, défaut: maintenant)")
+    parser.add_argument("--dry-run", action="store_true", help="Lister les mois éligibles sans rien modifier")
+    parser.add_argument("--verify", action="store_true", help="Contrôler les fichiers archivés contre le catalogue")
+    parser.add_argument("--reindex", action="store_true", help="Reconstruire la présence par mois depuis les fichiers")
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import des modules de l'application
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.db.db import SessionLocal
+    from app.services.audit_archive import AuditArchiveService
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        archives = AuditArchiveService(db, archive_dir=args.archive_dir, retention_months=args.retention_months)
+        if args.verify:
+            problems = archives.verify()
+            print(json.dumps({"problems": problems}, ensure_ascii=False, indent=2))
+            sys.exit(1 if problems else 0)
+        if args.reindex:
+            missing = [p.month for p in archives.partitions() if not archives.index_partition(p)]
+            print(json.dumps({"missing_files": missing}, ensure_ascii=False, indent=2))
+            sys.exit(1 if missing else 0)
+        result = archives.run(now=args.now, dry_run=args.dry_run)
+
+    result["elapsed_s"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
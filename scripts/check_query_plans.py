@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vérifie que les requêtes des services utilisent un index.
+
+Le script peuple une base volumineuse (≈1M lignes par défaut, voir
+scripts.generate_data), exécute les méthodes de lecture de LoanService,
+ConsentService, ScoringService et AuditService en capturant le SQL émis,
+puis passe chaque SELECT à EXPLAIN. Il échoue (code 1) si un plan parcourt une table entière ou trie
+sans index.
+
+Utilisation:
+    python -m scripts.check_query_plans                         # base SQLite temporaire
+    python -m scripts.check_query_plans --users 20000           # plus rapide
+    python -m scripts.check_query_plans --database-url sqlite:///./seeded.db --no-seed
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.db.models import Loan, User
+from scripts.generate_data import create_schema, generate
+
+# Plans refusés : parcours complet de table ou tri hors index
+SQLITE_BAD_PLAN = re.compile(r"^SCAN (?!CONSTANT ROW)\S+$|USE TEMP B-TREE")
+POSTGRES_BAD_PLAN = re.compile(r"Seq Scan on|Sort Method|^\s*->\s*Sort\b|^Sort\b")
+
+
+def capture_service_queries(engine, user_id: int) -> list:
+    """Exécute les lectures des services et retourne les SELECT émis"""
+    from app.services.audit_service import AuditService
+    from app.services.consent_service import ConsentService
+    from app.services.loan_service import LoanService
+    from app.services.scoring_service import ScoringService
+
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        with Session(engine) as db:
+            user = db.get(User, user_id)
+            loan = db.query(Loan).filter(Loan.user_id == user_id).first()
+
+            calls = [
+                ("ConsentService.check_consents", lambda: ConsentService(db).check_consents(user)),
+                ("LoanService.get_user_loans", lambda: LoanService(db).get_user_loans(user)),
+                ("LoanService.get_loan_history", lambda: LoanService(db).get_loan_history(
+                    user, limit=2, cursor=LoanService(db).get_loan_history(user, limit=2)[1]
+                )),
+                ("LoanService.get_active_loans", lambda: LoanService(db).get_active_loans(user)),
+                ("LoanService.get_loan_status", lambda: LoanService(db).get_loan_status(user, loan.id)),
+                ("LoanService.repay_loan", lambda: LoanService(db).repay_loan(user, loan.id, 10 ** 9)),
+                ("LoanService.request_loan", lambda: LoanService(db).request_loan(user, 10 ** 9, 30)),
+                ("ScoringService.calculate_score", lambda: ScoringService(db).calculate_score(user)),
+                ("AuditService.get_user_audit_logs", lambda: AuditService(db).get_user_audit_logs(user.id)),
+                ("AuditService.get_user_audit_page", lambda: AuditService(db).get_user_audit_page(
+                    user.id, limit=2, cursor=AuditService(db).get_user_audit_page(user.id, limit=2)[1]
+                )),
+                ("AuditService.get_loan_audit_trail", lambda: AuditService(db).get_loan_audit_trail(loan.id)),
+            ]
+            results = []
+            for name, call in calls:
+                start = len(captured)
+                try:
+                    call()
+                except ValueError:
+                    pass  # Refus métier attendu : seules les lectures nous intéressent
+                db.rollback()
+                results.extend((name, statement, parameters) for statement, parameters in captured[start:])
+            return results
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(engine, statement: str, parameters) -> list:
+    """Plan d'exécution d'une requête capturée"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            return [row[-1] for row in rows]
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).all()
+        return [row[0] for row in rows]
+
+
+def is_bad_plan(engine, plan_lines: list) -> bool:
+    pattern = SQLITE_BAD_PLAN if engine.dialect.name == "sqlite" else POSTGRES_BAD_PLAN
+    return any(pattern.search(line.strip()) for line in plan_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base à utiliser (défaut: SQLite temporaire)")
+    parser.add_argument("--users", type=int, default=40000)
+    parser.add_argument("--loans-per-user", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="Ne pas peupler (base déjà remplie)")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+    engine = create_schema(database_url)
+
+    if not args.no_seed:
+        result = generate(engine, args.users, loans_per_user=args.loans_per_user, seed=args.seed)
+        print(f"Base peuplée: {result['rows']:,} lignes en {result['elapsed_s']:.1f}s ({database_url})")
+
+    with engine.connect() as conn:
+        # Utilisateur du crédit médian : un historique de crédits à parcourir
+        sample_user_id = conn.exec_driver_sql(
+            "SELECT user_id FROM loans WHERE id >= (SELECT MAX(id) / 2 FROM loans) ORDER BY id LIMIT 1"
+        ).scalar() or conn.exec_driver_sql("SELECT MAX(id) / 2 FROM users").scalar() or 1
+
+    failures = 0
+    for name, statement, parameters in capture_service_queries(engine, sample_user_id):
+        plan = explain(engine, statement, parameters)
+        bad = is_bad_plan(engine, plan)
+        failures += bad
+        print(f"[{'ÉCHEC' if bad else 'OK'}] {name}")
+        print("    " + " ".join(statement.split())[:160])
+        for line in plan:
+            print(f"      {line}")
+
+    if failures:
+        print(f"\n{failures} requête(s) sans index")
+        sys.exit(1)
+    print("\nToutes les requêtes des services utilisent un index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Export de l'audit trail (NDJSON ou CSV, gzip optionnel) sur une période.
+
+Lecture par curseur serveur et écriture en flux : la mémoire utilisée ne
+dépend pas du nombre d'événements exportés.
+
+Utilisation:
+    python -m scripts.export_audit --start 2026-01-01 --end 2026-02-01 --output janvier.ndjson.gz --gzip
+    python -m scripts.export_audit --format csv --event-type loan_decision --channel USSD > decisions.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base source (défaut: DATABASE_URL)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Compresser la sortie")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Début de période, inclus (ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Fin de période, exclue (ISO 8601)")
+    parser.add_argument("--event-type", help="Type d'événement (ex: loan_decision)")
+    parser.add_argument("--channel", help="Canal (USSD, APP, SYSTEM)")
+    parser.add_argument("--msisdn", help="Événements d'un seul utilisateur")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Lignes lues par aller-retour")
+    parser.add_argument("--output", default="-", help="Fichier de sortie (défaut: sortie standard)")
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import des modules de l'application
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.db.db import SessionLocal
+    from app.db.models import AuditEventType
+    from app.services.audit_export import AuditExportService
+    from app.services.auth_service import AuthService
+
+    user_id = None
+    if args.msisdn:
+        with SessionLocal() as db:
+            user = AuthService(db).get_user_by_msisdn(args.msisdn)
+            if not user:
+                sys.exit(f"Utilisateur introuvable: {args.msisdn}")
+            user_id = user.id
+
+    try:
+        chunks = AuditExportService(batch_size=args.batch_size).stream(
+            fmt=args.format,
+            compress=args.gzip,
+            start=args.start,
+            end=args.end,
+            event_type=AuditEventType(args.event_type) if args.event_type else None,
+            channel=args.channel,
+            user_id=user_id
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+    started = time.perf_counter()
+    written = 0
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    print(json.dumps({
+        "bytes_written": written,
+        "elapsed_s": round(time.perf_counter() - started, 2)
+    }), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
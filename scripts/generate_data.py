@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Générateur de données synthétiques pour les mesures de performance.
+
+Peuple une base (schéma app/db/models.py, migrations comprises) avec N
+utilisateurs et tout ce qui en dépend : portefeuille, consentements,
+historique de crédits, compteurs UserLoanStats, ScoringData et audit trail.
+Les historiques respectent les règles du service de crédit : au plus un
+crédit ACTIVE ou OVERDUE par utilisateur (le dernier), crédits refusés sous
+un score de 400, intérêts à 5 % au premier crédit puis 3 %, compteurs
+cohérents avec les crédits, événements d'audit datés comme les crédits.
+
+Chaque utilisateur est tiré d'un générateur pseudo-aléatoire propre
+(graine globale + identifiant) : une même graine et une même date de
+référence donnent la même base, et l'utilisateur 42 est identique dans une
+base de 1 000 ou de 1 000 000 d'utilisateurs. Les lignes sont insérées par
+INSERT multi-lignes (executemany Core), une transaction par paquet
+d'utilisateurs ; les identifiants reprennent après ceux déjà présents.
+
+Ordre de grandeur : ≈30 lignes par utilisateur avec --loans-per-user 5,
+soit ≈10M lignes pour 330 000 utilisateurs.
+
+La base obtenue sert aux benchmarks et à scripts.check_query_plans
+(--no-seed). Tous les utilisateurs ayant un PIN utilisent --pin.
+
+Utilisation:
+    python -m scripts.generate_data --database-url sqlite:///./seeded.db --users 330000
+    python -m scripts.generate_data --database-url postgresql://... --users 1000000 --seed 7
+    python -m scripts.check_query_plans --database-url sqlite:///./seeded.db --no-seed
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import Engine
+from app.db.db import Base, configure_sqlite, is_sqlite_url, sqlite_pragmas
+from app.db.migrations import run_migrations
+from app.db.models import (
+    AuditEventType, AuditLog, Consent, ConsentType, Loan, LoanStatus, ScoringData, User,
+    UserLoanStats, Wallet
+)
+from app.services.consent_service import ConsentService
+from app.services.loan_service import LoanService
+from app.services.scoring_service import ScoringService
+
+CHUNK_SIZE = 10000
+CHUNK_USERS = 2000
+DEFAULT_PIN = "1234"
+
+# Tables dans l'ordre des clés étrangères
+TABLES = [
+    User.__table__, Wallet.__table__, Consent.__table__, Loan.__table__,
+    UserLoanStats.__table__, ScoringData.__table__, AuditLog.__table__,
+]
+# Tables dont les identifiants sont attribués par le générateur
+EXPLICIT_IDS = (User.__table__, Loan.__table__)
+
+FIRST_NAMES = ["Awa", "Jean", "Marie", "Paul", "Aminatou", "Eric", "Brice", "Chantal", "Ibrahim", "Sandrine"]
+LAST_NAMES = ["Mbarga", "Nkoulou", "Fotso", "Tchoupo", "Abena", "Ngono", "Bello", "Kamga", "Essomba", "Djoum"]
+LOAN_AMOUNTS = [1000, 2000, 5000, 10000, 20000, 50000, 100000]
+LOAN_AMOUNT_WEIGHTS = [10, 20, 30, 20, 10, 7, 3]
+DURATIONS = [7, 14, 30]
+# Marqueurs de paramètres positionnels par style DB-API
+PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+SCORE_THRESHOLDS = sorted(ScoringService.SCORE_THRESHOLDS.items(), reverse=True)
+
+
+def _insert_chunks(engine, table, rows):
+    """INSERT multi-lignes par paquets de CHUNK_SIZE"""
+    batch = []
+    with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                conn.execute(insert(table), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+
+
+def _audit(user_id, loan_id, event_type, event_data, channel, created_at) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "loan_id": loan_id,
+        "event_type": event_type,
+        "event_data": json.dumps(event_data),
+        "channel": channel,
+        "ip_address": None,
+        "created_at": created_at,
+    }
+
+
+def generate_user(
+    user_id: int,
+    first_loan_id: int,
+    seed: int,
+    now: datetime,
+    loans_per_user: int,
+    pin_hash: Optional[str],
+    rows: Dict[str, List[Dict[str, Any]]],
+    audit: bool = True,
+    scoring: bool = True
+) -> int:
+    """
+    Ajoute à `rows` (par nom de table) les lignes d'un utilisateur.
+
+    Returns:
+        Nombre de crédits créés (identifiants first_loan_id et suivants)
+    """
+    rng = random.Random(seed * 1_000_003 + user_id)
+    channel = "USSD" if rng.random() < 0.75 else "APP"
+    created_at = now - timedelta(days=rng.randint(1, 1000), seconds=rng.randrange(86400))
+    msisdn = f"+2376{user_id:08d}"
+    has_pin = pin_hash is not None and rng.random() < 0.92
+    full_name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" if rng.random() < 0.6 else None
+    ussd_usage, app_usage = (rng.randint(0, 120), rng.randint(0, 10)) if channel == "USSD" \
+        else (rng.randint(0, 10), rng.randint(0, 80))
+
+    rows["users"].append({
+        "id": user_id,
+        "msisdn": msisdn,
+        "full_name": full_name,
+        "pin_hash": pin_hash if has_pin else None,
+        "created_at": created_at,
+        "last_login": now - timedelta(seconds=rng.randrange(int((now - created_at).total_seconds()))) if has_pin else None,
+        "ussd_usage_count": ussd_usage,
+        "app_usage_count": app_usage,
+    })
+    rows["wallets"].append({
+        "user_id": user_id,
+        "balance": rng.randrange(0, 250000, 50),
+        "savings_balance": rng.randrange(0, 100000, 50) if rng.random() < 0.3 else 0,
+        "created_at": created_at,
+    })
+    if audit:
+        rows["audit_logs"].append(_audit(user_id, None, AuditEventType.REGISTER, {
+            "msisdn": msisdn, "full_name": full_name, "channel": channel
+        }, channel, created_at))
+
+    # PIN puis consentements, dans les jours qui suivent l'inscription
+    t = created_at + timedelta(minutes=rng.randint(1, 60 * 24 * 3))
+    if has_pin and audit:
+        rows["audit_logs"].append(_audit(user_id, None, AuditEventType.SET_PIN, {
+            "pin_set": True, "channel": channel
+        }, channel, t))
+    draw = rng.random()
+    consent_types = [] if not has_pin else \
+        [ConsentType.TERMS_AND_CONDITIONS, ConsentType.SCORING_DATA_ACCESS] if draw < 0.95 else \
+        [ConsentType.TERMS_AND_CONDITIONS] if draw < 0.98 else []
+    for consent_type in consent_types:
+        t += timedelta(seconds=rng.randint(5, 600))
+        version = ConsentService.TERMS_VERSION if consent_type == ConsentType.TERMS_AND_CONDITIONS \
+            else ConsentService.SCORING_VERSION
+        rows["consents"].append({
+            "user_id": user_id,
+            "consent_type": consent_type,
+            "version": version,
+            "accepted": True,
+            "channel": channel,
+            "accepted_at": t,
+            "created_at": t,
+        })
+        if audit:
+            rows["audit_logs"].append(_audit(user_id, None, AuditEventType.CONSENT, {
+                "consent_type": consent_type.value, "version": version, "accepted": True, "channel": channel
+            }, channel, t))
+
+    # Historique de crédits : séquentiel, un crédit en cours au plus (le dernier)
+    counts = {"total": 0, "repaid": 0, "overdue": 0, "active": 0}
+    loan_id = first_loan_id
+    target = rng.randint(0, 2 * loans_per_user) if len(consent_types) == 2 else 0
+    approved_before = False
+    t += timedelta(days=rng.randint(0, 30), seconds=rng.randrange(86400))
+    while counts["total"] < target and t < now - timedelta(hours=1):
+        duration = rng.choice(DURATIONS)
+        approved = rng.random() >= 0.12
+        score = round(rng.uniform(400, 950) if approved else rng.uniform(150, 399.9), 1)
+        max_loan_amount = next(cap for threshold, cap in SCORE_THRESHOLDS if score >= threshold)
+        amount = min(rng.choices(LOAN_AMOUNTS, LOAN_AMOUNT_WEIGHTS)[0], max_loan_amount)
+        rate = LoanService.STANDARD_INTEREST_RATE if approved_before else LoanService.DEFAULT_INTEREST_RATE
+        amount_approved = amount + int(amount * (rate / 100))
+        loan = {
+            "id": loan_id,
+            "user_id": user_id,
+            "amount_requested": amount,
+            "amount_approved": amount_approved if approved else None,
+            "amount_remaining": amount_approved if approved else 0,
+            "interest_rate": rate,
+            "duration_days": duration,
+            "status": LoanStatus.ACTIVE if approved else LoanStatus.REJECTED,
+            "requested_at": t,
+            "decided_at": t,
+            "due_date": t + timedelta(days=duration) if approved else None,
+            "repaid_at": None,
+            "score_at_request": score,
+            "score_explanation": None,
+            "decision_reason": f"Score {score:.0f}/1000 - {'approuvé' if approved else 'refusé'}",
+        }
+        events = [(AuditEventType.LOAN_REQUEST, {
+            "loan_id": loan_id, "amount_requested": amount, "duration_days": duration,
+            "score": score, "max_loan_amount": max_loan_amount
+        }, channel, t)]
+        counts["total"] += 1
+        next_start = t
+        if not approved:
+            events.append((AuditEventType.LOAN_DECISION, {
+                "loan_id": loan_id, "decision": "REJECTED", "score": score, "reason": loan["decision_reason"]
+            }, channel, t))
+        else:
+            approved_before = True
+            due = loan["due_date"]
+            events.append((AuditEventType.LOAN_DECISION, {
+                "loan_id": loan_id, "decision": "APPROVED", "amount_approved": amount_approved,
+                "due_date": due.isoformat(), "score": score, "reason": loan["decision_reason"]
+            }, channel, t))
+            events.append((AuditEventType.PAYOUT_SIMULATED, {
+                "loan_id": loan_id, "amount": amount, "transaction_id": f"SIM{loan_id:012d}", "status": "SUCCESS"
+            }, channel, t))
+            # Remboursement : souvent avant l'échéance, parfois en retard, parfois jamais
+            outcome = rng.random()
+            repay_at = t + timedelta(days=rng.uniform(1, duration if outcome < 0.8 else duration + 20))
+            if outcome < 0.93 and repay_at < now:
+                if rng.random() < 0.25:
+                    partial = amount_approved // 2
+                    partial_at = t + (repay_at - t) / 2
+                    events.append((AuditEventType.REPAY, {
+                        "loan_id": loan_id, "amount_paid": partial,
+                        "amount_remaining": amount_approved - partial, "is_fully_repaid": False
+                    }, channel, partial_at))
+                    paid = amount_approved - partial
+                else:
+                    paid = amount_approved
+                loan.update(status=LoanStatus.REPAID, amount_remaining=0, repaid_at=repay_at)
+                events.append((AuditEventType.REPAY, {
+                    "loan_id": loan_id, "amount_paid": paid, "amount_remaining": 0, "is_fully_repaid": True
+                }, channel, repay_at))
+                counts["repaid"] += 1
+                next_start = repay_at
+            elif due < now:
+                loan["status"] = LoanStatus.OVERDUE
+                events.append((AuditEventType.LOAN_OVERDUE, {
+                    "loan_id": loan_id, "due_date": due.isoformat(), "amount_remaining": amount_approved,
+                    "days_overdue": 0
+                }, "SYSTEM", due + timedelta(minutes=rng.randint(1, 60))))
+                counts["overdue"] += 1
+                next_start = now
+            else:
+                counts["active"] += 1
+                next_start = now
+
+        rows["loans"].append(loan)
+        if audit:
+            rows["audit_logs"].extend(
+                _audit(user_id, loan_id, event_type, data, event_channel, at)
+                for event_type, data, event_channel, at in events
+            )
+        loan_id += 1
+        t = next_start + timedelta(days=rng.randint(0, 45), seconds=rng.randrange(86400))
+
+    if counts["total"]:
+        rows["user_loan_stats"].append({
+            "user_id": user_id,
+            "total_loans_count": counts["total"],
+            "repaid_loans_count": counts["repaid"],
+            "overdue_loans_count": counts["overdue"],
+            "active_loans_count": counts["active"],
+            "updated_at": now,
+        })
+
+    # Score persisté pour les utilisateurs ayant accepté l'accès aux données
+    if scoring and ConsentType.SCORING_DATA_ACCESS in consent_types:
+        rows["scoring_data"].append({
+            "user_id": user_id,
+            "account_age_days": (now - created_at).days,
+            "ussd_usage_count": ussd_usage,
+            "app_usage_count": app_usage,
+            "total_loans_count": counts["total"],
+            "repaid_loans_count": counts["repaid"],
+            "overdue_loans_count": counts["overdue"],
+            "mm_account_age_months": rng.randint(1, 96),
+            "mm_monthly_volume_avg": rng.randrange(5000, 800000, 500),
+            "mm_monthly_transactions_avg": rng.randint(1, 120),
+            "mm_activity_regularity": round(rng.random(), 2),
+            "score": round(rng.uniform(250, 950), 1),
+            "score_version": ScoringService.SCORE_VERSION,
+            "calculated_at": now - timedelta(seconds=rng.randrange(86400 * 30)),
+            "is_stale": rng.random() < 0.2,
+        })
+
+    return loan_id - first_loan_id
+
+
+def _bulk_insert(conn, table, rows: List[Dict[str, Any]]):
+    """
+    executemany au niveau du pilote : valeurs converties colonne par colonne
+    par les processeurs de type du dialecte, sans construction des
+    paramètres ligne par ligne par SQLAlchemy (≈2x plus rapide).
+    """
+    placeholder = PLACEHOLDERS.get(conn.dialect.paramstyle)
+    if placeholder is None:
+        conn.execute(insert(table), rows)
+        return
+    columns = list(rows[0])
+    processors = [
+        (index, processor)
+        for index, name in enumerate(columns)
+        for processor in [table.c[name].type.dialect_impl(conn.dialect).bind_processor(conn.dialect)]
+        if processor is not None
+    ]
+    statement = (
+        f"INSERT INTO {table.name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join([placeholder] * len(columns))})"
+    )
+    parameters = []
+    for row in rows:
+        values = [row[name] for name in columns]
+        for index, processor in processors:
+            values[index] = processor(values[index])
+        parameters.append(tuple(values))
+    conn.exec_driver_sql(statement, parameters)
+
+
+def _next_ids(conn) -> Dict[str, int]:
+    return {
+        table.name: (conn.execute(text(f"SELECT MAX(id) FROM {table.name}")).scalar() or 0) + 1
+        for table in EXPLICIT_IDS
+    }
+
+
+def _reset_sequences(conn):
+    """PostgreSQL : séquences réalignées après des identifiants explicites"""
+    for table in EXPLICIT_IDS:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+        ))
+
+
+def generate(
+    engine: Engine,
+    users: int,
+    loans_per_user: int = 5,
+    seed: int = 42,
+    now: Optional[datetime] = None,
+    pin: Optional[str] = DEFAULT_PIN,
+    audit: bool = True,
+    scoring: bool = True,
+    chunk_users: int = CHUNK_USERS,
+    progress: bool = False
+) -> Dict[str, Any]:
+    """
+    Insère `users` utilisateurs synthétiques et leurs données.
+
+    Args:
+        engine: Engine cible (schéma déjà créé)
+        users: Nombre d'utilisateurs à créer
+        loans_per_user: Nombre moyen de crédits par utilisateur avec consentements
+        seed: Graine des tirages
+        now: Date de référence (défaut: aujourd'hui à minuit, pour la reproductibilité)
+        pin: PIN de tous les utilisateurs qui en ont un (None: aucun PIN, pas de crédit)
+        audit: Générer l'audit trail
+        scoring: Générer ScoringData
+        chunk_users: Utilisateurs par transaction
+
+    Returns:
+        Dict avec le nombre de lignes par table, la durée et le débit
+    """
+    now = now or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    pin_hash = None
+    if pin is not None:
+        from app.core.security import hash_password
+        pin_hash = hash_password(pin)
+
+    totals = {table.name: 0 for table in TABLES}
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            # Chargement en masse : pas de fsync à chaque commit (rétabli à la fin)
+            synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.commit()
+        try:
+            with conn.begin():
+                ids = _next_ids(conn)
+            user_id, loan_id = ids["users"], ids["loans"]
+            last_user_id = user_id + users
+            while user_id < last_user_id:
+                rows = {table.name: [] for table in TABLES}
+                for current in range(user_id, min(user_id + chunk_users, last_user_id)):
+                    loan_id += generate_user(
+                        current, loan_id, seed, now, loans_per_user, pin_hash, rows, audit, scoring
+                    )
+                user_id = min(user_id + chunk_users, last_user_id)
+                with conn.begin():
+                    for table in TABLES:
+                        batch = rows[table.name]
+                        for start in range(0, len(batch), CHUNK_SIZE):
+                            _bulk_insert(conn, table, batch[start:start + CHUNK_SIZE])
+                        totals[table.name] += len(batch)
+                if progress:
+                    done = sum(totals.values())
+                    elapsed = time.perf_counter() - started
+                    print(f"  {user_id - ids['users']:,}/{users:,} utilisateurs, "
+                          f"{done:,} lignes ({done / elapsed:,.0f} lignes/s)", flush=True)
+            if conn.dialect.name == "postgresql":
+                with conn.begin():
+                    _reset_sequences(conn)
+        finally:
+            if sqlite:
+                conn.exec_driver_sql(f"PRAGMA synchronous={synchronous}")
+
+    elapsed = time.perf_counter() - started
+    rows_total = sum(totals.values())
+    return {
+        "users": users,
+        "seed": seed,
+        "now": now.isoformat(),
+        "tables": totals,
+        "rows": rows_total,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows_total / elapsed) if elapsed else 0,
+    }
+
+
+def create_schema(database_url: str) -> Engine:
+    """Engine sur la base cible, tables et migrations appliquées"""
+    engine = create_engine(database_url)
+    if is_sqlite_url(database_url):
+        configure_sqlite(engine, sqlite_pragmas())
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    return engine
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Base à peupler (créée si besoin)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--loans-per-user", type=int, default=5, help="Moyenne, utilisateurs avec consentements")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--now", type=datetime.fromisoformat,
+                        help="Date de référence (ISO 8601, défaut: aujourd'hui à minuit)")
+    parser.add_argument("--pin", default=DEFAULT_PIN, help="PIN des utilisateurs synthétiques")
+    parser.add_argument("--no-audit", action="store_true", help="Sans audit trail")
+    parser.add_argument("--no-scoring", action="store_true", help="Sans ScoringData")
+    parser.add_argument("--chunk-users", type=int, default=CHUNK_USERS, help="Utilisateurs par transaction")
+    args = parser.parse_args(argv)
+
+    engine = create_schema(args.database_url)
+    result = generate(
+        engine,
+        args.users,
+        loans_per_user=args.loans_per_user,
+        seed=args.seed,
+        now=args.now,
+        pin=args.pin,
+        audit=not args.no_audit,
+        scoring=not args.no_scoring,
+        chunk_users=args.chunk_users,
+        progress=True
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
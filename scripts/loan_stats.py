@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vérification et reconstruction des compteurs de crédits (user_loan_stats).
+
+Les compteurs sont comparés à une agrégation GROUP BY sur loans. `verify`
+échoue (code 1) en cas d'écart ; `rebuild` recalcule tous les compteurs.
+
+Utilisation:
+    python -m scripts.loan_stats verify
+    python -m scripts.loan_stats rebuild --database-url sqlite:///./fintech.db
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--database-url", help="Base cible (défaut: DATABASE_URL)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Utilisateurs par tranche")
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import des modules de l'application
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.db.db import SessionLocal
+    from app.services.loan_stats_service import LoanStatsService
+
+    with SessionLocal() as db:
+        service = LoanStatsService(db)
+        if args.command == "rebuild":
+            print(json.dumps({"users_rebuilt": service.rebuild_all(args.chunk_size)}))
+            return
+
+        mismatches = service.verify(args.chunk_size)
+        print(json.dumps({"mismatches": len(mismatches), "examples": mismatches[:10]}, indent=2))
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
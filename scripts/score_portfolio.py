@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Re-scoring nocturne de tout le portefeuille.
+
+Recalcule le score de chaque utilisateur par tranches (calcul vectorisé) et
+met à jour ScoringData en masse. Avec --check-parity, compare d'abord le
+calcul vectorisé au calcul unitaire de ScoringService sur un échantillon et
+s'arrête (code 1) en cas d'écart.
+
+Utilisation:
+    python -m scripts.score_portfolio
+    python -m scripts.score_portfolio --refresh-external --chunk-size 10000
+    python -m scripts.score_portfolio --check-parity 2000 --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base cible (défaut: DATABASE_URL)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Utilisateurs par tranche")
+    parser.add_argument("--refresh-external", action="store_true",
+                        help="Relire les données Mobile Money de tous les utilisateurs")
+    parser.add_argument("--check-parity", type=int, default=0, metavar="N",
+                        help="Comparer au calcul unitaire sur N utilisateurs avant de scorer")
+    parser.add_argument("--dry-run", action="store_true", help="Calculer sans enregistrer")
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import des modules de l'application
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.db.db import SessionLocal
+    from app.services.batch_scoring_service import BatchScoringService
+
+    with SessionLocal() as db:
+        service = BatchScoringService(db, chunk_size=args.chunk_size)
+        if args.check_parity:
+            parity = service.check_parity(sample_size=args.check_parity)
+            print(json.dumps({"parity": {
+                "checked": parity["checked"],
+                "mismatches": len(parity["mismatches"]),
+                "examples": parity["mismatches"][:10]
+            }}, indent=2))
+            if parity["mismatches"]:
+                sys.exit(1)
+
+        result = service.score_all(refresh_external=args.refresh_external, persist=not args.dry_run)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Passe en retard (OVERDUE) les crédits actifs dont l'échéance est dépassée.
+
+Même traitement que le thread du serveur, sous le même bail : si un
+serveur est en train de balayer, le script s'arrête sans rien faire
+(sauf --ignore-lease).
+
+Utilisation:
+    python -m scripts.sweep_overdue
+    python -m scripts.sweep_overdue --dry-run
+    python -m scripts.sweep_overdue --chunk-size 5000 --pause 0
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Base cible (défaut: DATABASE_URL)")
+    parser.add_argument("--chunk-size", type=int, help="Crédits par transaction")
+    parser.add_argument("--pause", type=float, help="Pause entre deux lots (s)")
+    parser.add_argument("--ignore-lease", action="store_true", help="Balayer même si un autre nœud détient le bail")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les crédits échus sans les modifier")
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import des modules de l'application
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.db.db import SessionLocal
+    from app.services.overdue_sweeper import overdue_sweeper
+
+    if args.chunk_size:
+        overdue_sweeper.chunk_size = args.chunk_size
+    if args.pause is not None:
+        overdue_sweeper.pause_seconds = args.pause
+
+    if args.dry_run:
+        with SessionLocal() as db:
+            print(json.dumps({"loans_due": overdue_sweeper.count_due(db)}))
+        return
+
+    if args.ignore_lease:
+        result = overdue_sweeper.sweep()
+    else:
+        result = overdue_sweeper.run_once()
+        if result is None:
+            print("Bail détenu par un autre nœud, rien à faire", file=sys.stderr)
+            sys.exit(2)
+        overdue_sweeper.release_lease()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()